@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Sélection active des détections terrain à faire étiqueter
+Incertitude (marge / entropie) par inférence en batch, puis sous-ensemble
+diversifié par k-center sur les embeddings du modèle, exporté en file
+d'étiquetage CSV
+"""
+
+import os
+import csv
+import json
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from calibration import apply_calibration
+from database import DATABASE_URL, get_engine
+
+
+QUEUE_DIR = os.path.join("data", "labeling_queue")
+IMAGE_CACHE_DIR = os.path.join(QUEUE_DIR, "images")
+STRATEGIES = ('margin', 'entropy')
+
+QUEUE_FIELDS = [
+    'rank', 'detection_id', 'image_path', 'image_url', 'predicted_class', 'confidence',
+    'margin', 'entropy', 'detection_date', 'label',
+]
+
+
+# ========================================
+# Détections
+# ========================================
+
+def fetch_detections(database_url, days=7, limit=None):
+    """
+    Détections récentes avec image, pas encore confirmées par l'utilisateur
+    
+    Les détections avec un feedback positif ou une maladie réelle connue sont
+    déjà étiquetées et ne sont pas proposées.
+    """
+    try:
+        from sqlalchemy import text
+    except ImportError:
+        print("❌ SQLAlchemy non installé. Installez-le avec: pip install SQLAlchemy psycopg2-binary")
+        return []
+    
+    query = """
+        SELECT id, image_url, disease_id, confidence_score, detection_date
+        FROM detections
+        WHERE image_url IS NOT NULL
+          AND detection_date >= :since
+          AND actual_disease_id IS NULL
+          AND (feedback_correct IS NULL OR feedback_correct = FALSE)
+        ORDER BY detection_date DESC
+    """
+    if limit:
+        query += " LIMIT :limit"
+    
+    with get_engine(database_url).connect() as connection:
+        rows = connection.execute(text(query), {
+            'since': datetime.now() - timedelta(days=days),
+            'limit': limit,
+        }).mappings().all()
+    
+    return [
+        {
+            'detection_id': str(row['id']),
+            'image_url': row['image_url'],
+            'disease_id': str(row['disease_id']) if row['disease_id'] else None,
+            'confidence_score': float(row['confidence_score']) if row['confidence_score'] is not None else None,
+            'detection_date': row['detection_date'].isoformat() if row['detection_date'] else None,
+        }
+        for row in rows
+    ]
+
+
+def load_detections(path):
+    """Détections exportées en JSON (liste d'objets avec detection_id et image_url)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def already_queued(queue_dir=QUEUE_DIR):
+    """Identifiants des détections déjà présentes dans une file précédente"""
+    queued = set()
+    if not os.path.isdir(queue_dir):
+        return queued
+    for name in os.listdir(queue_dir):
+        if name.startswith('queue_') and name.endswith('.csv'):
+            with open(os.path.join(queue_dir, name), 'r', encoding='utf-8', newline='') as f:
+                queued.update(row['detection_id'] for row in csv.DictReader(f))
+    return queued
+
+
+def resolve_image(detection, cache_dir=IMAGE_CACHE_DIR, timeout=30):
+    """
+    Chemin local et lisible de l'image d'une détection (téléchargée dans le
+    cache si image_url est une URL), ou None si l'image est inutilisable
+    """
+    image_url = detection['image_url']
+    if image_url.startswith(('http://', 'https://')):
+        import requests
+        
+        extension = os.path.splitext(image_url.split('?')[0])[1] or '.jpg'
+        path = os.path.join(cache_dir, f"{detection['detection_id']}{extension}")
+        if not os.path.exists(path):
+            try:
+                response = requests.get(image_url, timeout=timeout)
+                response.raise_for_status()
+            except Exception:
+                return None
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path + ".tmp", 'wb') as f:
+                f.write(response.content)
+            os.replace(path + ".tmp", path)
+    else:
+        path = image_url[len('file://'):] if image_url.startswith('file://') else image_url
+    
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except Exception:
+        return None
+    return os.path.abspath(path)
+
+
+# ========================================
+# Incertitude et Diversité
+# ========================================
+
+def uncertainty_scores(probabilities):
+    """
+    Marge (top-1 - top-2, faible = incertain) et entropie normalisée
+    (élevée = incertain) par image
+    """
+    top2 = np.sort(np.partition(probabilities, -2, axis=1)[:, -2:], axis=1)
+    margin = top2[:, 1] - top2[:, 0]
+    clipped = np.clip(probabilities, 1e-12, 1.0)
+    entropy = -np.sum(clipped * np.log(clipped), axis=1) / np.log(probabilities.shape[1])
+    return margin, entropy
+
+
+def k_center_greedy(embeddings, budget, first=0):
+    """
+    Sélection k-center gloutonne : ajoute à chaque étape le point le plus
+    éloigné des points déjà choisis (couverture de l'espace des embeddings)
+    
+    Returns:
+        Indices choisis, dans l'ordre de sélection
+    """
+    budget = min(budget, len(embeddings))
+    if budget == 0:
+        return []
+    
+    squared_norms = np.einsum('ij,ij->i', embeddings, embeddings)
+    selected = [first]
+    min_distances = squared_norms - 2 * embeddings @ embeddings[first] + squared_norms[first]
+    min_distances[first] = -np.inf
+    
+    while len(selected) < budget:
+        candidate = int(np.argmax(min_distances))
+        selected.append(candidate)
+        distances = squared_norms - 2 * embeddings @ embeddings[candidate] + squared_norms[candidate]
+        np.minimum(min_distances, distances, out=min_distances)
+        min_distances[candidate] = -np.inf
+    
+    return selected
+
+
+def embed_and_predict(model, metadata, paths, batch_size=64):
+    """
+    Embeddings (entrée de la couche de classification) et probabilités
+    calibrées, en une seule passe d'inférence par batch
+    """
+    from tensorflow import keras
+    from evaluate_model import make_inference_dataset
+    
+    dual = keras.Model(model.inputs, [model.layers[-1].input, model.output])
+    dataset = make_inference_dataset(paths, metadata['img_height'], metadata['img_width'], batch_size)
+    embeddings, probabilities = dual.predict(dataset, verbose=1)
+    
+    probabilities = apply_calibration(probabilities.astype('float32'), metadata.get('calibration'))
+    return embeddings.astype('float32'), probabilities
+
+
+def select_for_labeling(probabilities, embeddings, budget, strategy='margin', pool_factor=5):
+    """
+    Choisir `budget` images : pool des budget * pool_factor plus incertaines,
+    puis k-center sur leurs embeddings (évite les quasi-doublons)
+    
+    Returns:
+        Indices choisis (dans les tableaux d'entrée)
+    """
+    margin, entropy = uncertainty_scores(probabilities)
+    order = np.argsort(margin) if strategy == 'margin' else np.argsort(-entropy)
+    pool = order[:budget * pool_factor]
+    
+    # Normalisation L2 : distances cosinus, insensibles à l'échelle des activations
+    pool_embeddings = embeddings[pool]
+    pool_embeddings = pool_embeddings / np.maximum(
+        np.linalg.norm(pool_embeddings, axis=1, keepdims=True), 1e-12)
+    
+    return [int(pool[i]) for i in k_center_greedy(pool_embeddings, budget)]
+
+
+# ========================================
+# File d'Étiquetage
+# ========================================
+
+def build_labeling_queue(model_dir, detections, budget=300, strategy='margin', pool_factor=5,
+                         batch_size=64, queue_dir=QUEUE_DIR, workers=16):
+    """
+    Construire et exporter la file d'étiquetage
+    
+    Returns:
+        Chemin du CSV exporté, ou None si aucune détection n'est exploitable
+    """
+    from train_model import load_trained_model
+    
+    queued = already_queued(queue_dir)
+    detections = [d for d in detections if d['detection_id'] not in queued and d.get('image_url')]
+    print(f"📥 {len(detections)} détections candidates ({len(queued)} déjà en file)")
+    
+    cache_dir = os.path.join(queue_dir, "images")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        paths = list(executor.map(lambda d: resolve_image(d, cache_dir), detections))
+    
+    usable = [(d, p) for d, p in zip(detections, paths) if p]
+    if len(usable) < len(detections):
+        print(f"⚠ {len(detections) - len(usable)} images introuvables ou illisibles ignorées")
+    if not usable:
+        return None
+    
+    model, metadata = load_trained_model(model_dir)
+    class_names = {int(k): v for k, v in metadata['classes'].items()}
+    embeddings, probabilities = embed_and_predict(model, metadata, [p for _, p in usable], batch_size)
+    
+    selected = select_for_labeling(probabilities, embeddings, budget, strategy, pool_factor)
+    margin, entropy = uncertainty_scores(probabilities)
+    
+    os.makedirs(queue_dir, exist_ok=True)
+    queue_path = os.path.join(queue_dir, f"queue_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    with open(queue_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=QUEUE_FIELDS)
+        writer.writeheader()
+        for rank, i in enumerate(selected, 1):
+            detection, path = usable[i]
+            predicted = int(probabilities[i].argmax())
+            writer.writerow({
+                'rank': rank,
+                'detection_id': detection['detection_id'],
+                'image_path': path,
+                'image_url': detection['image_url'],
+                'predicted_class': class_names.get(predicted, f"classe_{predicted}"),
+                'confidence': f"{probabilities[i, predicted]:.4f}",
+                'margin': f"{margin[i]:.4f}",
+                'entropy': f"{entropy[i]:.4f}",
+                'detection_date': detection.get('detection_date') or '',
+                'label': '',
+            })
+    
+    print(f"✓ {len(selected)} images sélectionnées sur {len(usable)}")
+    return queue_path
+
+
+def main():
+    """
+    Sélectionner les détections récentes à faire étiqueter
+    """
+    parser = argparse.ArgumentParser(description="Apprentissage actif AgriDetect")
+    parser.add_argument('model_dir', help="Dossier du modèle dans models/")
+    parser.add_argument('--budget', type=int, default=300, help="Images à étiqueter")
+    parser.add_argument('--days', type=int, default=7, help="Ancienneté maximale des détections")
+    parser.add_argument('--limit', type=int, default=None, help="Nombre maximal de détections lues")
+    parser.add_argument('--strategy', choices=STRATEGIES, default='margin')
+    parser.add_argument('--pool-factor', type=int, default=5,
+                        help="Taille du pool d'incertitude (multiple du budget) avant k-center")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    parser.add_argument('--detections', metavar='JSON',
+                        help="Lire les détections depuis un export JSON au lieu de la base")
+    parser.add_argument('--queue-dir', default=QUEUE_DIR)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Sélection pour Étiquetage")
+    print("=" * 60)
+    print()
+    
+    if args.detections:
+        detections = load_detections(args.detections)
+    else:
+        detections = fetch_detections(args.database_url, args.days, args.limit)
+    
+    queue_path = build_labeling_queue(
+        args.model_dir, detections, args.budget, args.strategy, args.pool_factor,
+        args.batch_size, args.queue_dir
+    )
+    
+    print()
+    if queue_path:
+        print(f"📁 File d'étiquetage: {queue_path}")
+        print("   Remplir la colonne 'label' avec le nom de classe correct")
+    else:
+        print("⚠ Aucune détection exploitable")
+
+
+if __name__ == "__main__":
+    main()
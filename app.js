@@ -162,35 +162,143 @@ async function sendMessage() {
     input.value = '';
 
     try {
-        const response = await fetch(`${API_BASE_URL}${API_VERSION}/chat`, {
+        await streamMessage(message);
+    } catch (streamError) {
+        if (!(streamError instanceof StreamUnavailableError)) {
+            // Le serveur a déjà traité le message : ne pas le renvoyer
+            console.error('Error:', streamError);
+            return;
+        }
+        // Flux indisponible avant tout événement (proxy, navigateur) : réponse complète
+        console.warn('Streaming indisponible:', streamError);
+        try {
+            await fetchMessage(message);
+        } catch (error) {
+            console.error('Error:', error);
+            displayMessage('Désolé, une erreur s\'est produite. Veuillez réessayer.', 'bot');
+        }
+    }
+}
+
+// Flux impossible à ouvrir : aucun événement reçu, le message peut être renvoyé
+class StreamUnavailableError extends Error {}
+
+// Réponse en flux (Server-Sent Events) : le texte s'affiche au fil de l'eau
+async function streamMessage(message) {
+    let response;
+    try {
+        response = await fetch(`${API_BASE_URL}${API_VERSION}/chat/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
             },
             body: JSON.stringify({
                 message: message,
                 session_id: sessionId
             })
         });
+    } catch (error) {
+        throw new StreamUnavailableError(error.message);
+    }
 
-        if (!response.ok) {
-            throw new Error(`Erreur HTTP: ${response.status}`);
-        }
+    if (!response.ok || !response.body) {
+        throw new StreamUnavailableError(`Erreur HTTP: ${response.status}`);
+    }
 
-        const data = await response.json();
-        
-        // Display bot response
-        setTimeout(() => {
-            displayMessage(data.response, 'bot');
-            
-            // Display suggestions if available
-            if (data.suggestions && data.suggestions.length > 0) {
-                updateSuggestions(data.suggestions);
-            }
-        }, 500);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let paragraph = null;
+    let received = false;
+
+    try {
+        await readEvents();
     } catch (error) {
-        console.error('Error:', error);
+        if (!received) {
+            throw new StreamUnavailableError(error.message);
+        }
+        // Réponse interrompue : l'erreur s'affiche dans la bulle du bot
+        const notice = 'Désolé, la réponse a été interrompue. Veuillez réessayer.';
+        if (paragraph) {
+            paragraph.textContent = text ? `${text}\n\n⚠️ ${notice}` : notice;
+        } else {
+            displayMessage(notice, 'bot');
+        }
+        throw error;
+    }
+
+    if (!paragraph) {
         displayMessage('Désolé, une erreur s\'est produite. Veuillez réessayer.', 'bot');
+        throw new Error('Réponse vide');
+    }
+
+    async function readEvents() {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Un événement SSE se termine par une ligne vide
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let type = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) type = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (!data) continue;  // ': ping'
+                const event = JSON.parse(data);
+                received = true;
+
+                if (type === 'delta') {
+                    if (!paragraph) {
+                        paragraph = displayMessage('', 'bot');
+                    }
+                    text += event.text;
+                    paragraph.textContent = text;
+                    const messagesContainer = document.getElementById('chatMessages');
+                    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+                } else if (type === 'suggestions' && event.suggestions.length > 0) {
+                    updateSuggestions(event.suggestions);
+                } else if (type === 'error') {
+                    throw new Error(event.detail);
+                }
+            }
+        }
+    }
+}
+
+// Réponse complète (endpoint /chat)
+async function fetchMessage(message) {
+    const response = await fetch(`${API_BASE_URL}${API_VERSION}/chat`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: message,
+            session_id: sessionId
+        })
+    });
+
+    if (!response.ok) {
+        throw new Error(`Erreur HTTP: ${response.status}`);
+    }
+
+    const data = await response.json();
+    
+    // Display bot response
+    displayMessage(data.response, 'bot');
+    
+    // Display suggestions if available
+    if (data.suggestions && data.suggestions.length > 0) {
+        updateSuggestions(data.suggestions);
     }
 }
 
@@ -219,6 +327,7 @@ function displayMessage(text, type) {
     
     messagesContainer.appendChild(messageDiv);
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return messageDiv.querySelector('p');
 }
 
 // Update suggestions
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Lecture du dataset AgriDetect directement depuis des archives ZIP ou tar
+(shards façon WebDataset), sans extraction sur disque
+
+Un index des positions (archive, offset, taille) de chaque image est construit
+une seule fois ; les images sont ensuite lues par accès direct en parallèle
+dans le pipeline tf.data.
+"""
+
+import os
+import json
+import zlib
+import struct
+import tarfile
+import zipfile
+import argparse
+import threading
+
+import numpy as np
+
+from dataset_manifest import oversample
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar')
+INDEX_FILE = "archive_index.json"
+INDEX_VERSION = 1
+
+SPLIT_ALIASES = {'train': 'train', 'validation': 'validation', 'val': 'validation', 'test': 'test'}
+
+# Méthodes de stockage dans l'index
+STORED = 0
+DEFLATED = 8
+
+_ZIP_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+
+# ========================================
+# Construction de l'Index
+# ========================================
+
+def _member_labels(name):
+    """
+    Classe (dossier parent) et split (composant train/val/test du chemin)
+    d'un membre d'archive
+    """
+    parts = name.replace('\\', '/').split('/')
+    class_name = parts[-2] if len(parts) >= 2 else None
+    split = next((SPLIT_ALIASES[p.lower()] for p in parts[:-1] if p.lower() in SPLIT_ALIASES), None)
+    return class_name, split
+
+
+def _index_zip(path):
+    """Positions des images d'une archive ZIP (données brutes après l'en-tête local)"""
+    entries = []
+    with zipfile.ZipFile(path, 'r') as archive, open(path, 'rb') as raw:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or info.flag_bits & 0x1:
+                raise ValueError(f"{path}: {info.filename} utilise une compression ou un chiffrement non supporté")
+            
+            raw.seek(info.header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(raw.read(_ZIP_LOCAL_HEADER.size))
+            name_length, extra_length = header[-2], header[-1]
+            offset = info.header_offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length
+            method = STORED if info.compress_type == zipfile.ZIP_STORED else DEFLATED
+            entries.append((info.filename, offset, info.compress_size, method))
+    return entries
+
+
+def _index_tar(path):
+    """Positions des images d'une archive tar non compressée"""
+    entries = []
+    with tarfile.open(path, 'r:') as archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                entries.append((member.name, member.offset_data, member.size, STORED))
+    return entries
+
+
+def _archive_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build_archive_index(archive_dir, default_split='train'):
+    """
+    Indexer toutes les archives ZIP/tar d'un dossier (index mis en cache)
+    
+    L'index est reconstruit uniquement si la liste des archives, leur taille
+    ou leur date de modification changent. Les archives tar doivent être non
+    compressées (.tar) pour permettre l'accès direct.
+    
+    Args:
+        default_split: Split des images dont le chemin ne contient pas
+                       train/validation/test
+    
+    Returns:
+        Index {'archives': [...], 'signatures': [...], 'entries': [...]}
+    """
+    archives = sorted(
+        name for name in os.listdir(archive_dir)
+        if name.lower().endswith(ARCHIVE_EXTENSIONS)
+    )
+    signatures = [_archive_signature(os.path.join(archive_dir, name)) for name in archives]
+    
+    index_path = os.path.join(archive_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if (index.get('version') == INDEX_VERSION and index['archives'] == archives
+                and index['signatures'] == signatures):
+            return index
+    
+    print(f"🗂️ Indexation de {len(archives)} archives dans {archive_dir}...")
+    entries = []
+    for archive_id, name in enumerate(archives):
+        path = os.path.join(archive_dir, name)
+        members = _index_zip(path) if name.lower().endswith('.zip') else _index_tar(path)
+        for member_name, offset, size, method in members:
+            class_name, split = _member_labels(member_name)
+            if class_name is None:
+                continue
+            entries.append({
+                'archive': archive_id,
+                'name': member_name,
+                'offset': offset,
+                'size': size,
+                'method': method,
+                'class': class_name,
+                'split': split or default_split,
+            })
+    
+    entries.sort(key=lambda e: (e['split'], e['class'], e['name']))
+    index = {'version': INDEX_VERSION, 'archives': archives, 'signatures': signatures, 'entries': entries}
+    
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    
+    print(f"✓ Index: {len(entries)} images")
+    return index
+
+
+# ========================================
+# Lecture par Accès Direct
+# ========================================
+
+class ArchiveReader:
+    """
+    Lecteur d'échantillons par (archive, offset, taille)
+    
+    Chaque thread garde ses propres descripteurs de fichiers ouverts, ce qui
+    permet des lectures parallèles sans verrou.
+    """
+    
+    def __init__(self, archive_dir, index):
+        self.paths = [os.path.join(archive_dir, name) for name in index['archives']]
+        self.entries = index['entries']
+        self._local = threading.local()
+    
+    def _handle(self, archive_id):
+        handles = getattr(self._local, 'handles', None)
+        if handles is None:
+            handles = self._local.handles = {}
+        if archive_id not in handles:
+            handles[archive_id] = open(self.paths[archive_id], 'rb')
+        return handles[archive_id]
+    
+    def read(self, position):
+        """Octets de l'image à la position `position` de l'index"""
+        entry = self.entries[position]
+        handle = self._handle(entry['archive'])
+        handle.seek(entry['offset'])
+        data = handle.read(entry['size'])
+        if entry['method'] == DEFLATED:
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+        return data
+
+
+# ========================================
+# Pipeline tf.data
+# ========================================
+
+def make_archive_dataset(archive_dir, split, config, shuffle=True, shuffle_buffer=1024,
+                         augment=False, index=None, oversample_target=None):
+    """
+    Dataset tf.data (image, one-hot) lu directement depuis les archives
+    
+    Les positions sont mélangées à chaque epoch (mélange global peu coûteux),
+    les images sont lues et décodées en parallèle, puis passent par un
+    tampon de mélange avant la mise en batch. L'augmentation (retournement,
+    luminosité) est appliquée sur le graphe tf.data. `oversample_target`
+    répète les images des classes rares (voir dataset_manifest.oversample).
+    
+    Returns:
+        (dataset, class_names {indice: classe}, nombre d'images)
+    """
+    import tensorflow as tf
+    
+    index = index or build_archive_index(archive_dir)
+    reader = ArchiveReader(archive_dir, index)
+    
+    classes = sorted({entry['class'] for entry in index['entries'] if entry['split'] == 'train'})
+    class_indices = {name: i for i, name in enumerate(classes)}
+    
+    positions = [i for i, entry in enumerate(index['entries'])
+                 if entry['split'] == split and entry['class'] in class_indices]
+    if oversample_target:
+        positions = oversample(positions, key=lambda i: index['entries'][i]['class'],
+                               target_fraction=oversample_target, seed=config.SEED)
+    labels = [class_indices[index['entries'][i]['class']] for i in positions]
+    
+    def read_bytes(position):
+        return np.array(reader.read(int(position)), dtype=object)
+    
+    def load(position, label):
+        data = tf.numpy_function(read_bytes, [position], tf.string)
+        image = tf.io.decode_image(data, channels=config.IMG_CHANNELS, expand_animations=False)
+        image = tf.image.resize(image, (config.IMG_HEIGHT, config.IMG_WIDTH)) / 255.0
+        image.set_shape((config.IMG_HEIGHT, config.IMG_WIDTH, config.IMG_CHANNELS))
+        if augment:
+            if config.HORIZONTAL_FLIP:
+                image = tf.image.random_flip_left_right(image)
+            image = tf.clip_by_value(tf.image.random_brightness(image, 0.1), 0.0, 1.0)
+        return image, tf.one_hot(label, len(classes))
+    
+    dataset = tf.data.Dataset.from_tensor_slices((np.array(positions, dtype=np.int64),
+                                                  np.array(labels, dtype=np.int32)))
+    if shuffle:
+        dataset = dataset.shuffle(len(positions), seed=config.SEED, reshuffle_each_iteration=True)
+    dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    if shuffle and shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, seed=config.SEED)
+    dataset = dataset.batch(config.BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+    
+    class_names = {i: name for name, i in class_indices.items()}
+    return dataset, class_names, len(positions)
+
+
+def main():
+    """
+    Indexer un dossier d'archives et afficher un résumé
+    """
+    parser = argparse.ArgumentParser(description="Index des archives du dataset AgriDetect")
+    parser.add_argument('archive_dir', help="Dossier contenant les archives .zip / .tar")
+    parser.add_argument('--default-split', default='train',
+                        help="Split des images sans train/validation/test dans leur chemin")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Index des Archives")
+    print("=" * 60)
+    print()
+    
+    index = build_archive_index(args.archive_dir, default_split=args.default_split)
+    counts = {}
+    for entry in index['entries']:
+        counts.setdefault(entry['split'], set()).add(entry['class'])
+    for split, classes in sorted(counts.items()):
+        total = sum(1 for entry in index['entries'] if entry['split'] == split)
+        print(f"   {split:<12} {total:>7} images, {len(classes)} classes")
+
+
+if __name__ == "__main__":
+    main()
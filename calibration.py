@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Calibration des confiances d'un modèle AgriDetect
+Temperature scaling ou vector scaling (température et biais par classe),
+ajustés en quelques secondes sur les prédictions de validation en cache,
+sans réentraîner le modèle
+
+Les paramètres sont stockés dans metadata.json (clé 'calibration') et
+appliqués par DiseaseDetector au moment de l'inférence.
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+
+CALIBRATION_METHODS = ('temperature', 'vector')
+
+
+# ========================================
+# Application (utilisée aussi à l'inférence)
+# ========================================
+
+def probabilities_to_logits(probabilities):
+    """log(p) : logits valides (à une constante près) d'une sortie softmax"""
+    return np.log(np.clip(probabilities, 1e-7, 1.0))
+
+
+def softmax(logits):
+    """Softmax numériquement stable, ligne par ligne"""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def apply_calibration(probabilities, calibration):
+    """
+    Recalibrer un batch de probabilités (N, num_classes)
+    
+    Args:
+        calibration: Paramètres de metadata.json, ou None (aucun changement)
+    """
+    if not calibration:
+        return probabilities
+    
+    logits = probabilities_to_logits(probabilities)
+    if calibration['method'] == 'temperature':
+        logits = logits / calibration['temperature']
+    else:
+        logits = logits * np.asarray(calibration['weights']) + np.asarray(calibration['biases'])
+    return softmax(logits).astype(probabilities.dtype)
+
+
+# ========================================
+# Ajustement
+# ========================================
+
+def negative_log_likelihood(logits, labels):
+    """NLL moyenne des vraies classes"""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    log_norm = np.log(np.exp(shifted).sum(axis=1))
+    return float(np.mean(log_norm - shifted[np.arange(len(labels)), labels]))
+
+
+def fit_temperature(logits, labels, low=0.05, high=20.0, iterations=60):
+    """
+    Température minimisant la NLL (recherche par section dorée sur log T,
+    la NLL étant unimodale en T)
+    """
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = np.log(low), np.log(high)
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    f_c = negative_log_likelihood(logits / np.exp(c), labels)
+    f_d = negative_log_likelihood(logits / np.exp(d), labels)
+    
+    for _ in range(iterations):
+        if f_c < f_d:
+            b, d, f_d = d, c, f_c
+            c = b - ratio * (b - a)
+            f_c = negative_log_likelihood(logits / np.exp(c), labels)
+        else:
+            a, c, f_c = c, d, f_d
+            d = a + ratio * (b - a)
+            f_d = negative_log_likelihood(logits / np.exp(d), labels)
+    
+    return float(np.exp((a + b) / 2))
+
+
+def fit_vector_scaling(logits, labels, iterations=500, learning_rate=0.05, l2=1e-3):
+    """
+    Poids et biais par classe (z * w + b) minimisant la NLL, par descente de
+    gradient Adam vectorisée, initialisés au temperature scaling
+    
+    La régularisation L2 ramène les paramètres vers l'identité pour les
+    classes peu représentées en validation.
+    """
+    num_samples, num_classes = logits.shape
+    one_hot = np.eye(num_classes)[labels]
+    
+    weights = np.full(num_classes, 1.0 / fit_temperature(logits, labels))
+    biases = np.zeros(num_classes)
+    init_weights = weights.copy()
+    params = np.concatenate([weights, biases])
+    moment1 = np.zeros_like(params)
+    moment2 = np.zeros_like(params)
+    
+    for step in range(1, iterations + 1):
+        weights, biases = params[:num_classes], params[num_classes:]
+        error = softmax(logits * weights + biases) - one_hot
+        grad_weights = (error * logits).sum(axis=0) / num_samples + l2 * (weights - init_weights)
+        grad_biases = error.sum(axis=0) / num_samples + l2 * biases
+        grad = np.concatenate([grad_weights, grad_biases])
+        
+        moment1 = 0.9 * moment1 + 0.1 * grad
+        moment2 = 0.999 * moment2 + 0.001 * grad ** 2
+        params -= (learning_rate * (moment1 / (1 - 0.9 ** step))
+                   / (np.sqrt(moment2 / (1 - 0.999 ** step)) + 1e-8))
+    
+    return params[:num_classes], params[num_classes:]
+
+
+def fit_calibration(probabilities, labels, method='temperature'):
+    """
+    Ajuster les paramètres de calibration sur des prédictions de validation
+    
+    Returns:
+        Paramètres sérialisables pour metadata.json
+    """
+    logits = probabilities_to_logits(probabilities.astype('float64'))
+    
+    if method == 'temperature':
+        return {'method': 'temperature', 'temperature': fit_temperature(logits, labels)}
+    
+    weights, biases = fit_vector_scaling(logits, labels)
+    return {'method': 'vector', 'weights': weights.tolist(), 'biases': biases.tolist()}
+
+
+# ========================================
+# Calibration d'un Modèle
+# ========================================
+
+def calibrate_model(model_dir, data_dir="data", method='temperature', split='validation',
+                    batch_size=64, num_bins=15):
+    """
+    Calibrer un modèle de models/ et enregistrer les paramètres dans
+    metadata.json
+    
+    Les prédictions du split sont relues depuis le cache d'evaluate_model
+    (inférence uniquement si le cache est absent ou périmé).
+    
+    Returns:
+        Paramètres de calibration (avec NLL et ECE avant / après)
+    """
+    from evaluate_model import load_or_predict, expected_calibration_error
+    
+    metadata_path = os.path.join(model_dir, "metadata.json")
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    
+    probabilities, labels, _, _ = load_or_predict(model_dir, metadata, data_dir, split, batch_size)
+    
+    calibration = fit_calibration(probabilities, labels, method)
+    calibrated = apply_calibration(probabilities, calibration)
+    
+    calibration.update({
+        'split': split,
+        'num_images': int(len(labels)),
+        'nll_before': negative_log_likelihood(probabilities_to_logits(probabilities), labels),
+        'nll_after': negative_log_likelihood(probabilities_to_logits(calibrated), labels),
+        'ece_before': expected_calibration_error(probabilities, labels, num_bins),
+        'ece_after': expected_calibration_error(calibrated, labels, num_bins),
+        'fitted_at': datetime.now().isoformat(),
+    })
+    
+    metadata['calibration'] = calibration
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    
+    return calibration
+
+
+def main():
+    """
+    Calibrer un modèle entraîné
+    """
+    parser = argparse.ArgumentParser(description="Calibration des confiances d'un modèle AgriDetect")
+    parser.add_argument('model_dir', help="Dossier du modèle dans models/")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--method', choices=CALIBRATION_METHODS, default='temperature')
+    parser.add_argument('--split', default='validation', choices=('train', 'validation', 'test'))
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Calibration du Modèle")
+    print("=" * 60)
+    print()
+    
+    calibration = calibrate_model(args.model_dir, args.data_dir, args.method, args.split,
+                                  args.batch_size)
+    
+    print()
+    if calibration['method'] == 'temperature':
+        print(f"✓ Température: {calibration['temperature']:.3f}")
+    else:
+        print(f"✓ Vector scaling: {len(calibration['weights'])} classes")
+    print(f"✓ NLL: {calibration['nll_before']:.4f} → {calibration['nll_after']:.4f}")
+    print(f"✓ ECE: {calibration['ece_before']:.4f} → {calibration['ece_after']:.4f}")
+    print(f"📁 Paramètres: {os.path.join(args.model_dir, 'metadata.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Benchmark de charge du chat AgriDetect
+Rejoue un corpus de conversations multilingues (français, wolof, pulaar)
+sur MultilingualAgriChatbot directement et sur /api/v1/chat en HTTP, avec
+une concurrence réglable : débit, latences p50 / p95 / p99 et mémoire par
+session, enregistrés en JSON pour comparer les commits entre eux
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+RESULTS_DIR = os.path.join("data", "benchmarks")
+DEFAULT_URL = "http://localhost:8000"
+
+# ========================================
+# Corpus
+# ========================================
+
+# (langue, catégorie, message) : messages tels que les envoient les agriculteurs
+CORPUS = [
+    ("fr", "greeting", "Bonjour"),
+    ("fr", "greeting", "Salut, j'ai besoin d'aide"),
+    ("fr", "symptoms", "J'ai des taches jaunes sur les feuilles de tomate"),
+    ("fr", "symptoms", "Il y a une moisissure blanche au revers des feuilles"),
+    ("fr", "symptoms", "Mes feuilles de maïs ont des pustules orangées"),
+    ("fr", "symptoms", "C'est quelle maladie? Les plants flétrissent"),
+    ("fr", "treatment", "Quel traitement pour le mildiou?"),
+    ("fr", "treatment", "Comment soigner mes tomates?"),
+    ("fr", "treatment", "Quel fongicide utiliser?"),
+    ("fr", "prevention", "Comment prévenir les maladies pendant la saison des pluies?"),
+    ("fr", "prevention", "Comment éviter la rouille?"),
+    ("fr", "crop", "Info sur le mil"),
+    ("fr", "crop", "Combien de temps pour l'arachide?"),
+    ("fr", "general", "Quand faut-il semer?"),
+    ("fr", "thanks", "Merci beaucoup"),
+    ("fr", "goodbye", "Au revoir"),
+    ("wo", "greeting", "Asalaam aleykum"),
+    ("wo", "greeting", "Nanga def?"),
+    ("wo", "symptoms", "Xob yi dañu am tàkk yu mboq"),
+    ("wo", "symptoms", "Sama mbay dafa feebar, xob yi di wow"),
+    ("wo", "treatment", "Garab bu baax ngir xob yi"),
+    ("wo", "treatment", "Lan laa war a def ngir faj feebar bi?"),
+    ("wo", "prevention", "Naka laa mën a faggu feebar yi?"),
+    ("wo", "crop", "Mbay ceeb"),
+    ("wo", "thanks", "Jërëjëf"),
+    ("wo", "goodbye", "Ba beneen yoon"),
+    ("pu", "greeting", "Jam tan"),
+    ("pu", "symptoms", "Leeɗe ɗe koosa, hol ñawu oo?"),
+    ("pu", "symptoms", "Tache raneeje e leeɗe tomate am"),
+    ("pu", "treatment", "Hol lekki moƴƴo ngam ñawu oo?"),
+    ("pu", "prevention", "Hol ko mi waawi haɗde ñawu?"),
+    ("pu", "crop", "Tigadega"),
+    ("pu", "thanks", "A jaaraama"),
+    ("pu", "goodbye", "Haa yeeso"),
+]
+
+# Déroulé type d'une conversation (les messages de chaque étape sont tirés au hasard)
+CONVERSATION_FLOW = ["greeting", "symptoms", "treatment", "prevention", "crop", "symptoms",
+                     "treatment", "general", "thanks", "goodbye"]
+
+
+def build_conversations(num_sessions: int, messages_per_session: int,
+                        seed: int = 42) -> List[List[Tuple[str, str, str]]]:
+    """
+    Conversations à rejouer : chaque session garde une langue (les messages
+    généraux en français pour le wolof / pulaar, comme sur le terrain) et
+    suit CONVERSATION_FLOW
+    """
+    rng = random.Random(seed)
+    by_key = {}
+    for lang, category, text in CORPUS:
+        by_key.setdefault((lang, category), []).append((lang, category, text))
+    
+    conversations = []
+    for index in range(num_sessions):
+        lang = ("fr", "wo", "pu")[index % 3]
+        conversation = []
+        for step in range(messages_per_session):
+            category = CONVERSATION_FLOW[step % len(CONVERSATION_FLOW)]
+            choices = by_key.get((lang, category)) or by_key[("fr", category)]
+            conversation.append(rng.choice(choices))
+        conversations.append(conversation)
+    return conversations
+
+
+# ========================================
+# Mesures
+# ========================================
+
+def latency_stats(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50 / p95 / p99, moyenne et maximum (ms)"""
+    if not latencies_ms:
+        return {}
+    values = np.asarray(latencies_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'mean_ms': float(values.mean()),
+        'max_ms': float(values.max()),
+    }
+
+
+def replay(conversations: List[List[Tuple[str, str, str]]], send, concurrency: int) -> Dict:
+    """
+    Rejouer les conversations avec `concurrency` sessions en parallèle
+    (messages d'une même session dans l'ordre)
+    
+    Args:
+        send: send(session_index, message) -> None, lève une exception en cas d'échec
+    """
+    latencies = []
+    by_category = {}
+    errors = []
+    lock = threading.Lock()
+    
+    def run_session(index):
+        local = []
+        for lang, category, text in conversations[index]:
+            start = time.perf_counter()
+            try:
+                send(index, text)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            local.append((f"{lang}:{category}", (time.perf_counter() - start) * 1000))
+        with lock:
+            for key, latency in local:
+                latencies.append(latency)
+                by_category.setdefault(key, []).append(latency)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run_session, range(len(conversations))))
+    elapsed = time.perf_counter() - start
+    
+    return {
+        'messages': len(latencies),
+        'errors': len(errors),
+        'first_errors': sorted(set(errors))[:5],
+        'duration_s': elapsed,
+        'throughput_msg_s': len(latencies) / elapsed if elapsed else 0.0,
+        'latency': latency_stats(latencies),
+        'latency_by_category': {key: latency_stats(values) for key, values in sorted(by_category.items())},
+    }
+
+
+def session_memory(conversations: List[List[Tuple[str, str, str]]]) -> Dict[str, float]:
+    """
+    Mémoire d'une session après sa conversation : allocations Python du
+    chatbot (tracemalloc, base de connaissances partagée exclue) et taille
+    de l'état enregistré dans le stockage des sessions (JSON)
+    """
+    from chatbot import MultilingualAgriChatbot
+    from knowledge_base import get_knowledge_base
+    
+    kb = get_knowledge_base()
+    MultilingualAgriChatbot(kb).generate_response("Bonjour")  # gabarits et index déjà chargés
+    
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    chatbots = []
+    for conversation in conversations:
+        chatbot = MultilingualAgriChatbot(kb)
+        for _, _, text in conversation:
+            chatbot.generate_response(text)
+        chatbots.append(chatbot)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    state_sizes = [len(json.dumps(chatbot.get_state(), ensure_ascii=False).encode('utf-8'))
+                   for chatbot in chatbots]
+    return {
+        'sessions': len(chatbots),
+        'python_bytes_per_session': (after - before) / max(len(chatbots), 1),
+        'state_bytes_mean': float(np.mean(state_sizes)),
+        'state_bytes_max': int(np.max(state_sizes)),
+    }
+
+
+# ========================================
+# Cibles
+# ========================================
+
+def benchmark_direct(conversations: List[List[Tuple[str, str, str]]], concurrency: int) -> Dict:
+    """MultilingualAgriChatbot dans le processus, un chatbot par session"""
+    from chatbot import MultilingualAgriChatbot
+    from knowledge_base import get_knowledge_base
+    
+    kb = get_knowledge_base()
+    chatbots = [MultilingualAgriChatbot(kb) for _ in conversations]
+    chatbots[0].generate_response("Bonjour")  # chargement paresseux hors mesure
+    chatbots[0].reset_conversation()
+    
+    result = replay(conversations, lambda index, text: chatbots[index].generate_response(text), concurrency)
+    memory_sample = conversations[:min(len(conversations), 200)]
+    result['memory'] = session_memory(memory_sample)
+    return result
+
+
+def benchmark_http(conversations: List[List[Tuple[str, str, str]]], concurrency: int,
+                   url: str = DEFAULT_URL, timeout: float = 30.0) -> Dict:
+    """POST /api/v1/chat, une session (session_id) par conversation"""
+    import requests
+    
+    endpoint = url.rstrip("/") + "/api/v1/chat"
+    run_id = uuid.uuid4().hex[:8]
+    local = threading.local()
+    
+    def send(index, text):
+        if not hasattr(local, 'http'):
+            local.http = requests.Session()
+        response = local.http.post(endpoint, json={
+            'message': text, 'session_id': f"bench-{run_id}-{index}"
+        }, timeout=timeout)
+        response.raise_for_status()
+    
+    # Serveur joignable ?
+    requests.get(url.rstrip("/") + "/", timeout=timeout).raise_for_status()
+    
+    result = replay(conversations, send, concurrency)
+    result['url'] = endpoint
+    return result
+
+
+# ========================================
+# Résultats
+# ========================================
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def save_results(results: Dict, output: Optional[str] = None) -> str:
+    if output is None:
+        name = f"chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{results['commit'] or 'nogit'}.json"
+        output = os.path.join(RESULTS_DIR, name)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return output
+
+
+def compare(results: Dict, baseline: Dict):
+    """Écarts avec un résultat précédent (latences et débit par cible)"""
+    print(f"\n📊 Comparaison avec {baseline.get('commit')} ({baseline.get('date')})")
+    for target, current in results['targets'].items():
+        previous = baseline.get('targets', {}).get(target)
+        if not previous or 'latency' not in current or 'latency' not in previous:
+            continue
+        print(f"   {target}:")
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = previous['latency'][metric], current['latency'][metric]
+            print(f"      {metric:<8} {old:8.2f} -> {new:8.2f} ms ({(new - old) / old * 100:+.1f}%)")
+        old, new = previous['throughput_msg_s'], current['throughput_msg_s']
+        print(f"      débit    {old:8.1f} -> {new:8.1f} msg/s ({(new - old) / old * 100:+.1f}%)")
+
+
+def print_result(target: str, result: Dict):
+    latency = result['latency']
+    print(f"\n⏱️  {target}: {result['messages']} messages en {result['duration_s']:.2f}s "
+          f"({result['throughput_msg_s']:.1f} msg/s), {result['errors']} erreurs")
+    if latency:
+        print(f"   p50 {latency['p50_ms']:.2f} ms | p95 {latency['p95_ms']:.2f} ms | "
+              f"p99 {latency['p99_ms']:.2f} ms | max {latency['max_ms']:.2f} ms")
+    if 'memory' in result:
+        memory = result['memory']
+        print(f"   💾 {memory['python_bytes_per_session'] / 1024:.1f} Ko par session en mémoire, "
+              f"état enregistré {memory['state_bytes_mean'] / 1024:.1f} Ko "
+              f"(max {memory['state_bytes_max'] / 1024:.1f} Ko)")
+    for error in result['first_errors']:
+        print(f"   ❌ {error}")
+
+
+def main():
+    """
+    Lancer le benchmark et enregistrer les résultats
+    """
+    parser = argparse.ArgumentParser(description="Benchmark de charge du chat AgriDetect")
+    parser.add_argument('--target', default='direct', choices=('direct', 'http', 'all'))
+    parser.add_argument('--url', default=DEFAULT_URL, help="Adresse de l'API (cible http)")
+    parser.add_argument('--sessions', type=int, default=300, help="Nombre de conversations")
+    parser.add_argument('--messages', type=int, default=len(CONVERSATION_FLOW),
+                        help="Messages par conversation")
+    parser.add_argument('--concurrency', type=int, default=8, help="Sessions en parallèle")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Fichier JSON des résultats (défaut: data/benchmarks/)")
+    parser.add_argument('--compare', metavar='JSON', help="Résultat précédent à comparer")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Benchmark de Charge du Chat")
+    print("=" * 60)
+    print(f"\n💬 {args.sessions} conversations x {args.messages} messages, "
+          f"{args.concurrency} sessions en parallèle")
+    
+    conversations = build_conversations(args.sessions, args.messages, args.seed)
+    results = {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'sessions': args.sessions,
+            'messages_per_session': args.messages,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'semantic_retrieval': os.environ.get('AGRIDETECT_SEMANTIC_RETRIEVAL', 'fallback'),
+        },
+        'targets': {},
+    }
+    
+    targets = ('direct', 'http') if args.target == 'all' else (args.target,)
+    for target in targets:
+        try:
+            if target == 'direct':
+                result = benchmark_direct(conversations, args.concurrency)
+            else:
+                result = benchmark_http(conversations, args.concurrency, args.url)
+        except ImportError as e:
+            print(f"❌ {e.name} non installé. Installez-le avec: pip install {e.name}")
+            continue
+        except Exception as e:
+            print(f"❌ Cible {target} indisponible: {e}")
+            continue
+        results['targets'][target] = result
+        print_result(target, result)
+    
+    if not results['targets']:
+        sys.exit(1)
+    
+    output = save_results(results, args.output)
+    print(f"\n✅ Résultats enregistrés dans {output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
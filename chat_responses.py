@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Réponses du chatbot AgriDetect
+Gabarits précompilés par langue et cache des réponses statiques, indexé
+par (intention, langue, entité) : seules les parties dynamiques (passages
+de la recherche sémantique) sont construites à chaque message
+"""
+
+import sys
+import time
+import tracemalloc
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from knowledge_base import LANGUAGES, KnowledgeBase, get_knowledge_base, localized
+
+
+DISEASE_TITLE = "📋 {name}:\n\n"
+DISEASE_SECTIONS = (("symptoms", "🔍 Symptômes: {}"), ("causes", "⚠️ Cause: {}"),
+                    ("crops", "🌱 Cultures affectées: {}"))
+CROP_TEMPLATE = "🌱 {name}:\n📅 Cycle: {cycle}\n💧 Arrosage: {water}"
+TREATMENT_HEADER = "{intro}\n\n🌿 Traitements biologiques:\n"
+DISEASE_HEADER = "📋 {name}\n\n"
+DETECTION_HEADER = "🔬 {detected}\n"
+ALTERNATIVES_LINE = "⚠️ Autres possibilités: {alternatives}\n"
+CROP_NOT_FOUND = "Information non trouvée pour cette culture."
+
+# Phrases communes servies telles quelles : intention -> clé des traductions
+STATIC_INTENTS = {
+    "greeting": "greetings",
+    "thanks": "thank_you",
+    "goodbye": "goodbye",
+    "general": "general_help",
+}
+
+
+class ResponseTemplates:
+    """
+    Réponses rendues une seule fois par (intention, langue, entité)
+    
+    Les réponses qui ne dépendent que de la langue sont rendues dès la
+    construction ; celles d'une maladie ou d'une culture au premier message
+    qui les demande. Le nombre de clés est borné par la base de
+    connaissances, le cache n'a donc pas besoin d'éviction.
+    """
+    
+    def __init__(self, knowledge_base: KnowledgeBase, cache: bool = True):
+        self.kb = knowledge_base
+        self.cache = cache
+        self._responses = {}
+        self._suggestions = {}
+        self._builders = {
+            "greeting": self._static,
+            "thanks": self._static,
+            "goodbye": self._static,
+            "general": self._static,
+            "need_more_info": self._need_more_info,
+            "treatment_request": self._treatments,
+            "prevention_question": self._prevention,
+            "disease_inquiry": self._disease,
+            "crop_info": self._crop,
+        }
+        
+        if cache:
+            for lang in LANGUAGES:
+                for intent in (*STATIC_INTENTS, "need_more_info", "treatment_request", "prevention_question"):
+                    self.render(intent, lang)
+    
+    def render(self, intent: str, lang: str, entity: Optional[str] = None) -> str:
+        """Texte de la réponse (depuis le cache s'il a déjà été rendu)"""
+        key = (intent, lang, entity)
+        text = self._responses.get(key)
+        if text is None:
+            text = self._builders[intent](intent, lang, entity)
+            if self.cache:
+                self._responses[key] = text
+        return text
+    
+    def suggestions(self, intent: str, lang: str) -> List[str]:
+        """Suggestions de l'intention (copie : la liste peut être modifiée par l'appelant)"""
+        key = (intent, lang)
+        suggestions = self._suggestions.get(key)
+        if suggestions is None:
+            by_intent = self.kb.suggestions.get(lang, self.kb.suggestions["fr"])
+            suggestions = tuple(by_intent.get(intent, by_intent["general"]))
+            if self.cache:
+                self._suggestions[key] = suggestions
+        return list(suggestions)
+    
+    def detection_header(self, detection: Dict, lang: str, entity: Optional[str] = None) -> str:
+        """
+        Rappel du diagnostic d'une photo (confiance, alternatives si le
+        diagnostic est incertain) ; jamais mis en cache
+        """
+        name = self.kb.diseases[entity].text(lang).name if entity in self.kb.diseases else detection["disease_name"]
+        confidence = round((detection.get("confidence") or 0) * 100)
+        header = DETECTION_HEADER.format(
+            detected=self.kb.translate("disease_detected", lang).format(disease=name, confidence=confidence)
+        )
+        if detection.get("uncertain") and detection.get("alternatives"):
+            header += ALTERNATIVES_LINE.format(alternatives=", ".join(
+                f"{alt['disease_name']} ({round((alt['confidence'] or 0) * 100)}%)"
+                for alt in detection["alternatives"]
+            ))
+        return header + "\n"
+    
+    # --- Gabarits ---
+    
+    def _static(self, intent: str, lang: str, entity: Optional[str]) -> str:
+        return self.kb.translate(STATIC_INTENTS[intent], lang)
+    
+    def _need_more_info(self, intent: str, lang: str, entity: Optional[str]) -> str:
+        return self.kb.translate("need_more_info", lang).format(topic="les symptômes")
+    
+    def _disease_header(self, lang: str, entity: Optional[str]) -> str:
+        if entity not in self.kb.diseases:
+            return ""
+        return DISEASE_HEADER.format(name=self.kb.diseases[entity].text(lang).name)
+    
+    def _treatments(self, intent: str, lang: str, entity: Optional[str]) -> str:
+        intro = self.kb.translate("treatment_recommendation", lang).format(treatment="")
+        lines = [f"• {treatment}\n" for treatment in self.kb.treatment_texts("organic", lang)[:3]]
+        return self._disease_header(lang, entity) + TREATMENT_HEADER.format(intro=intro) + "".join(lines)
+    
+    def _prevention(self, intent: str, lang: str, entity: Optional[str]) -> str:
+        # Conseils propres à la maladie s'il y en a, sinon conseils généraux
+        tips = ()
+        if entity in self.kb.diseases and self.kb.diseases[entity].prevention:
+            tips = localized(self.kb.diseases[entity].prevention, lang)
+        lines = [f"✓ {tip}\n" for tip in (tips or self.kb.prevention_tips(lang))[:5]]
+        return (self._disease_header(lang, entity) + self.kb.translate("prevention_advice", lang)
+                + "\n\n" + "".join(lines))
+    
+    def _disease(self, intent: str, lang: str, entity: Optional[str]) -> str:
+        # Sections vides omises (maladies d'init.sql sans description) ; "" si rien n'est connu
+        info = self.kb.diseases[entity].text(lang)
+        fields = {"symptoms": ", ".join(info.symptoms), "causes": info.causes,
+                  "crops": ", ".join(info.affected_crops)}
+        sections = [template.format(fields[field]) for field, template in DISEASE_SECTIONS if fields[field]]
+        if not sections:
+            return ""
+        return DISEASE_TITLE.format(name=info.name) + "\n".join(sections)
+    
+    def _crop(self, intent: str, lang: str, entity: Optional[str]) -> str:
+        if entity is None:
+            return CROP_NOT_FOUND
+        info = self.kb.crops[entity].text(lang)
+        return CROP_TEMPLATE.format(name=info.name, cycle=info.cycle, water=info.water)
+
+
+@lru_cache(maxsize=8)
+def get_response_templates(knowledge_base: KnowledgeBase) -> ResponseTemplates:
+    """Gabarits partagés par tous les chatbots utilisant cette base de connaissances"""
+    return ResponseTemplates(knowledge_base)
+
+
+# ========================================
+# Benchmark
+# ========================================
+
+def benchmark(messages: List[str], repeat: int = 500) -> Dict[str, Dict[str, float]]:
+    """
+    Latence et allocations par message de generate_response, avec les
+    réponses rendues à chaque message puis avec le cache
+    """
+    from chatbot import MultilingualAgriChatbot
+    import chatbot as chatbot_module
+    
+    kb = get_knowledge_base()
+    retrieval = chatbot_module.SEMANTIC_RETRIEVAL
+    chatbot_module.SEMANTIC_RETRIEVAL = "off"  # mesure des gabarits seuls
+    
+    results = {}
+    try:
+        for name, templates in (("sans cache", ResponseTemplates(kb, cache=False)),
+                                ("avec cache", ResponseTemplates(kb))):
+            chatbot = MultilingualAgriChatbot(kb)
+            chatbot.responses = templates
+            for message in messages:
+                chatbot.generate_response(message)
+            
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for message in messages:
+                    chatbot.generate_response(message)
+            elapsed = time.perf_counter() - start
+            
+            tracemalloc.start()
+            for message in messages:
+                chatbot.generate_response(message)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            results[name] = {
+                'us_per_message': elapsed / (repeat * len(messages)) * 1e6,
+                'peak_bytes': peak,
+            }
+    finally:
+        chatbot_module.SEMANTIC_RETRIEVAL = retrieval
+    
+    return results
+
+
+def main():
+    """
+    Mesurer le gain du cache de réponses sur le chatbot
+    """
+    messages = [
+        "Bonjour", "Merci beaucoup", "Au revoir",
+        "Quel traitement pour mes tomates?", "Comment prévenir les maladies?",
+        "J'ai des taches jaunes sur les feuilles", "Info sur le mil",
+        "Nanga def? Garab bu baax ngir xob yi", "Hol ko mi waawi haɗde ñawu?",
+    ]
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Benchmark des Réponses du Chatbot")
+    print("=" * 60)
+    print()
+    
+    results = benchmark(messages, repeat)
+    for name, stats in results.items():
+        print(f"⏱️  {name:<11} {stats['us_per_message']:7.2f} µs/message, "
+              f"pic mémoire {stats['peak_bytes'] / 1024:.1f} Ko pour {len(messages)} messages")
+    speedup = results['sans cache']['us_per_message'] / results['avec cache']['us_per_message']
+    print(f"\n🚀 Accélération: x{speedup:.2f}")
+
+
+if __name__ == "__main__":
+    main()
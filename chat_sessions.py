@@ -0,0 +1,316 @@
+"""
+Sessions de chat AgriDetect
+Historique borné par session, stocké dans Redis (partagé par tous les
+workers de l'API) ou en mémoire locale, expiration des sessions inactives,
+et écriture des messages dans chat_messages par lots en arrière-plan
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from chatbot import MultilingualAgriChatbot
+from knowledge_base import KnowledgeBase, get_knowledge_base
+
+
+REDIS_URL = os.environ.get('REDIS_URL')
+SESSION_TTL = int(os.environ.get('CHAT_SESSION_TTL', 30 * 60))
+SESSION_PREFIX = "agridetect:chat:"
+LOCAL_MAX_SESSIONS = 10000
+
+# Lots d'écriture dans chat_messages
+WRITE_BATCH_SIZE = 200
+WRITE_INTERVAL = 2.0
+WRITE_QUEUE_SIZE = 50000
+
+# Messages non écrits en base (base indisponible, file pleine)
+CHAT_LOG = os.path.join("data", "chat", "chat_messages.jsonl")
+
+
+# ========================================
+# Stockage des Sessions
+# ========================================
+
+class LocalSessionStore:
+    """
+    Sessions en mémoire du processus (un seul worker) : expiration après
+    `ttl` secondes d'inactivité et au plus `max_sessions` sessions (LRU)
+    """
+    
+    def __init__(self, ttl: int = SESSION_TTL, max_sessions: int = LOCAL_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def load(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at < time.monotonic():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return json.loads(state)
+    
+    def save(self, session_id: str, state: Dict):
+        # Sérialisé comme dans Redis : aucun objet partagé entre les requêtes
+        entry = (time.monotonic() + self.ttl, json.dumps(state, ensure_ascii=False))
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._sessions.move_to_end(session_id)
+            self._evict()
+    
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at >= now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+    
+    def __len__(self):
+        return len(self._sessions)
+
+
+class RedisSessionStore:
+    """
+    Sessions dans Redis (une clé JSON par session, expirée par Redis après
+    `ttl` secondes d'inactivité) : n'importe quel worker sert n'importe
+    quelle session
+    """
+    
+    def __init__(self, url: str, ttl: int = SESSION_TTL, prefix: str = SESSION_PREFIX):
+        import redis
+        
+        self.client = redis.Redis.from_url(url, socket_timeout=2)
+        self.ttl = ttl
+        self.prefix = prefix
+    
+    def load(self, session_id: str) -> Optional[Dict]:
+        value = self.client.get(self.prefix + session_id)
+        return json.loads(value) if value else None
+    
+    def save(self, session_id: str, state: Dict):
+        self.client.set(self.prefix + session_id, json.dumps(state, ensure_ascii=False), ex=self.ttl)
+    
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+    
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=1000))
+
+
+def create_session_store(redis_url: Optional[str] = REDIS_URL, ttl: int = SESSION_TTL,
+                         prefix: str = SESSION_PREFIX):
+    """Redis si REDIS_URL est défini et joignable, sinon stockage local"""
+    if redis_url:
+        try:
+            store = RedisSessionStore(redis_url, ttl, prefix)
+            store.client.ping()
+            return store
+        except ImportError:
+            print("❌ redis non installé. Installez-le avec: pip install redis")
+        except Exception as e:
+            print(f"⚠ Redis indisponible ({e}), sessions de chat en mémoire locale")
+    return LocalSessionStore(ttl)
+
+
+# ========================================
+# Écriture des Messages
+# ========================================
+
+def _append_chat_log(rows: List[Dict]):
+    os.makedirs(os.path.dirname(CHAT_LOG), exist_ok=True)
+    with open(CHAT_LOG, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class ChatMessageWriter:
+    """
+    Écriture des messages dans chat_messages par lots, dans un thread
+    d'arrière-plan : la requête de chat n'attend jamais la base
+    
+    Un lot part dès `batch_size` messages ou après `interval` secondes. Les
+    lots refusés par la base sont conservés dans CHAT_LOG.
+    """
+    
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE, interval: float = WRITE_INTERVAL,
+                 max_queue: int = WRITE_QUEUE_SIZE, database_url: Optional[str] = None):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.database_url = database_url
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+    
+    def add(self, row: Dict):
+        self._start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            _append_chat_log([row])
+            self.failed += 1
+    
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                row = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                row = False
+            
+            if row is None:  # close()
+                self._flush(batch)
+                return
+            if row:
+                batch.append(row)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.interval
+    
+    def _flush(self, batch: List[Dict]):
+        if not batch:
+            return
+        try:
+            from database import insert_chat_messages
+            insert_chat_messages(batch, self.database_url)
+            self.written += len(batch)
+        except Exception as e:
+            print(f"⚠ Écriture de {len(batch)} messages de chat impossible ({e}), conservés dans {CHAT_LOG}")
+            _append_chat_log(batch)
+            self.failed += len(batch)
+    
+    def close(self, timeout: float = 10.0):
+        """Écrire les messages en attente et arrêter le thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# ========================================
+# Gestionnaire de Sessions
+# ========================================
+
+class ChatSessionManager:
+    """
+    Point d'entrée du chat pour l'API : restaure l'état de la session,
+    génère la réponse, enregistre l'état (historique borné) et met les
+    messages en file d'écriture
+    
+    Le chatbot est recréé à chaque message : il ne contient que l'état de la
+    session, la base de connaissances étant partagée par le processus. Un
+    'detection_id' dans le contexte rattache la session à une détection
+    (voir detection_context) pour les questions de suivi.
+    """
+    
+    def __init__(self, store=None, writer: Optional[ChatMessageWriter] = None,
+                 knowledge_base: Optional[KnowledgeBase] = None, detections=None):
+        self.store = store if store is not None else create_session_store()
+        self.writer = writer if writer is not None else ChatMessageWriter()
+        self.knowledge_base = knowledge_base or get_knowledge_base()
+        if detections is None:
+            from detection_context import get_detection_lookup
+            detections = get_detection_lookup()
+        self.detections = detections
+    
+    def chat(self, session_id: str, message: str, context: Optional[Dict] = None,
+             user_id: Optional[str] = None, language: Optional[str] = None) -> Dict:
+        """
+        Répondre à un message dans une session (language : langue imposée,
+        sinon détectée dans le message)
+        
+        Returns:
+            Réponse de MultilingualAgriChatbot.generate_response, avec 'session_id'
+        """
+        chatbot = MultilingualAgriChatbot(self.knowledge_base)
+        state = self.store.load(session_id)
+        if state:
+            chatbot.load_state(state)
+            user_id = user_id or state.get("user_id")
+        
+        # Détection citée pour la première fois : résultat enregistré, pas de nouvelle inférence
+        detection_id = (context or {}).get("detection_id")
+        if detection_id and str(detection_id) not in (chatbot.context.get("detection_id"),
+                                                      chatbot.context.get("unknown_detection_id")):
+            detection_context = self.detections.context(detection_id)
+            if detection_context:
+                chatbot.context.pop("unknown_detection_id", None)
+                chatbot.context.update(detection_context)
+            else:
+                # Détection inconnue : oublier la précédente (autre photo) et ne plus la chercher
+                for key in ("detection_id", "detection", "disease"):
+                    chatbot.context.pop(key, None)
+                chatbot.context["unknown_detection_id"] = str(detection_id)
+        
+        response = chatbot.generate_response(message, context, language)
+        
+        state = chatbot.get_state()
+        state["user_id"] = user_id
+        self.store.save(session_id, state)
+        
+        created_at = datetime.now().isoformat()
+        common = {
+            "user_id": user_id,
+            "detection_id": state["context"].get("detection_id"),
+            "language": response["language"],
+            "intent": response["intent"],
+            "created_at": created_at,
+        }
+        self.writer.add({**common, "message_text": message, "sender": "user",
+                         "context": {"session_id": session_id, **(context or {})}})
+        self.writer.add({**common, "message_text": response["response"], "sender": "bot",
+                         "context": {"session_id": session_id, **response["context"]}})
+        
+        response["session_id"] = session_id
+        return response
+    
+    def history(self, session_id: str) -> List[Dict]:
+        """Derniers messages de la session (fenêtre bornée)"""
+        state = self.store.load(session_id)
+        return state["history"] if state else []
+    
+    def reset(self, session_id: str):
+        """Oublier une session"""
+        self.store.delete(session_id)
+    
+    def close(self):
+        self.writer.close()
+
+
+_session_manager = None
+_session_lock = threading.Lock()
+
+
+def get_session_manager() -> ChatSessionManager:
+    """Gestionnaire de sessions du processus (créé au premier appel)"""
+    global _session_manager
+    if _session_manager is None:
+        with _session_lock:
+            if _session_manager is None:
+                _session_manager = ChatSessionManager()
+    return _session_manager
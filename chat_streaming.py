@@ -0,0 +1,152 @@
+"""
+Réponses du chat AgriDetect en flux (Server-Sent Events et WebSocket)
+Le texte et les suggestions sont envoyés par morceaux dès qu'ils sont
+disponibles ; des battements de cœur gardent les connexions ouvertes sur
+les réseaux lents et les WebSockets inactives sont fermées après un délai
+"""
+
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+
+HEARTBEAT_INTERVAL = float(os.environ.get('CHAT_HEARTBEAT_INTERVAL', 15))
+IDLE_TIMEOUT = float(os.environ.get('CHAT_IDLE_TIMEOUT', 300))
+CHUNK_SIZE = 48  # caractères par morceau de texte (coupés entre deux mots)
+
+
+def response_chunks(text: str, size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Morceaux du texte d'une réponse, coupés après un espace ou un retour à
+    la ligne ; leur concaténation redonne exactement le texte
+    """
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            newline = text.find("\n", start, end)
+            space = text.rfind(" ", start, end)
+            if newline != -1:
+                end = newline + 1
+            elif space > start:
+                end = space + 1
+        yield text[start:end]
+        start = end
+
+
+async def chat_events(manager, session_id: str, message: str, context: Optional[Dict] = None,
+                      user_id: Optional[str] = None, language: Optional[str] = None,
+                      heartbeat: float = HEARTBEAT_INTERVAL) -> AsyncIterator[Dict]:
+    """
+    Événements d'une réponse : 'ping' tant que la réponse est en cours de
+    génération, puis 'meta', 'delta' (texte), 'suggestions' et 'done'
+    
+    La génération tourne dans le pool de threads : la boucle asyncio reste
+    libre pour les autres connexions.
+    """
+    loop = asyncio.get_running_loop()
+    task = loop.run_in_executor(None, manager.chat, session_id, message, context, user_id, language)
+    
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=heartbeat)
+        if done:
+            break
+        yield {"type": "ping"}
+    
+    result = task.result()
+    yield {
+        "type": "meta",
+        "session_id": session_id,
+        "language": result["language"],
+        "intent": result["intent"],
+    }
+    for chunk in response_chunks(result["response"]):
+        yield {"type": "delta", "text": chunk}
+        await asyncio.sleep(0)
+    yield {"type": "suggestions", "suggestions": result["suggestions"]}
+    yield {"type": "done", "timestamp": datetime.now().isoformat()}
+
+
+# ========================================
+# Server-Sent Events
+# ========================================
+
+def format_sse(event: Dict) -> str:
+    """Événement SSE ; les 'ping' sont des commentaires ignorés par EventSource"""
+    if event["type"] == "ping":
+        return ": ping\n\n"
+    data = json.dumps({k: v for k, v in event.items() if k != "type"}, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def sse_stream(manager, session_id: str, message: str, context: Optional[Dict] = None,
+                     user_id: Optional[str] = None, language: Optional[str] = None) -> AsyncIterator[str]:
+    """Corps d'une réponse text/event-stream"""
+    try:
+        async for event in chat_events(manager, session_id, message, context, user_id, language):
+            yield format_sse(event)
+    except Exception as e:
+        yield format_sse({"type": "error", "detail": str(e)})
+
+
+# ========================================
+# WebSocket
+# ========================================
+
+async def websocket_chat(websocket, manager, heartbeat: float = HEARTBEAT_INTERVAL,
+                         idle_timeout: float = IDLE_TIMEOUT):
+    """
+    Conversation sur une WebSocket acceptée
+    
+    Le client envoie {"message", "context"?, "user_id"?, "language"?} (ou
+    {"type": "pong"}) ;
+    chaque réponse est renvoyée sous forme d'événements JSON (voir
+    chat_events). Un 'ping' est envoyé après `heartbeat` secondes de silence
+    et la connexion est fermée après `idle_timeout` secondes sans message de
+    chat (les 'pong' ne comptent pas).
+    """
+    from starlette.websockets import WebSocketDisconnect
+    
+    loop = asyncio.get_running_loop()
+    session_id = websocket.query_params.get("session_id") or str(uuid.uuid4())
+    last_activity = loop.time()
+    
+    try:
+        while True:
+            try:
+                payload = await asyncio.wait_for(websocket.receive_json(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if loop.time() - last_activity >= idle_timeout:
+                    await websocket.close(code=1000, reason="Session inactive")
+                    return
+                await websocket.send_json({"type": "ping"})
+                continue
+            except (ValueError, KeyError):
+                await websocket.send_json({"type": "error", "detail": "Message JSON invalide"})
+                continue
+            
+            if not isinstance(payload, dict):
+                await websocket.send_json({"type": "error", "detail": "Message JSON invalide"})
+                continue
+            if payload.get("type") == "pong":
+                continue  # réponse au ping : la session reste inactive
+            last_activity = loop.time()
+            message = str(payload.get("message", "")).strip()
+            if not message:
+                await websocket.send_json({"type": "error", "detail": "Message vide"})
+                continue
+            
+            try:
+                async for event in chat_events(manager, session_id, message,
+                                               payload.get("context"), payload.get("user_id"),
+                                               payload.get("language"), heartbeat):
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        return
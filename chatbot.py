@@ -1,276 +1,191 @@
 from typing import Dict, List, Optional, Tuple
 import json
+from collections import deque
 from datetime import datetime
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, AIMessage
+import os
 import re
+import time
+import sys
 
-class MultilingualAgriChatbot:
+from knowledge_base import LANGUAGES, KnowledgeBase, get_knowledge_base
+from chat_responses import get_response_templates
+
+# ========================================
+# Détection de la Langue et de l'Intention
+# ========================================
+
+# Intents par ordre de priorité (le premier trouvé l'emporte)
+INTENT_KEYWORDS = {
+    "greeting": ["bonjour", "salut", "bonsoir", "asalaam", "jam", "hello", "hi"],
+    "disease_inquiry": ["maladie", "feebar", "ñawu", "symptôme", "tache", "feuille", "xob"],
+    "treatment_request": ["traitement", "soigner", "garab", "lekki", "médicament", "fongicide"],
+    "prevention_question": ["prévenir", "éviter", "faggu", "haɗde", "protection"],
+    "crop_info": ["tomate", "oignon", "maïs", "mil", "arachide", "mbay", "ceeb", "tigadega"],
+    "weather_concern": ["pluie", "soleil", "taw", "naaj", "temps", "climat", "saison"],
+    "thanks": ["merci", "jërëjëf", "a jaaraama", "thank"],
+    "goodbye": ["au revoir", "bye", "ba beneen", "haa yeeso", "à bientôt"]
+}
+
+# Mots-clés spécifiques à chaque langue (le français est la langue par défaut)
+LANGUAGE_KEYWORDS = {
+    "wo": ["nanga", "def", "lan", "maa", "ngi", "dëgg", "waaw", "déedéet", "ñaata", "ki"],
+    "pu": ["ko", "hol", "mi", "ɗo", "ɗum", "nde", "ɓe", "kam", "hannde", "naamne"]
+}
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class MessageMatcher:
     """
-    Chatbot multilingue pour l'assistance agricole
-    Supporte: Français, Wolof, Pulaar
+    Recherche de tous les mots-clés (intents et langues) en une seule passe
+    sur les mots du message
+    
+    Le message est découpé une fois en mots par une regex compilée, puis
+    intersecté avec le vocabulaire des mots-clés (avec les pluriels en -s/-x
+    des mots-clés d'intention). Les mots-clés sont donc comparés à des mots entiers : plus de
+    "ko" trouvé dans "kokoro" ni de "def" dans "défense". Les expressions de
+    plusieurs mots ("au revoir") sont indexées par leur premier mot.
     """
     
-    def __init__(self):
-        self.memory = ConversationBufferMemory()
-        self.current_language = "fr"
-        
-        # Base de connaissances agricoles
-        self.knowledge_base = {
-            "diseases": self._load_disease_knowledge(),
-            "treatments": self._load_treatment_knowledge(),
-            "prevention": self._load_prevention_tips(),
-            "crops": self._load_crop_info(),
-            "seasons": self._load_seasonal_advice()
-        }
-        
-        # Traductions des phrases communes
-        self.translations = {
-            "greetings": {
-                "fr": "Bonjour! Comment puis-je vous aider avec vos cultures aujourd'hui?",
-                "wo": "Asalaam aleykum! Nan laa la dimbali ci sa mbay tay?",
-                "pu": "Jam tan! Hol ko mi waawi wallude e nder gese maa hannde?"
-            },
-            "disease_detected": {
-                "fr": "J'ai détecté {disease} avec une confiance de {confidence}%",
-                "wo": "Maa gis {disease} ak wóolu {confidence}%",
-                "pu": "Mi yiɗi {disease} e goonga {confidence}%"
-            },
-            "treatment_recommendation": {
-                "fr": "Je recommande le traitement suivant: {treatment}",
-                "wo": "Maa digal ñi garab: {treatment}",
-                "pu": "Miɗo waɗdi oo lekki: {treatment}"
-            },
-            "prevention_advice": {
-                "fr": "Pour prévenir cette maladie:",
-                "wo": "Ngir faggu feebar bi:",
-                "pu": "Ngam haɗde ñawu oo:"
-            },
-            "need_more_info": {
-                "fr": "Pouvez-vous me donner plus de détails sur {topic}?",
-                "wo": "Ndax mën nga ma jox yeneen xibaar ci {topic}?",
-                "pu": "Aɗa waawi hokku am ɓeyditte e {topic}?"
-            },
-            "confirmation": {
-                "fr": "D'accord, je comprends.",
-                "wo": "Waaw, xam naa.",
-                "pu": "Eey, mi faamii."
-            },
-            "thank_you": {
-                "fr": "Je vous en prie! N'hésitez pas si vous avez d'autres questions.",
-                "wo": "Amul solo! Bul taar laajte yeneen laaj.",
-                "pu": "Alaa nde caahu! Woto naamne ngam goɗɗe naamne."
-            }
-        }
-        
-        # Intents et patterns
-        self.intent_patterns = {
-            "greeting": r"(bonjour|salut|bonsoir|asalaam|jam|hello|hi)",
-            "disease_inquiry": r"(maladie|feebar|ñawu|symptôme|tache|feuille|xob)",
-            "treatment_request": r"(traitement|soigner|garab|lekki|médicament|fongicide)",
-            "prevention_question": r"(prévenir|éviter|faggu|haɗde|protection)",
-            "crop_info": r"(tomate|oignon|maïs|mil|arachide|mbay|ceeb|tigadega)",
-            "weather_concern": r"(pluie|soleil|taw|naaj|temps|climat|saison)",
-            "thanks": r"(merci|jërëjëf|a jaaraama|thank)",
-            "goodbye": r"(au revoir|bye|ba beneen|haa yeeso|à bientôt)"
-        }
+    def __init__(self, intent_keywords: Dict, language_keywords: Dict):
+        self.intents = list(intent_keywords)
+        self.languages = list(language_keywords)
+        
+        # mot -> [(expression à vérifier ou None, intent, langue, mot-clé)]
+        self.index = {}
+        for intent, keywords in intent_keywords.items():
+            for keyword in keywords:
+                self._add(keyword, intent, None)
+        for language, keywords in language_keywords.items():
+            for keyword in keywords:
+                self._add(keyword, None, language)
+        self.vocabulary = frozenset(self.index)
     
-    def _load_disease_knowledge(self) -> Dict:
-        """Charge la base de connaissances sur les maladies"""
-        return {
-            "mildiou": {
-                "fr": {
-                    "name": "Mildiou",
-                    "symptoms": ["Taches jaunes sur les feuilles", "Moisissure blanche au revers", "Flétrissement"],
-                    "causes": "Champignon favorisé par l'humidité",
-                    "affected_crops": ["Tomate", "Pomme de terre", "Oignon"]
-                },
-                "wo": {
-                    "name": "Mildiou",
-                    "symptoms": ["Tàkk yu mboq ci xob yi", "Puur yu weex ci ginnaaw xob bi", "Xob yi di wow"],
-                    "causes": "Funŋus buy gënal ndox",
-                    "affected_crops": ["Tomate", "Pomme de terre", "Soble"]
-                },
-                "pu": {
-                    "name": "Mildiou",
-                    "symptoms": ["Tache raneeje e leeɗe", "Huɗo peewo les leeɗe", "Leeɗe ɗe koosa"],
-                    "causes": "Ñawu funŋus diga ndiyam",
-                    "affected_crops": ["Tomate", "Pomme de terre", "Albasal"]
-                }
-            },
-            "rouille": {
-                "fr": {
-                    "name": "Rouille",
-                    "symptoms": ["Pustules orangées", "Jaunissement des feuilles", "Chute prématurée"],
-                    "causes": "Champignon de type rouille",
-                    "affected_crops": ["Maïs", "Blé", "Haricot"]
-                },
-                "wo": {
-                    "name": "Xonq",
-                    "symptoms": ["Poor yu xonq", "Xob yi di mboq", "Xob yi di daanu"],
-                    "causes": "Funŋus xonq",
-                    "affected_crops": ["Mbay", "Dugub", "Niébé"]
-                }
-            }
-        }
+    def _add(self, keyword: str, intent: Optional[str], language: Optional[str]):
+        words = TOKEN_PATTERN.findall(keyword.lower())
+        phrase = " ".join(words)
+        forms = [words[0]]
+        if intent and len(words) == 1 and len(phrase) > 3:
+            forms += [phrase + "s", phrase + "x"]
+        for form in forms:
+            self.index.setdefault(form, []).append((phrase if len(words) > 1 else None,
+                                                    intent, language, phrase))
     
-    def _load_treatment_knowledge(self) -> Dict:
-        """Charge la base de connaissances sur les traitements"""
-        return {
-            "organic": {
-                "fr": {
-                    "neem": "Huile de Neem - Pulvériser tous les 7 jours",
-                    "copper": "Bouillie bordelaise - Application préventive",
-                    "soap": "Savon noir dilué - Contre les insectes",
-                    "ash": "Cendre de bois - Saupoudrer autour des plants"
-                },
-                "wo": {
-                    "neem": "Diw Neem - Soppi ko 7 fan",
-                    "copper": "Garab kuivre - Soppi ko balaa feebar bi",
-                    "soap": "Saabun ñuul - Ngir gunóor yi",
-                    "ash": "Tandarma - Saasal ko wër mbay mi"
-                },
-                "pu": {
-                    "neem": "Neɓɓam Neem - Wurta nder 7 ñalawma",
-                    "copper": "Lekki kuivre - Huutoro ko adii ñawu",
-                    "soap": "Saabun ɓalewo - Fayde kuɓe",
-                    "ash": "Toɓɓere - Wurta dow gese"
-                }
-            },
-            "chemical": {
-                "fr": {
-                    "systemic": "Fongicide systémique - Suivre les doses recommandées",
-                    "contact": "Fongicide de contact - Application foliaire",
-                    "insecticide": "Insecticide - Respecter le délai avant récolte"
-                }
-            }
-        }
+    def match(self, text: str) -> Tuple[Optional[str], Dict[str, int]]:
+        """
+        Intent prioritaire et nombre de mots-clés distincts par langue
+        
+        Returns:
+            (intent ou None, {langue: score})
+        """
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        intents_found = set()
+        language_hits = set()
+        joined = None
+        
+        for word in self.vocabulary.intersection(tokens):
+            for phrase, intent, language, keyword in self.index[word]:
+                if phrase:
+                    if joined is None:
+                        joined = f" {' '.join(tokens)} "
+                    if f" {phrase} " not in joined:
+                        continue
+                if intent:
+                    intents_found.add(intent)
+                else:
+                    language_hits.add((language, keyword))
+        
+        intent = next((name for name in self.intents if name in intents_found), None)
+        scores = dict.fromkeys(self.languages, 0)
+        for language, _ in language_hits:
+            scores[language] += 1
+        return intent, scores
     
-    def _load_prevention_tips(self) -> Dict:
-        """Charge les conseils de prévention"""
-        return {
-            "general": {
-                "fr": [
-                    "Rotation des cultures tous les 3 ans",
-                    "Espacement adéquat entre les plants",
-                    "Drainage du sol approprié",
-                    "Élimination des plants malades",
-                    "Utilisation de variétés résistantes"
-                ],
-                "wo": [
-                    "Soppi mbay mi 3 at",
-                    "Diggante bu baax ci mbay yi",
-                    "Suuf si ndox du des",
-                    "Dindi mbay yu feebar",
-                    "Jëfandikoo mbay yu mën feebar yi"
-                ],
-                "pu": [
-                    "Waylude gese nder 3 duuɓi",
-                    "Seedto gese fof",
-                    "Ƴeew ndiyam e leydi",
-                    "Ittu gese dogataake",
-                    "Huutoro gese tammitooje"
-                ]
-            },
-            "seasonal": {
-                "rainy": {
-                    "fr": "Pendant la saison des pluies, augmenter l'espacement et améliorer le drainage",
-                    "wo": "Ci jamono taw bi, yokk diggante gi te baaxal ndox bi di génne",
-                    "pu": "E ndungu, ɓeydu seedgol e moƴƴin ndiyam"
-                },
-                "dry": {
-                    "fr": "En saison sèche, arroser tôt le matin ou tard le soir",
-                    "wo": "Ci jamono tanqaay bi, tëj teel ci suba walla ngoon",
-                    "pu": "E ceeɗu, wurin subaka walla kiikiiɗe"
-                }
-            }
-        }
+    @staticmethod
+    def pick_language(scores: Dict[str, int], default: str = "fr") -> str:
+        """Langue au score strictement le plus élevé, sinon la langue par défaut"""
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if ranked and ranked[0][1] > 0 and (len(ranked) == 1 or ranked[0][1] > ranked[1][1]):
+            return ranked[0][0]
+        return default
+
+
+MESSAGE_MATCHER = MessageMatcher(INTENT_KEYWORDS, LANGUAGE_KEYWORDS)
+
+# Messages conservés dans l'historique d'une session (utilisateur + bot)
+HISTORY_WINDOW = 10
+
+# Recherche sémantique (semantic_index) quand les mots-clés ne suffisent pas : 'fallback' ou 'off'
+SEMANTIC_RETRIEVAL = os.environ.get('AGRIDETECT_SEMANTIC_RETRIEVAL', 'fallback')
+
+# Identification de la langue : 'model' (language_id, n-grammes de caractères) ou 'keywords'
+LANGUAGE_DETECTION = os.environ.get('AGRIDETECT_LANGUAGE_ID', 'model')
+
+
+def identify_language(text: str, scores: Dict[str, int]) -> str:
+    """
+    Langue du message (modèle de language_id s'il a été entraîné, sinon
+    mots-clés de LANGUAGE_KEYWORDS)
+    """
+    if LANGUAGE_DETECTION == "model":
+        from language_id import get_language_identifier
+        identifier = get_language_identifier()
+        if identifier is not None:
+            return identifier.identify_one(text)
+    return MESSAGE_MATCHER.pick_language(scores)
+
+
+class MultilingualAgriChatbot:
+    """
+    Chatbot multilingue pour l'assistance agricole
+    Supporte: Français, Wolof, Pulaar
+    """
     
-    def _load_crop_info(self) -> Dict:
-        """Charge les informations sur les cultures"""
-        return {
-            "tomato": {
-                "fr": {"name": "Tomate", "cycle": "90-120 jours", "water": "Régulier"},
-                "wo": {"name": "Tomate", "cycle": "90-120 fan", "water": "Tëj ko saa yu nekk"},
-                "pu": {"name": "Tomate", "cycle": "90-120 ñalawma", "water": "Wurin sahaa fof"}
-            },
-            "onion": {
-                "fr": {"name": "Oignon", "cycle": "120-150 jours", "water": "Modéré"},
-                "wo": {"name": "Soble", "cycle": "120-150 fan", "water": "Tëj ko ndank"},
-                "pu": {"name": "Albasal", "cycle": "120-150 ñalawma", "water": "Wurin seeɗa"}
-            },
-            "maize": {
-                "fr": {"name": "Maïs", "cycle": "80-100 jours", "water": "Important au début"},
-                "wo": {"name": "Mbay", "cycle": "80-100 fan", "water": "Ndox bu bari ci tàmbali"},
-                "pu": {"name": "Gawri", "cycle": "80-100 ñalawma", "water": "Ndiyam heewi fuɗɗoode"}
-            }
-        }
+    def __init__(self, knowledge_base: Optional[KnowledgeBase] = None):
+        # État propre à la session ; la base de connaissances est partagée
+        self.history = deque(maxlen=HISTORY_WINDOW)
+        self.current_language = "fr"
+        self.context = {}
+        self.knowledge_base = knowledge_base or get_knowledge_base()
+        self.responses = get_response_templates(self.knowledge_base)
     
-    def _load_seasonal_advice(self) -> Dict:
-        """Charge les conseils saisonniers"""
-        return {
-            "planting": {
-                "fr": "Meilleure période de plantation: début de la saison des pluies",
-                "wo": "Jamono bu gën ci jël: tàmbalit taw bi",
-                "pu": "Sahaa moƴƴo hokkude: fuɗɗoode ndungu"
-            },
-            "harvest": {
-                "fr": "Récolter tôt le matin quand il fait frais",
-                "wo": "Góob teel ci suba bu sedd bi",
-                "pu": "Roƴƴo subaka nde yahdi woni"
-            }
-        }
+    def analyze_message(self, text: str) -> Tuple[str, str]:
+        """Détecte la langue et l'intention du message en une seule passe"""
+        intent, scores = MESSAGE_MATCHER.match(text)
+        return identify_language(text, scores), intent or "general"
     
     def detect_language(self, text: str) -> str:
         """Détecte la langue du message"""
-        # Mots-clés spécifiques à chaque langue
-        wolof_keywords = ["nanga", "def", "lan", "maa", "ngi", "dëgg", "waaw", "déedéet", "ñaata", "ki"]
-        pulaar_keywords = ["ko", "hol", "mi", "ɗo", "ɗum", "nde", "ɓe", "kam", "hannde", "naamne"]
-        
-        text_lower = text.lower()
-        
-        # Compter les mots de chaque langue
-        wolof_count = sum(1 for word in wolof_keywords if word in text_lower)
-        pulaar_count = sum(1 for word in pulaar_keywords if word in text_lower)
-        
-        if wolof_count > pulaar_count and wolof_count > 0:
-            return "wo"
-        elif pulaar_count > wolof_count and pulaar_count > 0:
-            return "pu"
-        else:
-            return "fr"  # Français par défaut
+        return self.analyze_message(text)[0]
     
     def detect_intent(self, text: str) -> str:
         """Détecte l'intention du message"""
-        text_lower = text.lower()
-        
-        for intent, pattern in self.intent_patterns.items():
-            if re.search(pattern, text_lower):
-                return intent
-        
-        return "general"
+        return self.analyze_message(text)[1]
     
-    def generate_response(self, message: str, context: Optional[Dict] = None) -> Dict:
+    def generate_response(self, message: str, context: Optional[Dict] = None,
+                          language: Optional[str] = None) -> Dict:
         """
         Génère une réponse au message de l'utilisateur
+        
+        language: langue imposée par le client (fr, wo, pu) ; sinon, ou si
+        elle n'est pas prise en charge, la langue détectée dans le message
         """
-        # Détecter la langue
-        detected_language = self.detect_language(message)
+        # Détecter la langue et l'intention
+        detected_language, intent = self.analyze_message(message)
+        if language in LANGUAGES:
+            detected_language = language
         self.current_language = detected_language
         
-        # Détecter l'intention
-        intent = self.detect_intent(message)
-        
-        # Préparer le contexte
-        if context is None:
-            context = {}
+        # Préparer le contexte (celui de la session, complété par la requête)
+        context = {**self.context, **(context or {})}
         
         # Générer la réponse selon l'intention
         response = self._handle_intent(intent, message, context)
         
-        # Ajouter à la mémoire
-        self.memory.chat_memory.add_user_message(message)
-        self.memory.chat_memory.add_ai_message(response["text"])
+        # Ajouter à l'historique (fenêtre bornée) et au contexte de la session
+        self.history.append({"sender": "user", "text": message, "intent": intent})
+        self.history.append({"sender": "bot", "text": response["text"], "intent": intent})
+        self.context.update(response.get("context", {}))
         
         # Préparer les suggestions
         suggestions = self._get_suggestions(intent, detected_language)
@@ -287,143 +202,123 @@ class MultilingualAgriChatbot:
     def _handle_intent(self, intent: str, message: str, context: Dict) -> Dict:
         """Gère les différentes intentions"""
         lang = self.current_language
+        responses = self.responses
         
-        if intent == "greeting":
-            return {"text": self.translations["greetings"][lang]}
+        if intent in ("greeting", "thanks", "goodbye"):
+            return {"text": responses.render(intent, lang)}
         
         elif intent == "disease_inquiry":
             # Chercher des informations sur les maladies mentionnées
-            disease_info = self._extract_disease_info(message, lang)
-            if disease_info:
-                return {"text": disease_info, "context": {"topic": "disease"}}
+            # (une maladie sans description, venue d'init.sql, ne suffit pas)
+            disease = self.knowledge_base.find_disease(message)
+            text = responses.render(intent, lang, disease.key) if disease else ""
+            if text:
+                return {"text": text, "context": {"topic": "disease", "disease": disease.key}}
+            elif context.get("detection"):
+                # Question sur la photo déjà analysée
+                return self._describe_detection(context, lang)
             else:
-                return {"text": self.translations["need_more_info"][lang].format(topic="les symptômes")}
+                return (self._retrieve_answer(message, lang)
+                        or {"text": responses.render("need_more_info", lang)})
         
         elif intent == "treatment_request":
             # Proposer des traitements
             treatment_info = self._get_treatment_recommendations(context.get("disease"), lang)
-            return {"text": treatment_info, "context": {"topic": "treatment"}}
+            return {"text": self._detection_header(context, lang) + treatment_info,
+                    "context": {"topic": "treatment"}}
         
         elif intent == "prevention_question":
             # Donner des conseils de prévention
-            prevention_tips = self._get_prevention_tips(lang)
-            return {"text": prevention_tips, "context": {"topic": "prevention"}}
+            prevention_tips = self._get_prevention_tips(lang, context.get("disease"))
+            return {"text": self._detection_header(context, lang) + prevention_tips,
+                    "context": {"topic": "prevention"}}
         
         elif intent == "crop_info":
             # Informations sur les cultures
             crop_info = self._extract_crop_info(message, lang)
             return {"text": crop_info, "context": {"topic": "crop"}}
         
-        elif intent == "thanks":
-            return {"text": self.translations["thank_you"][lang]}
-        
-        elif intent == "goodbye":
-            goodbye_messages = {
-                "fr": "Au revoir et bonne culture! 🌱",
-                "wo": "Ba beneen yoon! Mbay bu baax! 🌱",
-                "pu": "Haa yeeso! Gese moƴƴe! 🌱"
-            }
-            return {"text": goodbye_messages[lang]}
-        
         else:
-            # Réponse générale
-            return self._generate_general_response(message, lang)
+            # Passages proches du message, sinon réponse générale
+            return self._retrieve_answer(message, lang) or self._generate_general_response(message, lang)
     
     def _extract_disease_info(self, message: str, lang: str) -> str:
         """Extrait et retourne les informations sur les maladies"""
-        message_lower = message.lower()
-        
-        for disease_key, disease_data in self.knowledge_base["diseases"].items():
-            if disease_key in message_lower or any(symptom.lower() in message_lower 
-                                                  for symptom in disease_data.get(lang, disease_data["fr"])["symptoms"]):
-                info = disease_data.get(lang, disease_data["fr"])
-                response = f"📋 {info['name']}:\n\n"
-                response += f"🔍 Symptômes: {', '.join(info['symptoms'])}\n"
-                response += f"⚠️ Cause: {info['causes']}\n"
-                response += f"🌱 Cultures affectées: {', '.join(info['affected_crops'])}"
-                return response
-        
-        return ""
+        disease = self.knowledge_base.find_disease(message)
+        return self.responses.render("disease_inquiry", lang, disease.key) if disease else ""
     
     def _get_treatment_recommendations(self, disease: Optional[str], lang: str) -> str:
         """Génère des recommandations de traitement"""
-        treatments = self.knowledge_base["treatments"]["organic"].get(lang, 
-                                                                     self.knowledge_base["treatments"]["organic"]["fr"])
-        
-        response = self.translations["treatment_recommendation"][lang].format(treatment="") + "\n\n"
-        response += "🌿 Traitements biologiques:\n"
-        
-        for key, treatment in list(treatments.items())[:3]:
-            response += f"• {treatment}\n"
-        
-        return response
+        return self.responses.render("treatment_request", lang, disease)
     
-    def _get_prevention_tips(self, lang: str) -> str:
+    def _get_prevention_tips(self, lang: str, disease: Optional[str] = None) -> str:
         """Génère des conseils de prévention"""
-        tips = self.knowledge_base["prevention"]["general"].get(lang, 
-                                                               self.knowledge_base["prevention"]["general"]["fr"])
-        
-        response = self.translations["prevention_advice"][lang] + "\n\n"
-        for tip in tips[:5]:
-            response += f"✓ {tip}\n"
-        
-        return response
+        return self.responses.render("prevention_question", lang, disease)
+    
+    def _detection_header(self, context: Dict, lang: str) -> str:
+        """Rappel du diagnostic si la conversation porte sur la maladie détectée"""
+        detection = context.get("detection")
+        if not detection or context.get("disease") != detection.get("disease"):
+            return ""
+        return self.responses.detection_header(detection, lang, context.get("disease"))
+    
+    def _describe_detection(self, context: Dict, lang: str) -> Dict:
+        """Diagnostic de la photo (résultat enregistré, sans nouvelle inférence)"""
+        detection = context["detection"]
+        disease = detection.get("disease")
+        text = self.responses.detection_header(detection, lang, disease)
+        if disease in self.knowledge_base.diseases:
+            text += self.responses.render("disease_inquiry", lang, disease)
+        return {"text": text.rstrip("\n"), "context": {"topic": "disease", "disease": disease}}
     
     def _extract_crop_info(self, message: str, lang: str) -> str:
         """Extrait les informations sur les cultures"""
-        message_lower = message.lower()
-        
-        for crop_key, crop_data in self.knowledge_base["crops"].items():
-            crop_info = crop_data.get(lang, crop_data["fr"])
-            if crop_info["name"].lower() in message_lower:
-                response = f"🌱 {crop_info['name']}:\n"
-                response += f"📅 Cycle: {crop_info['cycle']}\n"
-                response += f"💧 Arrosage: {crop_info['water']}"
-                return response
-        
-        return "Information non trouvée pour cette culture."
+        crop = self.knowledge_base.find_crop(message)
+        return self.responses.render("crop_info", lang, crop.key if crop else None)
+    
+    def _retrieve_answer(self, message: str, lang: str) -> Optional[Dict]:
+        """Réponse à partir des passages les plus proches (recherche sémantique)"""
+        if SEMANTIC_RETRIEVAL == "off":
+            return None
+        
+        from semantic_index import get_retriever
+        passages = get_retriever().retrieve(message, lang)
+        if not passages:
+            return None
+        
+        text = "🔎 " + "\n\n".join(passage["text"] for passage in passages)
+        return {"text": text, "context": {
+            "topic": "retrieval",
+            "passages": [f"{passage['kind']}:{passage['key']}" for passage in passages]
+        }}
     
     def _generate_general_response(self, message: str, lang: str) -> Dict:
         """Génère une réponse générale"""
-        general_responses = {
-            "fr": "Je suis là pour vous aider avec vos questions agricoles. Que souhaitez-vous savoir?",
-            "wo": "Maa ngi fi ngir dimbali la ci sa laaj yu mbay. Lan nga bëgg xam?",
-            "pu": "Miɗo ɗoo ngam wallude e naamne maa gese. Hol ko njiɗ-ɗaa faamde?"
-        }
-        
-        return {"text": general_responses[lang]}
+        return {"text": self.responses.render("general", lang)}
     
     def _get_suggestions(self, intent: str, lang: str) -> List[str]:
         """Génère des suggestions contextuelles"""
-        suggestions_map = {
-            "fr": {
-                "greeting": ["Détecter une maladie", "Conseils de prévention", "Traitements biologiques"],
-                "disease_inquiry": ["Voir les traitements", "Mesures préventives", "Cultures affectées"],
-                "treatment_request": ["Dosage recommandé", "Alternatives biologiques", "Précautions"],
-                "prevention_question": ["Calendrier cultural", "Rotation des cultures", "Variétés résistantes"],
-                "general": ["Aide sur les maladies", "Conseils saisonniers", "Guide de culture"]
-            },
-            "wo": {
-                "greeting": ["Xool feebar", "Digal ci faggu", "Garab yu naturel"],
-                "disease_inquiry": ["Xool garab yi", "Faggu feebar bi", "Mbay yu mën feebar"],
-                "treatment_request": ["Ñaata laa war a jël", "Yeneen garab", "Moytu yi"],
-                "general": ["Ndimbal ci feebar yi", "Digal ci jamono", "Yoon wi ngir mbay"]
-            },
-            "pu": {
-                "greeting": ["Yiɗ ñawu", "Ballal haɗde", "Lekki safrooɗi"],
-                "disease_inquiry": ["Yiɗ lekki", "Haɗde ñawu", "Gese dogataake"],
-                "treatment_request": ["No foti huutoraade", "Goɗɗe lekki", "Reentaade"],
-                "general": ["Ballal e ñawɗe", "Ballal sahaa", "Ardude gese"]
-            }
-        }
-        
-        default_suggestions = suggestions_map.get(lang, suggestions_map["fr"])
-        return default_suggestions.get(intent, default_suggestions["general"])
+        return self.responses.suggestions(intent, lang)
     
     def reset_conversation(self):
         """Réinitialise la conversation"""
-        self.memory.clear()
+        self.history.clear()
         self.current_language = "fr"
+        self.context = {}
+    
+    def get_state(self) -> Dict:
+        """État de la session, sérialisable en JSON (voir chat_sessions)"""
+        return {
+            "language": self.current_language,
+            "history": list(self.history),
+            "context": self.context
+        }
+    
+    def load_state(self, state: Dict):
+        """Restaure l'état d'une session enregistré par get_state"""
+        self.current_language = state.get("language", "fr")
+        self.history = deque(state.get("history", []), maxlen=HISTORY_WINDOW)
+        self.context = dict(state.get("context", {}))
 
 # Fonction de test
 def test_chatbot():
@@ -448,5 +343,63 @@ def test_chatbot():
         print(f"💡 Suggestions: {', '.join(response['suggestions'][:2])}")
         print("-" * 50)
 
+def benchmark_matcher(repeat: int = 2000):
+    """
+    Micro-benchmark de la détection langue + intention : recherche regex par
+    intent et sous-chaînes par langue (ancienne méthode) contre MessageMatcher
+    """
+    corpus = [
+        "Bonjour, j'ai des taches sur mes tomates",
+        "Asalaam aleykum, sama tomate yi am na tàkk",
+        "Hol ko mi waawi wallude e albasal am?",
+        "Comment traiter le mildiou sur mes oignons?",
+        "Quel fongicide utiliser contre la rouille du maïs?",
+        "Nanga def? Xob yi dañuy mboq, lan laa war def?",
+        "Ñawu nde e leeɗe, hol ko mi waɗa hannde?",
+        "Comment prévenir les maladies pendant la saison des pluies?",
+        "Merci beaucoup pour votre aide",
+        "Au revoir et à bientôt",
+        "Jërëjëf, ba beneen yoon",
+        "Mes feuilles de mil jaunissent depuis une semaine, que faire?",
+    ]
+    legacy_patterns = {
+        intent: "(" + "|".join(keywords) + ")" for intent, keywords in INTENT_KEYWORDS.items()
+    }
+    
+    def legacy(text):
+        text_lower = text.lower()
+        counts = {language: sum(1 for word in keywords if word in text_lower)
+                  for language, keywords in LANGUAGE_KEYWORDS.items()}
+        intent = next((name for name, pattern in legacy_patterns.items()
+                       if re.search(pattern, text_lower)), "general")
+        return counts, intent
+    
+    def compiled(text):
+        return MESSAGE_MATCHER.match(text)
+    
+    print(f"=== Benchmark détection langue + intention ({len(corpus)} messages x {repeat}) ===\n")
+    timings = {}
+    for name, function in (("regex par intent", legacy), ("MessageMatcher", compiled)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in corpus:
+                function(text)
+        elapsed = time.perf_counter() - start
+        timings[name] = elapsed
+        per_message = elapsed / (repeat * len(corpus)) * 1e6
+        print(f"⏱️  {name:<18} {per_message:7.2f} µs/message  ({elapsed:.3f}s)")
+    
+    print(f"\n🚀 Accélération: x{timings['regex par intent'] / timings['MessageMatcher']:.1f}")
+    
+    print("\n=== Résultats (langue, intention) ===\n")
+    for text in corpus:
+        intent, scores = MESSAGE_MATCHER.match(text)
+        language = MESSAGE_MATCHER.pick_language(scores)
+        print(f"{language}  {intent or 'general':<20} {text}")
+
+
 if __name__ == "__main__":
-    test_chatbot()
+    if "--benchmark" in sys.argv:
+        benchmark_matcher()
+    else:
+        test_chatbot()
@@ -6,9 +6,15 @@ Vérifie que tout est prêt pour l'entraînement du modèle
 
 import os
 import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import tensorflow as tf
 from PIL import Image
 
+from dataset_manifest import build_manifest, class_counts, split_entries, absolute_path
+
 
 def check_tensorflow():
     """Vérifier TensorFlow"""
@@ -46,31 +52,13 @@ def check_data_structure(data_dir="data"):
     return all_ok
 
 
-def count_images(data_dir="data"):
-    """Compter les images par classe"""
+def count_images(data_dir="data", entries=None):
+    """Compter les images par classe (à partir du manifest)"""
     print("📊 Statistiques du dataset...")
     
-    stats = {}
-    splits = ['train', 'validation', 'test']
-    
-    for split in splits:
-        split_dir = os.path.join(data_dir, split)
-        if not os.path.exists(split_dir):
-            continue
-        
-        stats[split] = {}
-        
-        # Pour chaque classe
-        for class_name in os.listdir(split_dir):
-            class_path = os.path.join(split_dir, class_name)
-            
-            if not os.path.isdir(class_path):
-                continue
-            
-            # Compter les images
-            images = [f for f in os.listdir(class_path) 
-                     if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            stats[split][class_name] = len(images)
+    if entries is None:
+        entries = build_manifest(data_dir, verbose=False)
+    stats = class_counts(entries)
     
     # Afficher les stats
     all_classes = set()
@@ -129,53 +117,45 @@ def count_images(data_dir="data"):
     return total_train > 0
 
 
-def check_image_quality(data_dir="data", sample_size=10):
+def check_image_quality(data_dir="data", sample_size=10, entries=None):
     """Vérifier la qualité des images"""
     print("🖼️  Vérification de la qualité des images...")
     
-    train_dir = os.path.join(data_dir, "train")
-    if not os.path.exists(train_dir):
-        print("   ❌ Dossier train non trouvé")
-        return False
-    
-    # Trouver des images à échantillonner
-    sample_images = []
-    for class_name in os.listdir(train_dir):
-        class_path = os.path.join(train_dir, class_name)
-        if not os.path.isdir(class_path):
-            continue
-        
-        images = [f for f in os.listdir(class_path)
-                 if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-        
-        # Prendre quelques images
-        sample_images.extend([os.path.join(class_path, img) 
-                            for img in images[:min(2, len(images))]])
-    
-    if not sample_images:
+    if entries is None:
+        entries = build_manifest(data_dir, verbose=False)
+    train_entries = split_entries(entries, 'train')
+    if not train_entries:
         print("   ❌ Aucune image trouvée")
         return False
     
+    # Prendre quelques images par classe (dimensions et mode lus depuis le manifest)
+    per_class = {}
+    for entry in train_entries:
+        samples = per_class.setdefault(entry['class'], [])
+        if len(samples) < 2:
+            samples.append(entry)
+    sample_images = [entry for samples in per_class.values() for entry in samples]
+    
     # Vérifier les images
     issues = []
     sizes = []
     
-    for img_path in sample_images[:sample_size]:
-        try:
-            img = Image.open(img_path)
-            width, height = img.size
-            sizes.append((width, height))
-            
-            # Vérifier la taille
-            if width < 224 or height < 224:
-                issues.append(f"Image trop petite: {os.path.basename(img_path)} ({width}x{height})")
-            
-            # Vérifier le format
-            if img.mode not in ['RGB', 'L']:
-                issues.append(f"Format inhabituel: {os.path.basename(img_path)} ({img.mode})")
-            
-        except Exception as e:
-            issues.append(f"Erreur lors de l'ouverture de {os.path.basename(img_path)}: {e}")
+    for entry in sample_images[:sample_size]:
+        name = os.path.basename(entry['path'])
+        if entry['width'] is None:
+            issues.append(f"Erreur lors de l'ouverture de {name}")
+            continue
+        
+        width, height = entry['width'], entry['height']
+        sizes.append((width, height))
+        
+        # Vérifier la taille
+        if width < 224 or height < 224:
+            issues.append(f"Image trop petite: {name} ({width}x{height})")
+        
+        # Vérifier le format
+        if entry['mode'] not in ['RGB', 'L']:
+            issues.append(f"Format inhabituel: {name} ({entry['mode']})")
     
     # Résumé
     if sizes:
@@ -200,6 +180,217 @@ def check_image_quality(data_dir="data", sample_size=10):
     return len(issues) == 0
 
 
+# ========================================
+# Scan Complet d'Intégrité et de Qualité
+# ========================================
+
+HASH_BANDS = 4  # Découpage du hash perceptuel 64 bits pour la recherche de voisins
+NEAR_DUPLICATE_DISTANCE = 3  # Distance de Hamming maximale (< HASH_BANDS)
+OUTLIER_Z = 3.5  # Seuil du z-score robuste (médiane / MAD)
+
+
+def _difference_hash(gray):
+    """Hash perceptuel dHash 64 bits d'une image en niveaux de gris"""
+    small = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def _scan_image(path, decode=False):
+    """
+    Vérifier une image (exécuté dans un processus du pool)
+    
+    Sans décodage : en-tête, mode couleur et marqueur de fin JPEG.
+    Avec décodage : lecture complète des pixels, hash perceptuel,
+    netteté (variance du laplacien) et exposition.
+    """
+    result = {'issues': []}
+    
+    try:
+        with Image.open(path) as img:
+            image_format, mode = img.format, img.mode
+            has_alpha = mode in ('RGBA', 'LA') or (mode == 'P' and 'transparency' in img.info)
+            img.verify()
+    except Exception as e:
+        result['issues'].append(f"corrompue: {e}")
+        return result
+    
+    if mode in ('L', 'LA', '1', 'I', 'F'):
+        result['issues'].append(f"niveaux de gris ({mode})")
+    elif mode == 'CMYK':
+        result['issues'].append("CMYK")
+    if has_alpha:
+        result['issues'].append(f"canal alpha ({mode})")
+    
+    # JPEG tronqué : le fichier doit se terminer par le marqueur EOI (FFD9)
+    if image_format == 'JPEG':
+        with open(path, 'rb') as f:
+            f.seek(max(0, os.path.getsize(path) - 64))
+            if b'\xff\xd9' not in f.read():
+                result['issues'].append("JPEG tronqué (marqueur de fin absent)")
+    
+    if not decode:
+        return result
+    
+    try:
+        with Image.open(path) as img:
+            img.load()
+            gray = img.convert('L')
+    except Exception as e:
+        result['issues'].append(f"décodage impossible: {e}")
+        return result
+    
+    pixels = np.asarray(gray.resize((256, 256), Image.BILINEAR), dtype=np.float32)
+    laplacian = (pixels[1:-1, :-2] + pixels[1:-1, 2:] + pixels[:-2, 1:-1]
+                 + pixels[2:, 1:-1] - 4 * pixels[1:-1, 1:-1])
+    result['dhash'] = _difference_hash(gray)
+    result['sharpness'] = float(laplacian.var())
+    result['brightness'] = float(pixels.mean())
+    result['clipped'] = float(np.mean((pixels <= 5) | (pixels >= 250)))
+    return result
+
+
+def _robust_outliers(values, z=OUTLIER_Z):
+    """Indices dont le z-score robuste (médiane / MAD) dépasse z, avec leur signe"""
+    values = np.asarray(values, dtype=np.float64)
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * 1.4826
+    if mad == 0:
+        return np.zeros(len(values)), []
+    scores = (values - median) / mad
+    return scores, [i for i in np.flatnonzero(np.abs(scores) > z)]
+
+
+def _group_by(items, key):
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+
+def _near_duplicate_pairs(hashes):
+    """
+    Paires d'images dont les hash perceptuels diffèrent d'au plus
+    NEAR_DUPLICATE_DISTANCE bits
+    
+    Le hash est découpé en HASH_BANDS bandes : deux hash assez proches ont
+    forcément une bande identique, on ne compare donc que les images qui
+    partagent une bande plutôt que toutes les paires.
+    """
+    band_bits = 64 // HASH_BANDS
+    mask = (1 << band_bits) - 1
+    pairs = set()
+    for band in range(HASH_BANDS):
+        buckets = _group_by(range(len(hashes)), lambda i: (hashes[i] >> (band * band_bits)) & mask)
+        for members in buckets.values():
+            for a_pos, a in enumerate(members):
+                for b in members[a_pos + 1:]:
+                    if bin(hashes[a] ^ hashes[b]).count('1') <= NEAR_DUPLICATE_DISTANCE:
+                        pairs.add((a, b))
+    return sorted(pairs)
+
+
+def full_quality_scan(data_dir="data", entries=None, decode=False, workers=None,
+                      report_path=None):
+    """
+    Scanner toutes les images du dataset sur tous les cœurs
+    
+    Args:
+        decode: Décoder entièrement les images (hash perceptuel, netteté,
+                exposition) en plus de la validation des en-têtes
+        report_path: Fichier JSON du rapport (défaut: data/quality_report.json)
+    
+    Returns:
+        Le rapport (dictionnaire)
+    """
+    print(f"🔬 Scan complet du dataset ({'décodage complet' if decode else 'en-têtes seulement'})...")
+    
+    if entries is None:
+        entries = build_manifest(data_dir, verbose=False)
+    paths = [absolute_path(data_dir, entry) for entry in entries]
+    
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 16))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_scan_image, paths, [decode] * len(paths), chunksize=chunksize))
+    
+    # Problèmes par image
+    problems = [
+        {'path': entry['path'], 'issues': result['issues']}
+        for entry, result in zip(entries, results) if result['issues']
+    ]
+    
+    # Doublons exacts (hash du contenu du manifest) et fuites entre splits
+    exact_groups = [
+        [entry['path'] for entry in group]
+        for group in _group_by(entries, lambda e: e['sha256']).values() if len(group) > 1
+    ]
+    split_of = {entry['path']: entry['split'] for entry in entries}
+    leakage = [group for group in exact_groups if len({split_of[p] for p in group}) > 1]
+    
+    report = {
+        'data_dir': data_dir,
+        'decoded': decode,
+        'total_images': len(entries),
+        'problems': problems,
+        'exact_duplicates': exact_groups,
+        'near_duplicates': [],
+        'split_leakage': leakage,
+        'blur_outliers': [],
+        'exposure_outliers': [],
+    }
+    
+    if decode:
+        decoded = [(entry, result) for entry, result in zip(entries, results) if 'dhash' in result]
+        
+        # Quasi-doublons (hash perceptuel) et fuites entre splits
+        hashes = [result['dhash'] for _, result in decoded]
+        for a, b in _near_duplicate_pairs(hashes):
+            pair = [decoded[a][0]['path'], decoded[b][0]['path']]
+            if decoded[a][0]['sha256'] == decoded[b][0]['sha256']:
+                continue  # Déjà compté comme doublon exact
+            report['near_duplicates'].append(pair)
+            if decoded[a][0]['split'] != decoded[b][0]['split']:
+                report['split_leakage'].append(pair)
+        
+        # Images floues (netteté anormalement faible) et mal exposées
+        if decoded:
+            scores, outliers = _robust_outliers([np.log1p(result['sharpness']) for _, result in decoded])
+            report['blur_outliers'] = [
+                {'path': decoded[i][0]['path'], 'sharpness': decoded[i][1]['sharpness']}
+                for i in outliers if scores[i] < 0
+            ]
+            _, outliers = _robust_outliers([result['brightness'] for _, result in decoded])
+            report['exposure_outliers'] = [
+                {'path': decoded[i][0]['path'], 'brightness': decoded[i][1]['brightness'],
+                 'clipped': decoded[i][1]['clipped']}
+                for i in outliers
+            ]
+    
+    report_path = report_path or os.path.join(data_dir, "quality_report.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    # Résumé
+    print(f"   Images scannées: {len(entries)}")
+    print(f"   Images à problème: {len(problems)}")
+    print(f"   Doublons exacts: {len(exact_groups)} groupes")
+    if decode:
+        print(f"   Quasi-doublons: {len(report['near_duplicates'])} paires")
+        print(f"   Images floues: {len(report['blur_outliers'])}")
+        print(f"   Expositions anormales: {len(report['exposure_outliers'])}")
+    if report['split_leakage']:
+        print(f"   ❌ Fuites train/validation/test: {len(report['split_leakage'])}")
+    for problem in problems[:5]:
+        print(f"      {problem['path']}: {', '.join(problem['issues'])}")
+    if len(problems) > 5:
+        print(f"      ... et {len(problems) - 5} autres problèmes")
+    print(f"   📄 Rapport: {report_path}")
+    print()
+    
+    return report
+
+
 def check_dependencies():
     """Vérifier les dépendances"""
     print("📦 Vérification des dépendances...")
@@ -259,6 +450,15 @@ def main():
     """
     Vérification complète
     """
+    parser = argparse.ArgumentParser(description="Vérification pré-entraînement AgriDetect")
+    parser.add_argument('--full-scan', action='store_true',
+                        help="Scanner toutes les images (intégrité, doublons, fuites entre splits)")
+    parser.add_argument('--decode', action='store_true',
+                        help="Avec --full-scan: décoder les images (quasi-doublons, flou, exposition)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Nombre de processus pour --full-scan (défaut: tous les cœurs)")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("🌾 AgriDetect - Vérification Pré-Entraînement")
     print("=" * 70)
@@ -283,8 +483,9 @@ def main():
         print("   python prepare_dataset.py")
         return
     
-    # 4. Compter les images
-    has_images = count_images(data_dir)
+    # 4. Compter les images (manifest mis à jour de façon incrémentale)
+    entries = build_manifest(data_dir)
+    has_images = count_images(data_dir, entries)
     if not has_images:
         all_ok = False
         print("❌ Aucune image trouvée")
@@ -294,18 +495,16 @@ def main():
         return
     
     # 5. Vérifier la qualité
-    check_image_quality(data_dir)
+    check_image_quality(data_dir, entries=entries)
+    if args.full_scan:
+        report = full_quality_scan(data_dir, entries, decode=args.decode, workers=args.workers)
+        corrupt = [p for p in report['problems']
+                   if any(i.startswith(('corrompue', 'JPEG tronqué', 'décodage')) for i in p['issues'])]
+        if corrupt or report['split_leakage']:
+            all_ok = False
     
     # 6. Estimer le temps
-    train_dir = os.path.join(data_dir, "train")
-    total_images = 0
-    for class_name in os.listdir(train_dir):
-        class_path = os.path.join(train_dir, class_name)
-        if os.path.isdir(class_path):
-            images = [f for f in os.listdir(class_path)
-                     if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            total_images += len(images)
-    
+    total_images = len(split_entries(entries, 'train'))
     estimate_training_time(total_images)
     
     # Résumé
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Manifest du dataset AgriDetect
+Index unique de toutes les images de data/{train,validation,test}/<classe>/
+(chemin, classe, split, source, taille, dimensions, format, hash du contenu),
+construit en une passe parallèle et mis à jour de façon incrémentale
+"""
+
+import os
+import json
+import random
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+
+SPLITS = ('train', 'validation', 'test')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+# ========================================
+# Construction
+# ========================================
+
+def _scan_class_dir(split, class_name, class_path):
+    """Lister les images d'un dossier de classe avec os.scandir"""
+    found = []
+    with os.scandir(class_path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                stat = entry.stat()
+                found.append((split, class_name, entry.path, stat.st_size, stat.st_mtime_ns))
+    return found
+
+
+def _describe_image(path):
+    """
+    Lire l'en-tête de l'image (dimensions, format, mode) et hasher son contenu
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            image_format, mode = img.format, img.mode
+    except Exception:
+        width = height = None
+        image_format = mode = None
+    
+    return {
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'mode': mode,
+        'sha256': sha256.hexdigest(),
+    }
+
+
+def build_manifest(data_dir="data", workers=None, verbose=True, sources=None):
+    """
+    Construire ou mettre à jour le manifest du dataset
+    
+    Les entrées dont la taille et la date de modification n'ont pas changé
+    sont reprises telles quelles ; seules les images nouvelles ou modifiées
+    sont relues.
+    
+    Args:
+        sources: {chemin relatif: image d'origine} des images placées par
+                 prepare_dataset (champ 'source', conservé d'une mise à jour
+                 à l'autre)
+    
+    Returns:
+        Liste des entrées, triée par (split, classe, chemin)
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    previous = {entry['path']: entry for entry in load_manifest(data_dir, build=False) or []}
+    sources = sources or {}
+    
+    # 1. Parcours parallèle des dossiers de classes
+    class_dirs = []
+    for split in SPLITS:
+        split_dir = os.path.join(data_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        with os.scandir(split_dir) as entries:
+            class_dirs.extend((split, entry.name, entry.path) for entry in entries if entry.is_dir())
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scanned = [item for found in executor.map(lambda args: _scan_class_dir(*args), class_dirs)
+                   for item in found]
+    
+    # 2. Description des images nouvelles ou modifiées uniquement
+    entries = []
+    to_describe = []
+    for split, class_name, path, size, mtime_ns in scanned:
+        rel_path = os.path.relpath(path, data_dir).replace(os.sep, '/')
+        entry = previous.get(rel_path)
+        source = sources.get(rel_path) or (entry or {}).get('source')
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            if source:
+                entry['source'] = source
+            entries.append(entry)
+            continue
+        entry = {
+            'path': rel_path,
+            'split': split,
+            'class': class_name,
+            'size': size,
+            'mtime_ns': mtime_ns,
+        }
+        if source:
+            entry['source'] = source
+        entries.append(entry)
+        to_describe.append((entry, path))
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for (entry, _), description in zip(to_describe,
+                                           executor.map(_describe_image, [path for _, path in to_describe])):
+            entry.update(description)
+    
+    entries.sort(key=lambda e: (e['split'], e['class'], e['path']))
+    save_manifest(data_dir, entries)
+    
+    if verbose:
+        removed = len(set(previous) - {entry['path'] for entry in entries})
+        print(f"✓ Manifest: {len(entries)} images "
+              f"({len(to_describe)} nouvelles ou modifiées, {removed} supprimées)")
+    return entries
+
+
+# ========================================
+# Lecture / Écriture
+# ========================================
+
+def save_manifest(data_dir, entries):
+    """Écrire le manifest de façon atomique"""
+    manifest_path = os.path.join(data_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': MANIFEST_VERSION,
+            'generated_at': datetime.now().isoformat(),
+            'entries': entries,
+        }, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def load_manifest(data_dir="data", build=True):
+    """
+    Charger le manifest du dataset
+    
+    Args:
+        build: Construire le manifest s'il est absent ou d'une autre version
+    
+    Returns:
+        Liste des entrées, ou None si absent et build=False
+    """
+    manifest_path = os.path.join(data_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest['entries']
+    
+    if not build:
+        return None
+    return build_manifest(data_dir)
+
+
+# ========================================
+# Requêtes
+# ========================================
+
+def split_entries(entries, split):
+    """Entrées d'un split, dans l'ordre stable du manifest"""
+    return [entry for entry in entries if entry['split'] == split]
+
+
+def absolute_path(data_dir, entry):
+    """Chemin absolu d'une entrée du manifest"""
+    return os.path.abspath(os.path.join(data_dir, entry['path']))
+
+
+def class_counts(entries):
+    """
+    Nombre d'images par split et par classe
+    
+    Returns:
+        {split: {classe: nombre}}
+    """
+    stats = {}
+    for entry in entries:
+        split_stats = stats.setdefault(entry['split'], {})
+        split_stats[entry['class']] = split_stats.get(entry['class'], 0) + 1
+    return stats
+
+
+def class_weights(counts, power=1.0):
+    """
+    Poids de classe inversement proportionnels aux effectifs
+    
+    w_c = (N / (K * n_c)) ** power, puis normalisés pour que le poids moyen
+    par image vaille 1 (l'échelle de la perte reste inchangée).
+    power=1 correspond à la pondération 'balanced', power<1 l'adoucit.
+    
+    Args:
+        counts: {classe: nombre d'images d'entraînement}
+    
+    Returns:
+        {classe: poids}
+    """
+    total = sum(counts.values())
+    raw = {name: (total / (len(counts) * count)) ** power for name, count in counts.items() if count}
+    mean = sum(raw[name] * counts[name] for name in raw) / total
+    return {name: weight / mean for name, weight in raw.items()}
+
+
+def oversample(items, key, target_fraction, seed=42):
+    """
+    Rééchantillonner les classes rares : chaque classe est complétée par
+    tirage avec remise jusqu'à target_fraction fois l'effectif de la plus
+    grande classe (aucune image des classes fréquentes n'est retirée)
+    
+    Args:
+        key: Fonction renvoyant la classe d'un élément
+    
+    Returns:
+        Nouvelle liste (éléments d'origine puis répétitions)
+    """
+    rng = random.Random(seed)
+    by_class = {}
+    for item in items:
+        by_class.setdefault(key(item), []).append(item)
+    if not by_class:
+        return list(items)
+    
+    target = int(max(len(members) for members in by_class.values()) * target_fraction)
+    resampled = list(items)
+    for name in sorted(by_class):
+        members = by_class[name]
+        resampled.extend(rng.choice(members) for _ in range(max(0, target - len(members))))
+    return resampled
+
+
+def main():
+    """
+    Construire le manifest de data/ et afficher un résumé
+    """
+    parser = argparse.ArgumentParser(description="Manifest du dataset AgriDetect")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Manifest du Dataset")
+    print("=" * 60)
+    print()
+    
+    entries = build_manifest(args.data_dir, workers=args.workers)
+    for split, split_stats in class_counts(entries).items():
+        print(f"   {split:<12} {sum(split_stats.values()):>7} images, {len(split_stats)} classes")
+    print(f"📁 {os.path.join(args.data_dir, MANIFEST_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Contexte de détection du chat AgriDetect
+Les résultats de /detect-disease sont conservés par detection_id (Redis ou
+mémoire locale), sinon relus dans la table detections : une question de
+suivi sur une photo déjà analysée ne relance jamais le modèle CNN
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+from chat_sessions import REDIS_URL, create_session_store
+from knowledge_base import KnowledgeBase, get_knowledge_base
+
+
+DETECTION_TTL = int(os.environ.get('CHAT_DETECTION_TTL', 24 * 3600))
+DETECTION_PREFIX = "agridetect:detection:"
+TOP_K = 3
+
+
+def detection_summary(detection_id: str, result: Dict) -> Dict:
+    """
+    Partie d'un résultat de détection utile au chat : classe, confiance et
+    diagnostics alternatifs (top-k)
+    """
+    alternatives = [
+        {'disease_id': alt.get('disease_id'), 'disease_name': alt.get('disease_name'),
+         'confidence': alt.get('confidence')}
+        for alt in result.get('alternative_diagnoses', [])[:TOP_K - 1]
+    ]
+    return {
+        'detection_id': str(detection_id),
+        'disease_id': result.get('disease_id'),
+        'disease_name': result.get('disease_name'),
+        'confidence': result.get('confidence'),
+        'severity': result.get('severity'),
+        'uncertain': bool(result.get('uncertain', False)),
+        'alternatives': alternatives,
+        'affected_crop': result.get('affected_crop'),
+    }
+
+
+class DetectionLookup:
+    """
+    Résultats de détection par detection_id : cache (même stockage que les
+    sessions de chat, expiré après `ttl` secondes) puis table detections
+    """
+    
+    def __init__(self, store=None, knowledge_base: Optional[KnowledgeBase] = None,
+                 database_url: Optional[str] = None):
+        self.store = store if store is not None else create_session_store(
+            REDIS_URL, DETECTION_TTL, DETECTION_PREFIX
+        )
+        self.knowledge_base = knowledge_base or get_knowledge_base()
+        self.database_url = database_url
+    
+    def remember(self, detection_id: str, result: Dict) -> Dict:
+        """Conserver le résultat d'une détection qui vient d'être faite"""
+        summary = detection_summary(detection_id, result)
+        self.store.save(str(detection_id), summary)
+        return summary
+    
+    def get(self, detection_id: str) -> Optional[Dict]:
+        """Résultat d'une détection, ou None si elle est inconnue"""
+        detection_id = str(detection_id)
+        summary = self.store.load(detection_id)
+        if summary is not None:
+            return summary
+        
+        try:
+            from database import fetch_detection
+            row = fetch_detection(detection_id, self.database_url)
+        except Exception as e:
+            print(f"⚠ Détection {detection_id} introuvable dans le cache, base indisponible ({e})")
+            return None
+        if row is None:
+            return None
+        
+        summary = detection_summary(detection_id, row)
+        self.store.save(detection_id, summary)
+        return summary
+    
+    def resolve_disease(self, detection: Dict) -> Optional[str]:
+        """
+        Clé de la maladie détectée dans la base de connaissances : par code,
+        par clé, puis par recherche sur le nom de la classe
+        """
+        kb = self.knowledge_base
+        disease_id = detection.get('disease_id')
+        if disease_id:
+            for disease in kb.diseases.values():
+                if disease_id in (disease.code, disease.key):
+                    return disease.key
+        
+        name = detection.get('disease_name')
+        if name:
+            disease = kb.find_disease(name.replace('_', ' '))
+            if disease:
+                return disease.key
+        return None
+    
+    def context(self, detection_id: str) -> Dict:
+        """
+        Contexte de chat d'une détection : 'detection_id', 'detection'
+        (résumé) et 'disease' (clé de la base de connaissances, si connue,
+        aussi notée dans le résumé)
+        """
+        detection = self.get(detection_id)
+        if detection is None:
+            return {}
+        disease = self.resolve_disease(detection)
+        return {
+            'detection_id': detection['detection_id'],
+            'detection': {**detection, 'disease': disease},
+            'disease': disease,
+        }
+
+
+_detection_lookup = None
+_detection_lock = threading.Lock()
+
+
+def get_detection_lookup() -> DetectionLookup:
+    """Résultats de détection du processus (créés au premier appel)"""
+    global _detection_lookup
+    if _detection_lookup is None:
+        with _detection_lock:
+            if _detection_lookup is None:
+                _detection_lookup = DetectionLookup()
+    return _detection_lookup
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Évaluation complète d'un modèle AgriDetect sur le split de test
+Matrice de confusion, précision / rappel / F1 par classe, erreur de
+calibration (ECE) et diagramme de fiabilité
+
+Les prédictions sont calculées une seule fois puis mises en cache : les
+analyses suivantes relisent le cache sans relancer le modèle.
+"""
+
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from dataset_manifest import build_manifest, split_entries, absolute_path
+
+
+EVALUATION_FILE = "evaluation.json"
+PREDICTIONS_DIR = "predictions"
+
+
+# ========================================
+# Prédictions (mises en cache)
+# ========================================
+
+def split_fingerprint(entries):
+    """Empreinte d'un split : chemins et contenus des images"""
+    return hashlib.sha256("\n".join(
+        f"{entry['path']}:{entry['sha256']}" for entry in entries
+    ).encode('utf-8')).hexdigest()[:16]
+
+
+def make_inference_dataset(paths, height, width, batch_size=64, channels=3):
+    """
+    Pipeline tf.data d'inférence : images décodées et redimensionnées en
+    parallèle, par batches, dans l'ordre des chemins
+    """
+    import tensorflow as tf
+    
+    def load_image(path):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=channels, expand_animations=False)
+        image = tf.image.resize(image, (height, width)) / 255.0
+        image.set_shape((height, width, channels))
+        return image
+    
+    return (tf.data.Dataset.from_tensor_slices(list(paths))
+            .map(load_image, num_parallel_calls=tf.data.AUTOTUNE)
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def predict_entries(model, metadata, entries, data_dir, batch_size=64, channels=3):
+    """
+    Inférence par batches, images décodées en parallèle par tf.data
+    
+    Returns:
+        Probabilités (N, num_classes)
+    """
+    paths = [absolute_path(data_dir, entry) for entry in entries]
+    dataset = make_inference_dataset(paths, metadata['img_height'], metadata['img_width'],
+                                     batch_size, channels)
+    return model.predict(dataset, verbose=1).astype('float32')
+
+
+def load_or_predict(model_dir, metadata, data_dir="data", split='test', batch_size=64,
+                    recompute=False):
+    """
+    Prédictions du modèle sur un split, depuis le cache si disponible
+    
+    Le cache est indexé par l'empreinte du split, calculée sur le manifest
+    mis à jour (parcours incrémental du dossier) : ajouter ou modifier une
+    image invalide le cache.
+    
+    Returns:
+        (probabilités, indices des vraies classes, chemins relatifs, chemin du cache)
+    """
+    entries = split_entries(build_manifest(data_dir, verbose=False), split)
+    if not entries:
+        raise ValueError(f"Aucune image dans le split '{split}' de {data_dir}")
+    
+    class_indices = {name: int(k) for k, name in metadata['classes'].items()}
+    unknown = sorted({entry['class'] for entry in entries} - set(class_indices))
+    if unknown:
+        raise ValueError(f"Classes inconnues du modèle dans '{split}': {unknown}")
+    
+    cache_dir = os.path.join(model_dir, PREDICTIONS_DIR)
+    cache_path = os.path.join(cache_dir, f"{split}_{split_fingerprint(entries)}.npz")
+    
+    labels = np.array([class_indices[entry['class']] for entry in entries], dtype='int32')
+    paths = np.array([entry['path'] for entry in entries])
+    
+    if os.path.exists(cache_path) and not recompute:
+        print(f"✓ Prédictions en cache: {cache_path}")
+        return np.load(cache_path)['probabilities'], labels, paths, cache_path
+    
+    from train_model import load_trained_model
+    model, _ = load_trained_model(model_dir)
+    print(f"🔮 Inférence sur {len(entries)} images ({split})...")
+    probabilities = predict_entries(model, metadata, entries, data_dir, batch_size=batch_size)
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(cache_path, probabilities=probabilities, labels=labels, paths=paths)
+    print(f"✓ Prédictions sauvegardées: {cache_path}")
+    return probabilities, labels, paths, cache_path
+
+
+def load_predictions(predictions_path):
+    """Relire un fichier de prédictions (.npz) produit par load_or_predict"""
+    cached = np.load(predictions_path)
+    return cached['probabilities'], cached['labels'], cached['paths']
+
+
+# ========================================
+# Métriques (vectorisées)
+# ========================================
+
+def confusion_matrix(labels, predictions, num_classes):
+    """Matrice de confusion (lignes : vraies classes, colonnes : prédites)"""
+    flat = labels.astype('int64') * num_classes + predictions.astype('int64')
+    return np.bincount(flat, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def per_class_metrics(matrix):
+    """
+    Précision, rappel, F1 et support par classe depuis la matrice de confusion
+    """
+    true_positives = np.diag(matrix).astype('float64')
+    predicted = matrix.sum(axis=0)
+    support = matrix.sum(axis=1)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    
+    return precision, recall, f1, support
+
+
+def calibration_bins(probabilities, labels, num_bins=15):
+    """
+    Confiance et précision moyennes par intervalle de confiance
+    
+    Returns:
+        (effectifs, confiance moyenne, précision moyenne) par intervalle
+    """
+    confidences = probabilities.max(axis=1)
+    correct = (probabilities.argmax(axis=1) == labels).astype('float64')
+    bins = np.minimum((confidences * num_bins).astype('int64'), num_bins - 1)
+    
+    counts = np.bincount(bins, minlength=num_bins)
+    confidence_sums = np.bincount(bins, weights=confidences, minlength=num_bins)
+    correct_sums = np.bincount(bins, weights=correct, minlength=num_bins)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_confidence = np.where(counts > 0, confidence_sums / counts, 0.0)
+        mean_accuracy = np.where(counts > 0, correct_sums / counts, 0.0)
+    return counts, mean_confidence, mean_accuracy
+
+
+def expected_calibration_error(probabilities, labels, num_bins=15):
+    """ECE : écart moyen |précision - confiance| pondéré par l'effectif des intervalles"""
+    counts, mean_confidence, mean_accuracy = calibration_bins(probabilities, labels, num_bins)
+    return float(np.sum(counts * np.abs(mean_accuracy - mean_confidence)) / max(counts.sum(), 1))
+
+
+def compute_report(probabilities, labels, class_names, num_bins=15):
+    """
+    Rapport complet : exactitude, top-3, métriques par classe, matrice de
+    confusion et calibration
+    """
+    num_classes = len(class_names)
+    predictions = probabilities.argmax(axis=1)
+    matrix = confusion_matrix(labels, predictions, num_classes)
+    precision, recall, f1, support = per_class_metrics(matrix)
+    counts, mean_confidence, mean_accuracy = calibration_bins(probabilities, labels, num_bins)
+    
+    top_k = min(3, num_classes)
+    top3 = np.argpartition(-probabilities, top_k - 1, axis=1)[:, :top_k]
+    present = support > 0
+    
+    return {
+        'num_images': int(len(labels)),
+        'accuracy': float(np.mean(predictions == labels)),
+        'top3_accuracy': float(np.mean(np.any(top3 == labels[:, None], axis=1))),
+        'macro_precision': float(precision[present].mean()) if present.any() else 0.0,
+        'macro_recall': float(recall[present].mean()) if present.any() else 0.0,
+        'macro_f1': float(f1[present].mean()) if present.any() else 0.0,
+        'ece': expected_calibration_error(probabilities, labels, num_bins),
+        'per_class': {
+            class_names[i]: {
+                'precision': float(precision[i]),
+                'recall': float(recall[i]),
+                'f1': float(f1[i]),
+                'support': int(support[i]),
+            }
+            for i in range(num_classes)
+        },
+        'confusion_matrix': matrix.tolist(),
+        'calibration': {
+            'num_bins': num_bins,
+            'counts': counts.tolist(),
+            'mean_confidence': mean_confidence.tolist(),
+            'mean_accuracy': mean_accuracy.tolist(),
+        },
+    }
+
+
+# ========================================
+# Visualisations
+# ========================================
+
+def plot_confusion_matrix(matrix, class_names, output_path):
+    """Matrice de confusion normalisée par ligne (rappel)"""
+    matrix = np.asarray(matrix, dtype='float64')
+    normalized = matrix / np.maximum(matrix.sum(axis=1, keepdims=True), 1)
+    size = max(6, 0.5 * len(class_names))
+    
+    fig, ax = plt.subplots(figsize=(size, size))
+    image = ax.imshow(normalized, cmap='Blues', vmin=0, vmax=1)
+    ax.set_xticks(range(len(class_names)))
+    ax.set_yticks(range(len(class_names)))
+    ax.set_xticklabels(class_names, rotation=90, fontsize=7)
+    ax.set_yticklabels(class_names, fontsize=7)
+    ax.set_xlabel('Classe prédite')
+    ax.set_ylabel('Vraie classe')
+    ax.set_title('Matrice de Confusion (normalisée)')
+    fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
+    plt.close(fig)
+
+
+def plot_reliability_diagram(calibration, ece, output_path):
+    """Diagramme de fiabilité : précision par intervalle de confiance"""
+    num_bins = calibration['num_bins']
+    edges = np.linspace(0, 1, num_bins + 1)
+    counts = np.asarray(calibration['counts'])
+    accuracy = np.asarray(calibration['mean_accuracy'])
+    
+    fig, (ax, ax_counts) = plt.subplots(2, 1, figsize=(6, 8), sharex=True,
+                                        gridspec_kw={'height_ratios': [3, 1]})
+    ax.bar(edges[:-1], np.where(counts > 0, accuracy, 0), width=1 / num_bins,
+           align='edge', edgecolor='black', label='Précision')
+    ax.plot([0, 1], [0, 1], 'r--', label='Calibration parfaite')
+    ax.set_ylabel('Précision')
+    ax.set_title(f'Diagramme de Fiabilité (ECE = {ece:.4f})')
+    ax.legend()
+    ax.grid(True)
+    
+    ax_counts.bar(edges[:-1], counts, width=1 / num_bins, align='edge', edgecolor='black')
+    ax_counts.set_xlabel('Confiance')
+    ax_counts.set_ylabel('Images')
+    ax_counts.grid(True)
+    
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
+    plt.close(fig)
+
+
+# ========================================
+# Évaluation
+# ========================================
+
+def evaluate_model(model_dir, data_dir="data", split='test', batch_size=64, num_bins=15,
+                   recompute=False, predictions_path=None):
+    """
+    Évaluer un modèle de models/ et sauvegarder le rapport à côté de
+    metadata.json
+    
+    Args:
+        predictions_path: Fichier .npz de prédictions à réanalyser (sans
+                          relire le dataset ni relancer le modèle)
+    
+    Returns:
+        Rapport d'évaluation
+    """
+    with open(os.path.join(model_dir, "metadata.json"), 'r') as f:
+        metadata = json.load(f)
+    class_names = [metadata['classes'][str(i)] for i in range(len(metadata['classes']))]
+    
+    if predictions_path:
+        probabilities, labels, _ = load_predictions(predictions_path)
+    else:
+        probabilities, labels, _, predictions_path = load_or_predict(
+            model_dir, metadata, data_dir, split, batch_size, recompute
+        )
+    
+    report = compute_report(probabilities, labels, class_names, num_bins)
+    report.update({
+        'split': split,
+        'predictions': os.path.relpath(predictions_path, model_dir),
+        'evaluated_at': datetime.now().isoformat(),
+    })
+    
+    with open(os.path.join(model_dir, EVALUATION_FILE), 'w') as f:
+        json.dump(report, f, indent=2)
+    plot_confusion_matrix(report['confusion_matrix'], class_names,
+                          os.path.join(model_dir, "confusion_matrix.png"))
+    plot_reliability_diagram(report['calibration'], report['ece'],
+                             os.path.join(model_dir, "reliability_diagram.png"))
+    
+    # Résumé dans metadata.json
+    metadata[f'{split}_evaluation'] = {
+        'accuracy': report['accuracy'],
+        'top3_accuracy': report['top3_accuracy'],
+        'macro_f1': report['macro_f1'],
+        'ece': report['ece'],
+        'num_images': report['num_images'],
+    }
+    with open(os.path.join(model_dir, "metadata.json"), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    
+    return report
+
+
+def main():
+    """
+    Évaluer un modèle entraîné sur le split de test
+    """
+    parser = argparse.ArgumentParser(description="Évaluation complète d'un modèle AgriDetect")
+    parser.add_argument('model_dir', help="Dossier du modèle dans models/")
+    parser.add_argument('--data-dir', default="data")
+    parser.add_argument('--split', default='test', choices=('train', 'validation', 'test'))
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--bins', type=int, default=15, help="Intervalles de confiance pour l'ECE")
+    parser.add_argument('--recompute', action='store_true',
+                        help="Ignorer le cache et relancer l'inférence")
+    parser.add_argument('--predictions', metavar='NPZ',
+                        help="Réanalyser un fichier de prédictions existant")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Évaluation du Modèle")
+    print("=" * 60)
+    print()
+    
+    report = evaluate_model(args.model_dir, args.data_dir, args.split, args.batch_size,
+                            args.bins, args.recompute, args.predictions)
+    
+    print()
+    print(f"✓ Images: {report['num_images']}")
+    print(f"✓ Accuracy: {report['accuracy']:.4f}")
+    print(f"✓ Top-3 Accuracy: {report['top3_accuracy']:.4f}")
+    print(f"✓ F1 macro: {report['macro_f1']:.4f}")
+    print(f"✓ ECE: {report['ece']:.4f}")
+    print()
+    print(f"   {'Classe':<40} {'Préc.':<7} {'Rappel':<7} {'F1':<7} {'N':<6}")
+    for name, metrics in sorted(report['per_class'].items(), key=lambda item: item[1]['f1']):
+        print(f"   {name[:40]:<40} {metrics['precision']:<7.3f} {metrics['recall']:<7.3f} "
+              f"{metrics['f1']:<7.3f} {metrics['support']:<6}")
+    print()
+    print(f"📁 Rapport: {os.path.join(args.model_dir, EVALUATION_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
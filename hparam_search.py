@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Recherche automatique d'hyperparamètres et d'architecture pour AgriDetect
+Essais parallèles, élagage par successive halving, front de Pareto
+précision / latence CPU
+"""
+
+import os
+import json
+import math
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+# ========================================
+# Espace de Recherche
+# ========================================
+
+SEARCH_SPACE = {
+    'learning_rate': [1e-3, 5e-4, 1e-4],
+    'resolution': [128, 160, 224],
+    'backbone': [
+        ("MobileNetV2", 0.35),
+        ("MobileNetV2", 0.5),
+        ("MobileNetV2", 0.75),
+        ("MobileNetV2", 1.0),
+        ("EfficientNetB0", None),
+    ],
+    'head_units': [128, 256, 512],
+}
+
+SEARCH_DIR = os.path.join("models", "search")
+
+
+def sample_trials(num_trials, seed=42):
+    """
+    Tirer des configurations distinctes dans l'espace de recherche
+    """
+    rng = random.Random(seed)
+    total = 1
+    for values in SEARCH_SPACE.values():
+        total *= len(values)
+    num_trials = min(num_trials, total)
+    
+    trials = []
+    seen = set()
+    while len(trials) < num_trials:
+        backbone, alpha = rng.choice(SEARCH_SPACE['backbone'])
+        trial = {
+            'learning_rate': rng.choice(SEARCH_SPACE['learning_rate']),
+            'resolution': rng.choice(SEARCH_SPACE['resolution']),
+            'backbone': backbone,
+            'alpha': alpha,
+            'head_units': rng.choice(SEARCH_SPACE['head_units']),
+        }
+        key = tuple(sorted(trial.items(), key=lambda item: item[0]))
+        if key in seen:
+            continue
+        seen.add(key)
+        trial['trial_id'] = f"trial_{len(trials):03d}"
+        trials.append(trial)
+    
+    return trials
+
+
+# ========================================
+# Exécution d'un Essai (processus fils)
+# ========================================
+
+def make_trial_config(trial, search_dir):
+    """Construire une Config d'entraînement pour un essai"""
+    from train_model import Config
+    
+    config = Config()
+    config.OUTPUT_DIR = search_dir
+    config.MODEL_NAME = trial['trial_id']
+    config.LEARNING_RATE = trial['learning_rate']
+    config.IMG_HEIGHT = trial['resolution']
+    config.IMG_WIDTH = trial['resolution']
+    config.PRETRAINED_MODEL = trial['backbone']
+    config.MOBILENET_ALPHA = trial['alpha'] or 1.0
+    config.HEAD_UNITS = trial['head_units']
+    return config
+
+
+def run_trial(trial, epochs, initial_epoch, search_dir, threads, steps_per_epoch=None):
+    """
+    Entraîner un essai jusqu'à `epochs` (en reprenant ses poids précédents)
+    puis mesurer sa précision de validation et sa latence CPU
+    
+    Exécuté dans un processus séparé : TensorFlow est importé ici pour que
+    chaque essai ait son propre runtime et son propre quota de threads.
+    """
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    
+    from tensorflow import keras
+    import train_model
+    
+    config = make_trial_config(trial, search_dir)
+    keras.utils.set_random_seed(config.SEED)
+    
+    train_gen, val_gen, class_names = train_model.create_data_generators(config)
+    model = train_model.build_model(config, len(class_names))
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=config.LEARNING_RATE),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    
+    trial_dir = train_model.get_run_dir(config)
+    os.makedirs(trial_dir, exist_ok=True)
+    weights_path = os.path.join(trial_dir, "weights.h5")
+    if initial_epoch > 0 and os.path.exists(weights_path):
+        model.load_weights(weights_path)
+    
+    history = model.fit(
+        train_gen,
+        epochs=epochs,
+        initial_epoch=initial_epoch,
+        steps_per_epoch=steps_per_epoch,
+        validation_data=val_gen,
+        verbose=0
+    )
+    model.save_weights(weights_path)
+    
+    result = dict(trial)
+    result['epochs'] = epochs
+    result['val_accuracy'] = float(history.history['val_accuracy'][-1])
+    result['params'] = int(model.count_params())
+    result.update(train_model.measure_inference_latency(model, config))
+    
+    with open(os.path.join(trial_dir, "trial.json"), 'w') as f:
+        json.dump(result, f, indent=2)
+    
+    return result
+
+
+# ========================================
+# Successive Halving
+# ========================================
+
+def successive_halving(trials, min_epochs, max_epochs, eta, workers, search_dir,
+                       steps_per_epoch=None):
+    """
+    Élaguer les essais par successive halving
+    
+    Chaque palier entraîne les survivants jusqu'à un budget d'epochs
+    multiplié par `eta`, puis ne conserve que le meilleur 1/eta.
+    
+    Returns:
+        Liste des résultats de tous les essais (dernier palier atteint)
+    """
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context('spawn')
+    
+    results = {}
+    survivors = list(trials)
+    done_epochs = {trial['trial_id']: 0 for trial in trials}
+    budget = min_epochs
+    rung = 0
+    
+    while survivors:
+        print(f"🪜 Palier {rung}: {len(survivors)} essais, {budget} epochs")
+        
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [
+                executor.submit(run_trial, trial, budget, done_epochs[trial['trial_id']],
+                                search_dir, threads, steps_per_epoch)
+                for trial in survivors
+            ]
+            rung_results = [future.result() for future in futures]
+        
+        for result in rung_results:
+            result['rung'] = rung
+            results[result['trial_id']] = result
+            done_epochs[result['trial_id']] = budget
+            print(f"   {result['trial_id']}: val_accuracy={result['val_accuracy']:.4f} "
+                  f"latence={result['latency_ms_p50']:.1f} ms")
+        
+        if budget >= max_epochs or len(survivors) == 1:
+            break
+        
+        keep = max(1, math.floor(len(survivors) / eta))
+        rung_results.sort(key=lambda r: r['val_accuracy'], reverse=True)
+        kept_ids = {r['trial_id'] for r in rung_results[:keep]}
+        survivors = [trial for trial in survivors if trial['trial_id'] in kept_ids]
+        budget = min(budget * eta, max_epochs)
+        rung += 1
+    
+    return list(results.values())
+
+
+# ========================================
+# Front de Pareto
+# ========================================
+
+def final_rung(results):
+    """
+    Résultats du dernier palier (budget d'epochs maximal) : seuls ces essais
+    ont été entraînés avec le même budget et sont comparables
+    """
+    if not results:
+        return []
+    budget = max(r['epochs'] for r in results)
+    return [r for r in results if r['epochs'] == budget]
+
+
+def pareto_front(results):
+    """
+    Essais non dominés du dernier palier : aucun autre essai n'est à la fois
+    plus précis et plus rapide (latence médiane)
+    """
+    results = final_rung(results)
+    front = []
+    for candidate in results:
+        dominated = any(
+            other['val_accuracy'] >= candidate['val_accuracy']
+            and other['latency_ms_p50'] <= candidate['latency_ms_p50']
+            and (other['val_accuracy'] > candidate['val_accuracy']
+                 or other['latency_ms_p50'] < candidate['latency_ms_p50'])
+            for other in results
+        )
+        if not dominated:
+            front.append(candidate)
+    return sorted(front, key=lambda r: r['latency_ms_p50'])
+
+
+def fastest_above_floor(front, accuracy_floor):
+    """Essai le plus rapide du front atteignant le plancher de précision"""
+    eligible = [r for r in front if r['val_accuracy'] >= accuracy_floor]
+    return min(eligible, key=lambda r: r['latency_ms_p50']) if eligible else None
+
+
+# ========================================
+# Main
+# ========================================
+
+def main():
+    """
+    Lancer la recherche et écrire les résultats
+    """
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres AgriDetect")
+    parser.add_argument('--trials', type=int, default=27, help="Nombre d'essais initiaux")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="Essais entraînés en parallèle")
+    parser.add_argument('--min-epochs', type=int, default=1, help="Budget du premier palier")
+    parser.add_argument('--max-epochs', type=int, default=9, help="Budget maximal par essai")
+    parser.add_argument('--eta', type=int, default=3, help="Facteur de réduction par palier")
+    parser.add_argument('--steps-per-epoch', type=int, default=None,
+                        help="Limiter le nombre de batches par epoch")
+    parser.add_argument('--accuracy-floor', type=float, default=0.9,
+                        help="Précision minimale pour la recommandation")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=SEARCH_DIR)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Recherche d'Hyperparamètres")
+    print("=" * 60)
+    print()
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    trials = sample_trials(args.trials, seed=args.seed)
+    print(f"🎲 {len(trials)} essais, {args.workers} en parallèle")
+    
+    results = successive_halving(
+        trials, args.min_epochs, args.max_epochs, args.eta,
+        args.workers, args.output_dir, args.steps_per_epoch
+    )
+    front = pareto_front(results)
+    best = fastest_above_floor(front, args.accuracy_floor)
+    
+    with open(os.path.join(args.output_dir, "search_results.json"), 'w') as f:
+        json.dump(results, f, indent=2)
+    with open(os.path.join(args.output_dir, "pareto_front.json"), 'w') as f:
+        json.dump({'accuracy_floor': args.accuracy_floor, 'front': front, 'recommended': best},
+                  f, indent=2)
+    
+    print()
+    print("📈 Front de Pareto du dernier palier (précision / latence CPU):")
+    print(f"   {'Essai':<11} {'Backbone':<20} {'Rés.':<6} {'Tête':<6} {'Val acc':<9} {'p50 (ms)':<9}")
+    for r in front:
+        backbone = r['backbone'] + (f" α={r['alpha']}" if r['alpha'] else "")
+        print(f"   {r['trial_id']:<11} {backbone:<20} {r['resolution']:<6} "
+              f"{r['head_units']:<6} {r['val_accuracy']:<9.4f} {r['latency_ms_p50']:<9.1f}")
+    
+    print()
+    if best:
+        print(f"✅ Recommandé (≥ {args.accuracy_floor:.0%}): {best['trial_id']} "
+              f"- {best['val_accuracy']:.4f} en {best['latency_ms_p50']:.1f} ms")
+    else:
+        print(f"⚠ Aucun essai n'atteint la précision minimale de {args.accuracy_floor:.0%}")
+    print(f"📁 Résultats: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -106,6 +106,8 @@ CREATE TABLE detections (
     feedback_provided BOOLEAN DEFAULT FALSE,
     feedback_correct BOOLEAN,
     actual_disease_id UUID REFERENCES diseases(id),
+    model_class VARCHAR(255), -- classe prédite par le modèle (nom du dossier d'entraînement)
+    actual_class VARCHAR(255), -- classe corrigée par le feedback
     notes TEXT
 );
 
@@ -74,7 +74,13 @@ pip install -r ../requirements.txt > /dev/null 2>&1
 echo -e "${GREEN}✅ Dépendances installées${NC}"
 echo ""
 
-# 8. Résumé
+# 8. Modèle d'identification de la langue (jamais entraîné pendant une requête)
+echo -e "${BLUE}🧠 Entraînement du modèle de langue...${NC}"
+(cd .. && python language_id.py --train > /dev/null)
+echo -e "${GREEN}✅ Modèle de langue entraîné${NC}"
+echo ""
+
+# 9. Résumé
 echo -e "${GREEN}╔════════════════════════════════════════╗${NC}"
 echo -e "${GREEN}║   ✅ INITIALISATION COMPLÈTE!         ║${NC}"
 echo -e "${GREEN}╚════════════════════════════════════════╝${NC}"
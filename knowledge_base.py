@@ -0,0 +1,732 @@
+#!/usr/bin/env python3
+"""
+Base de connaissances agricoles du chatbot AgriDetect
+Chargée une seule fois par processus et partagée en lecture seule par toutes
+les sessions (enregistrements immuables), depuis un instantané JSON compilé,
+les données intégrées complétées par init.sql, ou les tables PostgreSQL
+"""
+
+import os
+import re
+import json
+import argparse
+import threading
+import unicodedata
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from search_index import InvertedIndex
+
+
+LANGUAGES = ("fr", "wo", "pu")
+SNAPSHOT_PATH = os.path.join("data", "knowledge_base.json")
+SNAPSHOT_VERSION = 1
+INIT_SQL = "init.sql"
+
+# Source par défaut : instantané s'il existe, sinon intégré + init.sql
+# (ou chemin d'un instantané JSON, 'builtin', 'sql', 'database')
+KNOWLEDGE_SOURCE = os.environ.get('AGRIDETECT_KNOWLEDGE_SOURCE')
+
+CYCLE_UNITS = {"fr": "jours", "wo": "fan", "pu": "ñalawma"}
+
+
+# ========================================
+# Données Intégrées
+# ========================================
+
+BUILTIN_DISEASES = {
+    "mildiou": {
+        "fr": {
+            "name": "Mildiou",
+            "symptoms": ["Taches jaunes sur les feuilles", "Moisissure blanche au revers", "Flétrissement"],
+            "causes": "Champignon favorisé par l'humidité",
+            "affected_crops": ["Tomate", "Pomme de terre", "Oignon"]
+        },
+        "wo": {
+            "name": "Mildiou",
+            "symptoms": ["Tàkk yu mboq ci xob yi", "Puur yu weex ci ginnaaw xob bi", "Xob yi di wow"],
+            "causes": "Funŋus buy gënal ndox",
+            "affected_crops": ["Tomate", "Pomme de terre", "Soble"]
+        },
+        "pu": {
+            "name": "Mildiou",
+            "symptoms": ["Tache raneeje e leeɗe", "Huɗo peewo les leeɗe", "Leeɗe ɗe koosa"],
+            "causes": "Ñawu funŋus diga ndiyam",
+            "affected_crops": ["Tomate", "Pomme de terre", "Albasal"]
+        }
+    },
+    "rouille": {
+        "fr": {
+            "name": "Rouille",
+            "symptoms": ["Pustules orangées", "Jaunissement des feuilles", "Chute prématurée"],
+            "causes": "Champignon de type rouille",
+            "affected_crops": ["Maïs", "Blé", "Haricot"]
+        },
+        "wo": {
+            "name": "Xonq",
+            "symptoms": ["Poor yu xonq", "Xob yi di mboq", "Xob yi di daanu"],
+            "causes": "Funŋus xonq",
+            "affected_crops": ["Mbay", "Dugub", "Niébé"]
+        }
+    }
+}
+
+BUILTIN_TREATMENTS = {
+    "organic": {
+        "fr": {
+            "neem": "Huile de Neem - Pulvériser tous les 7 jours",
+            "copper": "Bouillie bordelaise - Application préventive",
+            "soap": "Savon noir dilué - Contre les insectes",
+            "ash": "Cendre de bois - Saupoudrer autour des plants"
+        },
+        "wo": {
+            "neem": "Diw Neem - Soppi ko 7 fan",
+            "copper": "Garab kuivre - Soppi ko balaa feebar bi",
+            "soap": "Saabun ñuul - Ngir gunóor yi",
+            "ash": "Tandarma - Saasal ko wër mbay mi"
+        },
+        "pu": {
+            "neem": "Neɓɓam Neem - Wurta nder 7 ñalawma",
+            "copper": "Lekki kuivre - Huutoro ko adii ñawu",
+            "soap": "Saabun ɓalewo - Fayde kuɓe",
+            "ash": "Toɓɓere - Wurta dow gese"
+        }
+    },
+    "chemical": {
+        "fr": {
+            "systemic": "Fongicide systémique - Suivre les doses recommandées",
+            "contact": "Fongicide de contact - Application foliaire",
+            "insecticide": "Insecticide - Respecter le délai avant récolte"
+        }
+    }
+}
+
+BUILTIN_PREVENTION = {
+    "general": {
+        "fr": [
+            "Rotation des cultures tous les 3 ans",
+            "Espacement adéquat entre les plants",
+            "Drainage du sol approprié",
+            "Élimination des plants malades",
+            "Utilisation de variétés résistantes"
+        ],
+        "wo": [
+            "Soppi mbay mi 3 at",
+            "Diggante bu baax ci mbay yi",
+            "Suuf si ndox du des",
+            "Dindi mbay yu feebar",
+            "Jëfandikoo mbay yu mën feebar yi"
+        ],
+        "pu": [
+            "Waylude gese nder 3 duuɓi",
+            "Seedto gese fof",
+            "Ƴeew ndiyam e leydi",
+            "Ittu gese dogataake",
+            "Huutoro gese tammitooje"
+        ]
+    },
+    "seasonal": {
+        "rainy": {
+            "fr": "Pendant la saison des pluies, augmenter l'espacement et améliorer le drainage",
+            "wo": "Ci jamono taw bi, yokk diggante gi te baaxal ndox bi di génne",
+            "pu": "E ndungu, ɓeydu seedgol e moƴƴin ndiyam"
+        },
+        "dry": {
+            "fr": "En saison sèche, arroser tôt le matin ou tard le soir",
+            "wo": "Ci jamono tanqaay bi, tëj teel ci suba walla ngoon",
+            "pu": "E ceeɗu, wurin subaka walla kiikiiɗe"
+        }
+    }
+}
+
+BUILTIN_CROPS = {
+    "tomato": {
+        "fr": {"name": "Tomate", "cycle": "90-120 jours", "water": "Régulier"},
+        "wo": {"name": "Tomate", "cycle": "90-120 fan", "water": "Tëj ko saa yu nekk"},
+        "pu": {"name": "Tomate", "cycle": "90-120 ñalawma", "water": "Wurin sahaa fof"}
+    },
+    "onion": {
+        "fr": {"name": "Oignon", "cycle": "120-150 jours", "water": "Modéré"},
+        "wo": {"name": "Soble", "cycle": "120-150 fan", "water": "Tëj ko ndank"},
+        "pu": {"name": "Albasal", "cycle": "120-150 ñalawma", "water": "Wurin seeɗa"}
+    },
+    "maize": {
+        "fr": {"name": "Maïs", "cycle": "80-100 jours", "water": "Important au début"},
+        "wo": {"name": "Mbay", "cycle": "80-100 fan", "water": "Ndox bu bari ci tàmbali"},
+        "pu": {"name": "Gawri", "cycle": "80-100 ñalawma", "water": "Ndiyam heewi fuɗɗoode"}
+    }
+}
+
+BUILTIN_SEASONS = {
+    "planting": {
+        "fr": "Meilleure période de plantation: début de la saison des pluies",
+        "wo": "Jamono bu gën ci jël: tàmbalit taw bi",
+        "pu": "Sahaa moƴƴo hokkude: fuɗɗoode ndungu"
+    },
+    "harvest": {
+        "fr": "Récolter tôt le matin quand il fait frais",
+        "wo": "Góob teel ci suba bu sedd bi",
+        "pu": "Roƴƴo subaka nde yahdi woni"
+    }
+}
+
+BUILTIN_TRANSLATIONS = {
+    "greetings": {
+        "fr": "Bonjour! Comment puis-je vous aider avec vos cultures aujourd'hui?",
+        "wo": "Asalaam aleykum! Nan laa la dimbali ci sa mbay tay?",
+        "pu": "Jam tan! Hol ko mi waawi wallude e nder gese maa hannde?"
+    },
+    "disease_detected": {
+        "fr": "J'ai détecté {disease} avec une confiance de {confidence}%",
+        "wo": "Maa gis {disease} ak wóolu {confidence}%",
+        "pu": "Mi yiɗi {disease} e goonga {confidence}%"
+    },
+    "treatment_recommendation": {
+        "fr": "Je recommande le traitement suivant: {treatment}",
+        "wo": "Maa digal ñi garab: {treatment}",
+        "pu": "Miɗo waɗdi oo lekki: {treatment}"
+    },
+    "prevention_advice": {
+        "fr": "Pour prévenir cette maladie:",
+        "wo": "Ngir faggu feebar bi:",
+        "pu": "Ngam haɗde ñawu oo:"
+    },
+    "need_more_info": {
+        "fr": "Pouvez-vous me donner plus de détails sur {topic}?",
+        "wo": "Ndax mën nga ma jox yeneen xibaar ci {topic}?",
+        "pu": "Aɗa waawi hokku am ɓeyditte e {topic}?"
+    },
+    "confirmation": {
+        "fr": "D'accord, je comprends.",
+        "wo": "Waaw, xam naa.",
+        "pu": "Eey, mi faamii."
+    },
+    "thank_you": {
+        "fr": "Je vous en prie! N'hésitez pas si vous avez d'autres questions.",
+        "wo": "Amul solo! Bul taar laajte yeneen laaj.",
+        "pu": "Alaa nde caahu! Woto naamne ngam goɗɗe naamne."
+    },
+    "goodbye": {
+        "fr": "Au revoir et bonne culture! 🌱",
+        "wo": "Ba beneen yoon! Mbay bu baax! 🌱",
+        "pu": "Haa yeeso! Gese moƴƴe! 🌱"
+    },
+    "general_help": {
+        "fr": "Je suis là pour vous aider avec vos questions agricoles. Que souhaitez-vous savoir?",
+        "wo": "Maa ngi fi ngir dimbali la ci sa laaj yu mbay. Lan nga bëgg xam?",
+        "pu": "Miɗo ɗoo ngam wallude e naamne maa gese. Hol ko njiɗ-ɗaa faamde?"
+    }
+}
+
+BUILTIN_SUGGESTIONS = {
+    "fr": {
+        "greeting": ["Détecter une maladie", "Conseils de prévention", "Traitements biologiques"],
+        "disease_inquiry": ["Voir les traitements", "Mesures préventives", "Cultures affectées"],
+        "treatment_request": ["Dosage recommandé", "Alternatives biologiques", "Précautions"],
+        "prevention_question": ["Calendrier cultural", "Rotation des cultures", "Variétés résistantes"],
+        "general": ["Aide sur les maladies", "Conseils saisonniers", "Guide de culture"]
+    },
+    "wo": {
+        "greeting": ["Xool feebar", "Digal ci faggu", "Garab yu naturel"],
+        "disease_inquiry": ["Xool garab yi", "Faggu feebar bi", "Mbay yu mën feebar"],
+        "treatment_request": ["Ñaata laa war a jël", "Yeneen garab", "Moytu yi"],
+        "general": ["Ndimbal ci feebar yi", "Digal ci jamono", "Yoon wi ngir mbay"]
+    },
+    "pu": {
+        "greeting": ["Yiɗ ñawu", "Ballal haɗde", "Lekki safrooɗi"],
+        "disease_inquiry": ["Yiɗ lekki", "Haɗde ñawu", "Gese dogataake"],
+        "treatment_request": ["No foti huutoraade", "Goɗɗe lekki", "Reentaade"],
+        "general": ["Ballal e ñawɗe", "Ballal sahaa", "Ardude gese"]
+    }
+}
+
+# Autres noms (anglais, scientifiques, locaux) reconnus par la recherche
+BUILTIN_ALIASES = {
+    "diseases": {
+        "mildiou": ["mildew", "late blight", "phytophthora"],
+        "rouille": ["rust", "common rust", "puccinia"],
+        "fletrissure_bacterienne": ["bacterial wilt", "bacterial spot", "bactériose", "ralstonia"],
+        "mosaique_virale": ["mosaic virus", "mosaïque", "yellow leaf curl", "virus"],
+        "tache_foliaire": ["leaf spot", "septoriose", "cercosporiose", "early blight", "alternariose"],
+        "pourriture_des_racines": ["root rot", "pourriture", "fusarium"]
+    },
+    "crops": {
+        "tomato": ["tomato", "tomates"],
+        "onion": ["onion", "oignons"],
+        "maize": ["maize", "corn"],
+        "mil": ["millet", "souna", "sanio"],
+        "arachide": ["groundnut", "peanut", "gerte"],
+        "manioc": ["cassava"],
+        "gombo": ["okra"],
+        "piment": ["pepper", "chili"]
+    }
+}
+
+
+
+# ========================================
+# Enregistrements Immuables
+# ========================================
+
+def _freeze(value):
+    """Dictionnaires en MappingProxyType et listes en tuples, récursivement"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    """Inverse de _freeze (pour l'export JSON)"""
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        return {k: _thaw(v) for k, v in value._asdict().items()}
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def localized(texts: Mapping, lang: str):
+    """Texte dans la langue demandée, sinon en français"""
+    return texts.get(lang) or texts["fr"]
+
+
+class DiseaseText(NamedTuple):
+    name: str
+    symptoms: Tuple[str, ...]
+    causes: str
+    affected_crops: Tuple[str, ...]
+
+
+class Disease(NamedTuple):
+    key: str
+    code: Optional[str]
+    severity: Optional[str]
+    pathogen_type: Optional[str]
+    texts: Mapping[str, DiseaseText]
+    prevention: Mapping[str, Tuple[str, ...]]
+    aliases: Tuple[str, ...] = ()
+    
+    def text(self, lang: str) -> DiseaseText:
+        return localized(self.texts, lang)
+
+
+class CropText(NamedTuple):
+    name: str
+    cycle: str
+    water: str
+
+
+class Crop(NamedTuple):
+    key: str
+    texts: Mapping[str, CropText]
+    aliases: Tuple[str, ...] = ()
+    
+    def text(self, lang: str) -> CropText:
+        return localized(self.texts, lang)
+
+
+class Treatment(NamedTuple):
+    key: str
+    code: Optional[str]
+    category: str
+    texts: Mapping[str, str]
+
+
+class KnowledgeBase:
+    """
+    Base de connaissances en lecture seule, partagée par tous les chatbots
+    du processus (voir get_knowledge_base)
+    """
+    
+    __slots__ = ('diseases', 'crops', 'treatments', 'prevention', 'seasonal_prevention',
+                 'seasons', 'translations', 'suggestions', 'source', 'disease_index', 'crop_index')
+    
+    def __init__(self, data: Dict, source: str = "builtin"):
+        object.__setattr__(self, 'source', source)
+        object.__setattr__(self, 'diseases', MappingProxyType({
+            d['key']: Disease(
+                key=d['key'], code=d.get('code'), severity=d.get('severity'),
+                pathogen_type=d.get('pathogen_type'),
+                texts=MappingProxyType({
+                    lang: DiseaseText(t['name'], tuple(t['symptoms']), t['causes'],
+                                      tuple(t['affected_crops']))
+                    for lang, t in d['texts'].items()
+                }),
+                prevention=_freeze(d.get('prevention', {})),
+                aliases=tuple(d.get('aliases', ())),
+            )
+            for d in data['diseases']
+        }))
+        object.__setattr__(self, 'crops', MappingProxyType({
+            c['key']: Crop(c['key'], MappingProxyType({
+                lang: CropText(t['name'], t['cycle'], t['water']) for lang, t in c['texts'].items()
+            }), tuple(c.get('aliases', ())))
+            for c in data['crops']
+        }))
+        object.__setattr__(self, 'treatments', tuple(
+            Treatment(t['key'], t.get('code'), t['category'], _freeze(t['texts']))
+            for t in data['treatments']
+        ))
+        object.__setattr__(self, 'prevention', _freeze(data['prevention']['general']))
+        object.__setattr__(self, 'seasonal_prevention', _freeze(data['prevention']['seasonal']))
+        object.__setattr__(self, 'seasons', _freeze(data['seasons']))
+        object.__setattr__(self, 'translations', _freeze(data['translations']))
+        object.__setattr__(self, 'suggestions', _freeze(data['suggestions']))
+        object.__setattr__(self, 'disease_index', self._build_disease_index())
+        object.__setattr__(self, 'crop_index', self._build_crop_index())
+    
+    def _build_disease_index(self) -> InvertedIndex:
+        """Noms et alias (poids 3), symptômes et cultures touchées, dans toutes les langues"""
+        index = InvertedIndex()
+        for key, disease in self.diseases.items():
+            fields = [(key.replace('_', ' '), "fr", 3.0)]
+            fields += [(alias, "fr", 3.0) for alias in disease.aliases]
+            for lang, text in disease.texts.items():
+                fields.append((text.name, lang, 3.0))
+                fields += [(symptom, lang, 1.0) for symptom in text.symptoms]
+                fields += [(crop, lang, 0.5) for crop in text.affected_crops]
+            index.add(key, fields)
+        return index.build()
+    
+    def _build_crop_index(self) -> InvertedIndex:
+        """Noms des cultures dans toutes les langues et alias"""
+        index = InvertedIndex()
+        for key, crop in self.crops.items():
+            fields = [(text.name, lang, 1.0) for lang, text in crop.texts.items()]
+            fields += [(alias, "fr", 1.0) for alias in crop.aliases]
+            index.add(key, fields)
+        return index.build()
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("La base de connaissances est en lecture seule")
+    
+    def find_disease(self, text: str, min_score: float = 1.2) -> Optional[Disease]:
+        """Maladie la mieux classée (BM25) pour un message, ou None"""
+        key = self.disease_index.best(text, min_score)
+        return self.diseases[key] if key else None
+    
+    def find_crop(self, text: str, min_score: float = 0.5) -> Optional[Crop]:
+        """Culture la mieux classée (BM25) pour un message, ou None"""
+        key = self.crop_index.best(text, min_score)
+        return self.crops[key] if key else None
+    
+    def treatment_texts(self, category: str, lang: str) -> List[str]:
+        """Traitements d'une catégorie dans la langue demandée (sinon en français)"""
+        texts = [t.texts[lang] for t in self.treatments if t.category == category and lang in t.texts]
+        if not texts and lang != "fr":
+            return self.treatment_texts(category, "fr")
+        return texts
+    
+    def prevention_tips(self, lang: str) -> Tuple[str, ...]:
+        """Conseils de prévention généraux"""
+        return localized(self.prevention, lang)
+    
+    def translate(self, key: str, lang: str) -> str:
+        """Phrase commune traduite"""
+        return localized(self.translations[key], lang)
+    
+    def to_dict(self) -> Dict:
+        """Format de l'instantané JSON (relu par le constructeur)"""
+        return {
+            'version': SNAPSHOT_VERSION,
+            'diseases': [_thaw(d) for d in self.diseases.values()],
+            'crops': [_thaw(c) for c in self.crops.values()],
+            'treatments': [_thaw(t) for t in self.treatments],
+            'prevention': {'general': _thaw(self.prevention),
+                           'seasonal': _thaw(self.seasonal_prevention)},
+            'seasons': _thaw(self.seasons),
+            'translations': _thaw(self.translations),
+            'suggestions': _thaw(self.suggestions),
+        }
+    
+    def stats(self) -> Dict[str, int]:
+        return {'diseases': len(self.diseases), 'crops': len(self.crops),
+                'treatments': len(self.treatments)}
+
+
+# ========================================
+# Sources
+# ========================================
+
+def _slug(text: str) -> str:
+    """Clé ASCII en minuscules ("Flétrissure bactérienne" -> "fletrissure_bacterienne")"""
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', ascii_text.lower()).strip('_')
+
+
+def builtin_data() -> Dict:
+    """Données intégrées au format de l'instantané"""
+    diseases = [
+        {'key': key, 'code': None, 'severity': None, 'pathogen_type': None,
+         'texts': texts, 'prevention': {}, 'aliases': BUILTIN_ALIASES['diseases'].get(key, [])}
+        for key, texts in BUILTIN_DISEASES.items()
+    ]
+    crops = [{'key': key, 'texts': texts, 'aliases': BUILTIN_ALIASES['crops'].get(key, [])}
+             for key, texts in BUILTIN_CROPS.items()]
+    
+    treatments = {}
+    for category, by_lang in BUILTIN_TREATMENTS.items():
+        for lang, entries in by_lang.items():
+            for key, text in entries.items():
+                treatment = treatments.setdefault(key, {'key': key, 'code': None,
+                                                        'category': category, 'texts': {}})
+                treatment['texts'][lang] = text
+    
+    return {
+        'diseases': diseases,
+        'crops': crops,
+        'treatments': list(treatments.values()),
+        'prevention': {'general': BUILTIN_PREVENTION['general'],
+                       'seasonal': BUILTIN_PREVENTION['seasonal']},
+        'seasons': BUILTIN_SEASONS,
+        'translations': BUILTIN_TRANSLATIONS,
+        'suggestions': BUILTIN_SUGGESTIONS,
+    }
+
+
+SQL_TOKEN = re.compile(r"'(?:[^']|'')*'|[(),;]|[^\s(),;]+")
+SQL_INSERT = re.compile(r"INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)\s*VALUES", re.IGNORECASE)
+
+
+def _sql_value(token: str):
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    lowered = token.lower()
+    if lowered == 'null':
+        return None
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    try:
+        return float(token) if '.' in token else int(token)
+    except ValueError:
+        return token
+
+
+def parse_sql_inserts(path: str = INIT_SQL) -> Dict[str, List[Dict]]:
+    """
+    Lignes des INSERT INTO ... VALUES d'un script SQL (données initiales)
+    
+    Returns:
+        {table: [ligne (dict colonne -> valeur)]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        sql = f.read()
+    
+    tables = {}
+    for statement in SQL_INSERT.finditer(sql):
+        table = statement.group(1)
+        columns = [c.strip() for c in statement.group(2).split(',')]
+        rows = tables.setdefault(table, [])
+        row = None
+        for token in SQL_TOKEN.finditer(sql, statement.end()):
+            token = token.group(0)
+            if token == ';':
+                break
+            if token == '(':
+                row = []
+            elif token == ')':
+                rows.append(dict(zip(columns, row)))
+                row = None
+            elif token != ',' and row is not None:
+                row.append(_sql_value(token))
+            elif token != ',':
+                break  # fin du VALUES sans ';' (script tronqué)
+    
+    return tables
+
+
+def fetch_tables(database_url: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Lignes des tables crops, diseases, treatments et prevention_tips
+    (avec les cultures touchées par chaque maladie)
+    """
+    from sqlalchemy import text
+    from database import get_engine
+    
+    queries = {
+        'crops': "SELECT * FROM crops",
+        'diseases': """
+            SELECT d.*, COALESCE(
+                (SELECT json_agg(c.name_fr) FROM crop_diseases cd JOIN crops c ON c.id = cd.crop_id
+                 WHERE cd.disease_id = d.id), '[]') AS affected_crops
+            FROM diseases d
+        """,
+        'treatments': "SELECT * FROM treatments",
+        'prevention_tips': """
+            SELECT p.*, d.code AS disease_code FROM prevention_tips p
+            JOIN diseases d ON d.id = p.disease_id
+        """,
+    }
+    with get_engine(database_url).connect() as connection:
+        return {table: [dict(row) for row in connection.execute(text(query)).mappings().all()]
+                for table, query in queries.items()}
+
+
+def merge_tables(data: Dict, tables: Dict[str, List[Dict]]) -> Dict:
+    """
+    Compléter les données (format instantané) avec des lignes de la base
+    
+    Les entrées déjà présentes gardent leurs textes rédigés et reçoivent leur
+    code ; les autres sont créées à partir des colonnes traduites (name_fr,
+    name_wo, name_pu...).
+    """
+    crops_by_name = {c['texts']['fr']['name'].casefold(): c for c in data['crops']}
+    for row in tables.get('crops', []):
+        if row['name_fr'].casefold() in crops_by_name:
+            continue
+        days = row.get('growth_cycle_days')
+        key = _slug(row['name_fr'])
+        aliases = BUILTIN_ALIASES['crops'].get(key, []) + [row.get('scientific_name') or ""]
+        crop = {'key': key, 'aliases': [a for a in aliases if a], 'texts': {
+            lang: {
+                'name': row.get(f'name_{lang}') or row['name_fr'],
+                'cycle': f"{days} {CYCLE_UNITS[lang]}" if days else "",
+                'water': row.get('water_requirements') or "",
+            }
+            for lang in LANGUAGES if row.get(f'name_{lang}') or lang == "fr"
+        }}
+        data['crops'].append(crop)
+        crops_by_name[row['name_fr'].casefold()] = crop
+    
+    diseases_by_name = {d['texts']['fr']['name'].casefold(): d for d in data['diseases']}
+    diseases_by_code = {}
+    for row in tables.get('diseases', []):
+        disease = diseases_by_name.get(row['name_fr'].casefold())
+        if disease is None:
+            symptoms = row.get('symptoms') or []
+            if isinstance(symptoms, str):
+                symptoms = json.loads(symptoms)
+            affected = row.get('affected_crops') or []
+            if isinstance(affected, str):
+                affected = json.loads(affected)
+            key = _slug(row['name_fr'])
+            aliases = BUILTIN_ALIASES['diseases'].get(key, []) + [row.get('scientific_name') or ""]
+            disease = {'key': key, 'prevention': {}, 'aliases': [a for a in aliases if a], 'texts': {
+                lang: {
+                    'name': row.get(f'name_{lang}') or row['name_fr'],
+                    'symptoms': symptoms.get(lang, symptoms.get('fr', [])) if isinstance(symptoms, dict) else symptoms,
+                    'causes': row.get(f'description_{lang}') or row.get('causes') or "",
+                    'affected_crops': affected,
+                }
+                for lang in LANGUAGES if row.get(f'name_{lang}') or lang == "fr"
+            }}
+            data['diseases'].append(disease)
+        disease.update(code=row['code'], severity=row.get('severity_level'),
+                       pathogen_type=row.get('pathogen_type'))
+        diseases_by_code[row['code']] = disease
+    
+    treatments_by_key = {t['key']: t for t in data['treatments']}
+    for row in tables.get('treatments', []):
+        key = row['code'].split('_')[0].lower()
+        treatment = treatments_by_key.get(key)
+        if treatment is None:
+            treatment = {'key': key, 'category': row.get('type') or 'organic', 'texts': {}}
+            for lang in LANGUAGES:
+                name = row.get(f'name_{lang}')
+                if name:
+                    description = row.get(f'description_{lang}')
+                    treatment['texts'][lang] = f"{name} - {description}" if description else name
+            data['treatments'].append(treatment)
+            treatments_by_key[key] = treatment
+        treatment['code'] = row['code']
+    
+    for row in tables.get('prevention_tips', []):
+        disease = diseases_by_code.get(row.get('disease_code'))
+        if disease is None:
+            continue
+        for lang in LANGUAGES:
+            if row.get(f'tip_{lang}'):
+                disease['prevention'].setdefault(lang, []).append(row[f'tip_{lang}'])
+    
+    return data
+
+
+# ========================================
+# Chargement Partagé
+# ========================================
+
+def load_knowledge_base(source: Optional[str] = None, sql_path: str = INIT_SQL,
+                        database_url: Optional[str] = None) -> KnowledgeBase:
+    """
+    Charger la base de connaissances
+    
+    Args:
+        source: Chemin d'un instantané JSON, 'builtin', 'sql' (intégré +
+            init.sql), 'database' (intégré + tables PostgreSQL), ou None
+            (instantané s'il existe, sinon 'sql')
+    """
+    if source is None:
+        source = SNAPSHOT_PATH if os.path.exists(SNAPSHOT_PATH) else 'sql'
+    
+    if source not in ('builtin', 'sql', 'database'):
+        with open(source, 'r', encoding='utf-8') as f:
+            return KnowledgeBase(json.load(f), source=source)
+    
+    data = builtin_data()
+    if source == 'sql' and os.path.exists(sql_path):
+        data = merge_tables(data, parse_sql_inserts(sql_path))
+    elif source == 'database':
+        data = merge_tables(data, fetch_tables(database_url))
+    return KnowledgeBase(data, source=source)
+
+
+_knowledge_base = None
+_knowledge_lock = threading.Lock()
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """
+    Base de connaissances du processus, chargée au premier appel puis
+    partagée par toutes les sessions
+    """
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_lock:
+            if _knowledge_base is None:
+                _knowledge_base = load_knowledge_base(KNOWLEDGE_SOURCE)
+    return _knowledge_base
+
+
+def save_snapshot(knowledge_base: KnowledgeBase, path: str = SNAPSHOT_PATH) -> str:
+    """Compiler la base de connaissances en instantané JSON"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    snapshot = knowledge_base.to_dict()
+    snapshot['compiled_at'] = datetime.now().isoformat()
+    snapshot['compiled_from'] = knowledge_base.source
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def main():
+    """
+    Compiler l'instantané de la base de connaissances du chatbot
+    """
+    parser = argparse.ArgumentParser(description="Base de connaissances du chatbot AgriDetect")
+    parser.add_argument('--source', choices=('builtin', 'sql', 'database'), default='sql',
+                        help="Données intégrées seules, complétées par init.sql ou par la base")
+    parser.add_argument('--sql', default=INIT_SQL, help="Script SQL des données initiales")
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--output', default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Base de Connaissances du Chatbot")
+    print("=" * 60)
+    print()
+    
+    knowledge_base = load_knowledge_base(args.source, args.sql, args.database_url)
+    path = save_snapshot(knowledge_base, args.output)
+    
+    stats = knowledge_base.stats()
+    print(f"✓ {stats['diseases']} maladies, {stats['crops']} cultures, {stats['treatments']} traitements")
+    print(f"📁 Instantané: {path} ({os.path.getsize(path) / 1024:.1f} Ko)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Identification de la langue des messages (français, wolof, pulaar)
+N-grammes de caractères hachés et modèle linéaire (régression logistique
+multinomiale) entraîné hors ligne ; poids stockés dans un petit tableau
+NumPy chargé en quelques millisecondes, classification vectorisée d'un
+lot de messages (passerelle SMS) en un seul appel
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import argparse
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from knowledge_base import LANGUAGES, KnowledgeBase, get_knowledge_base
+
+
+MODEL_PATH = os.path.join("data", "language_id", "language_id.npz")
+
+# Les poids dépendent des caractéristiques : changer l'une invalide les modèles enregistrés
+FEATURE_VERSION = "char1-4-crc32-8192-v1"
+NUM_FEATURES = 2 ** 13
+MAX_NGRAM = 4
+WORD_PATTERN = re.compile(r"[^\W\d_]+")  # mots sans chiffres
+
+DEFAULT_LANGUAGE = "fr"
+
+# ========================================
+# Corpus
+# ========================================
+
+# Messages types des agriculteurs (entraînement, en plus des textes de la base de connaissances)
+TRAINING_MESSAGES = {
+    "fr": [
+        "Bonjour, j'ai un problème avec mes plants",
+        "Bonsoir, pouvez-vous m'aider?",
+        "Mes tomates ont des taches noires",
+        "Les feuilles de mon oignon jaunissent",
+        "Que dois-je faire contre les chenilles?",
+        "Quel produit acheter pour soigner le mil?",
+        "Combien de fois faut-il pulvériser?",
+        "Il a beaucoup plu cette semaine",
+        "Oui, je comprends",
+        "Non, je ne sais pas",
+        "Quand est-ce que je dois semer l'arachide?",
+        "Où puis-je trouver de l'huile de neem?",
+        "Merci pour vos conseils",
+        "C'est une maladie grave?",
+        "Mon champ de maïs est attaqué par des insectes",
+        "Les racines pourrissent à cause de l'eau",
+        "Je voudrais savoir comment protéger mes cultures",
+        "Est-ce que la cendre marche vraiment?",
+        "Le sol est très sec depuis un mois",
+        "À demain, bonne journée",
+        "Comment reconnaître le mildiou?",
+        "Les fruits tombent avant d'être mûrs",
+        "J'arrose le matin et le soir",
+        "Très bien, merci beaucoup",
+    ],
+    "wo": [
+        "Nanga def, maa ngi fi rekk",
+        "Jàmm rekk, alxamdulilaay",
+        "Sama tool dafa am feebar",
+        "Xob yi dañuy wow",
+        "Lan laa war a def?",
+        "Ñaata la garab bi jar?",
+        "Dama bëgg xam naka laa mën a faj sama mbay",
+        "Sama soble yi dañuy yàqu",
+        "Taw bi dafa bari ren",
+        "Waaw, dégg naa",
+        "Déedéet, xawma ko",
+        "Kañ laa war a ji gerte?",
+        "Fan laa mën a jënd garab bi?",
+        "Sama gerte dafa am tàkk yu ñuul",
+        "Mangi lay sant",
+        "Yalla na la Yalla fey",
+        "Ndax mën nga ma dimbali?",
+        "Suuf si dafa wow lool",
+        "Gunóor yi dañuy lekk xob yi",
+        "Sama dugub dafa mel ni dafa feebar",
+        "Ci suba laa tëj mbay mi",
+        "Ana garab bi ngay wax?",
+        "Mbay mi dafa néew",
+        "Naka nga def?",
+    ],
+    "pu": [
+        "Jam waali? Jam tan",
+        "Gese am ɗe njawi",
+        "Leeɗe ɗe ina ɓoyi",
+        "Hol no mbaɗ-mi?",
+        "Mi yiɗi anndude lekki moƴƴo",
+        "Albasal am ina ñawi",
+        "Ndiyam ina heewi hitaande ndee",
+        "Eey, mi faamii",
+        "Alaa, mi anndaa",
+        "Toy mi heɓata lekki oo?",
+        "Hol ɗo mi soodata lekki?",
+        "Gawri am ina woodi tobbe ɓaleeje",
+        "A jaaraama no feewi",
+        "Allah hokku en jam",
+        "Aɗa waawi wallude kam?",
+        "Leydi ndi ina yoori",
+        "Kuɓe ina nyaama leeɗe",
+        "Ko honɗum waɗi gese am?",
+        "Subaka mi wurinta gese",
+        "Hol lekki ngam ñawu leeɗe?",
+        "Hol no njaɓɓaa?",
+        "Ñawu oo ina yaajna",
+        "Mi hokkii ndiyam ndi",
+        "Haa jango",
+    ],
+}
+
+# Messages annotés à la main, absents de l'entraînement (rapport de précision)
+EVALUATION_MESSAGES = [
+    ("fr", "salut tout le monde"), ("fr", "merci infiniment"), ("fr", "oui monsieur"), ("fr", "non merci"),
+    ("fr", "mes tomates sont malades"), ("fr", "que faire contre les insectes ?"),
+    ("fr", "les feuilles deviennent jaunes"), ("fr", "quand récolter le mil ?"),
+    ("fr", "c'est grave ?"), ("fr", "combien coûte le traitement"),
+    ("fr", "ma parcelle est inondée"), ("fr", "j'ai besoin d'un conseil"),
+    ("fr", "les fruits pourrissent"), ("fr", "quelle dose de neem"),
+    ("fr", "à plus tard"), ("fr", "d'accord"),
+    ("wo", "naka suba si"), ("wo", "jërëjëf"), ("wo", "waaw kay"), ("wo", "déet"),
+    ("wo", "sama tomate yi dañuy feebar"), ("wo", "lan laa war a def ak gunóor yi"),
+    ("wo", "xob yi dañuy mboq"), ("wo", "kañ laa war a góob dugub bi"),
+    ("wo", "ndax dafa metti?"), ("wo", "ñaata la garab bi"),
+    ("wo", "sama tool dafa nekk ci ndox"), ("wo", "dama soxla digal"),
+    ("wo", "ba suba"), ("wo", "mangi dem"), ("wo", "garab neem bi ñaata laa war a def"),
+    ("pu", "jam weeti"), ("pu", "a jaaraama"), ("pu", "eyyo"), ("pu", "alaa tawo"),
+    ("pu", "tomate am ɗe njawi"), ("pu", "hol ko mbaɗ-mi e kuɓe ɗe"),
+    ("pu", "leeɗe ɗe ina ɓoyi ko"), ("pu", "toy mi roƴƴata gawri"),
+    ("pu", "ɗum ina bonnde?"), ("pu", "no foti lekki oo"),
+    ("pu", "ngesa am ina heewi ndiyam"), ("pu", "mi yiɗi ballal"),
+    ("pu", "haa hakkunde"), ("pu", "mi yahii"), ("pu", "no foti neem huutoraama"),
+]
+
+
+def knowledge_texts(kb: KnowledgeBase) -> List[Tuple[str, str]]:
+    """Textes rédigés dans chaque langue par la base de connaissances (langue, texte)"""
+    samples = []
+    for disease in kb.diseases.values():
+        for lang, info in disease.texts.items():
+            samples += [(lang, symptom) for symptom in info.symptoms]
+            if info.causes:
+                samples.append((lang, info.causes))
+        for lang, tips in disease.prevention.items():
+            samples += [(lang, tip) for tip in tips]
+    for crop in kb.crops.values():
+        samples += [(lang, info.water) for lang, info in crop.texts.items() if info.water]
+    for treatment in kb.treatments:
+        samples += list(treatment.texts.items())
+    for lang, tips in kb.prevention.items():
+        samples += [(lang, tip) for tip in tips]
+    for by_lang in (*kb.seasonal_prevention.values(), *kb.seasons.values(), *kb.translations.values()):
+        samples += [(lang, text.replace("{", "").replace("}", "")) for lang, text in by_lang.items()]
+    for lang, by_intent in kb.suggestions.items():
+        samples += [(lang, text) for texts in by_intent.values() for text in texts]
+    return [(lang, text) for lang, text in samples if lang in LANGUAGES]
+
+
+def training_samples(kb: KnowledgeBase, extra: Iterable[Tuple[str, str]] = ()) -> List[Tuple[str, str]]:
+    """
+    Corpus d'entraînement : base de connaissances, messages types et corpus
+    supplémentaire, plus les fenêtres d'un et deux mots de chaque phrase
+    (les messages courts sont ceux que l'ancienne méthode ratait)
+    """
+    sentences = knowledge_texts(kb)
+    sentences += [(lang, text) for lang, texts in TRAINING_MESSAGES.items() for text in texts]
+    sentences += [(lang, text) for lang, text in extra if lang in LANGUAGES]
+    
+    samples = set(sentences)
+    for lang, text in sentences:
+        words = [word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 1]
+        for size in (1, 2):
+            for i in range(len(words) - size + 1):
+                samples.add((lang, " ".join(words[i:i + size])))
+    return sorted(samples)
+
+
+def read_corpus(path: str) -> List[Tuple[str, str]]:
+    """Corpus annoté JSONL : une ligne {"lang": "wo", "text": "..."} par message"""
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row['lang'], row['text']) for row in rows]
+
+
+# ========================================
+# Caractéristiques
+# ========================================
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str) -> Tuple[int, ...]:
+    """Indices hachés des n-grammes (1 à MAX_NGRAM) du mot entouré d'espaces"""
+    padded = f" {word} "
+    grams = list(word)
+    for n in range(2, MAX_NGRAM + 1):
+        grams += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    return tuple(zlib.crc32(gram.encode('utf-8')) & (NUM_FEATURES - 1) for gram in grams)
+
+
+def hash_features(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Matrice creuse (lignes, colonnes, valeurs) des messages : log(1 + tf)
+    des n-grammes hachés, normalisée L2 par message
+    """
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for word in WORD_PATTERN.findall(text.lower()):
+            features = _word_features(word)
+            cols.extend(features)
+            rows.extend([row] * len(features))
+    if not cols:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+    
+    # Comptes par (ligne, colonne)
+    keys, counts = np.unique(np.asarray(rows, np.int64) * NUM_FEATURES + np.asarray(cols, np.int64),
+                             return_counts=True)
+    rows, cols = keys // NUM_FEATURES, keys % NUM_FEATURES
+    values = np.log1p(counts).astype(np.float32)
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(texts)))
+    values /= norms[rows].astype(np.float32)
+    return rows, cols, values
+
+
+def _sparse_dot(rows, cols, values, weights: np.ndarray, num_rows: int) -> np.ndarray:
+    """X @ weights pour la matrice creuse X (num_rows x NUM_FEATURES)"""
+    contributions = weights[cols] * values[:, None]
+    return np.stack([np.bincount(rows, weights=contributions[:, k], minlength=num_rows)
+                     for k in range(weights.shape[1])], axis=1)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# ========================================
+# Modèle
+# ========================================
+
+class LanguageIdentifier:
+    """
+    Modèle linéaire sur n-grammes hachés : poids (NUM_FEATURES x langues)
+    en float32 et biais par langue
+    """
+    
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, languages: Sequence[str] = LANGUAGES,
+                 default: str = DEFAULT_LANGUAGE):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.languages = tuple(languages)
+        self.default = default
+    
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Probabilités (messages x langues) d'un lot de messages"""
+        rows, cols, values = hash_features(texts)
+        logits = _sparse_dot(rows, cols, values, self.weights, len(texts)) + self.bias
+        return _softmax(logits)
+    
+    def identify(self, texts: Sequence[str]) -> List[str]:
+        """
+        Langue de chaque message du lot (calcul vectorisé) ; langue par
+        défaut pour les messages sans lettres
+        """
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [self.languages[k] if WORD_PATTERN.search(text) else self.default
+                for k, text in zip(best, texts)]
+    
+    def identify_one(self, text: str) -> str:
+        """Langue d'un seul message (chemin court, sans matrice creuse)"""
+        cols = [feature for word in WORD_PATTERN.findall(text.lower()) for feature in _word_features(word)]
+        if not cols:
+            return self.default
+        cols, counts = np.unique(cols, return_counts=True)
+        values = np.log1p(counts)
+        values /= np.sqrt(values @ values)
+        logits = values @ self.weights[cols] + self.bias
+        return self.languages[int(logits.argmax())]
+    
+    def save(self, path: str = MODEL_PATH) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, weights=self.weights, bias=self.bias, languages=np.array(self.languages),
+                 feature_version=np.array(FEATURE_VERSION))
+        return path
+    
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "LanguageIdentifier":
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['feature_version']) != FEATURE_VERSION:
+                raise ValueError(f"Modèle {path} obtenu avec d'autres caractéristiques "
+                                 f"({data['feature_version']})")
+            return cls(data['weights'], data['bias'], [str(lang) for lang in data['languages']])
+
+
+def train_language_identifier(samples: Sequence[Tuple[str, str]], epochs: int = 300,
+                              learning_rate: float = 2.0, l2: float = 1e-4,
+                              languages: Sequence[str] = LANGUAGES) -> LanguageIdentifier:
+    """
+    Régression logistique multinomiale par descente de gradient sur la
+    matrice creuse, exemples pondérés pour équilibrer les langues
+    """
+    lang_index = {lang: k for k, lang in enumerate(languages)}
+    labels = np.array([lang_index[lang] for lang, _ in samples])
+    rows, cols, values = hash_features([text for _, text in samples])
+    num_samples, num_classes = len(samples), len(languages)
+    
+    targets = np.eye(num_classes, dtype=np.float32)[labels]
+    class_counts = np.bincount(labels, minlength=num_classes)
+    sample_weights = (num_samples / (num_classes * class_counts[labels]))[:, None]
+    
+    weights = np.zeros((NUM_FEATURES, num_classes), dtype=np.float32)
+    bias = np.zeros(num_classes, dtype=np.float32)
+    for _ in range(epochs):
+        probabilities = _softmax(_sparse_dot(rows, cols, values, weights, num_samples) + bias)
+        error = (probabilities - targets) * sample_weights / num_samples
+        gradient = np.stack([np.bincount(cols, weights=values * error[rows, k], minlength=NUM_FEATURES)
+                             for k in range(num_classes)], axis=1)
+        weights -= learning_rate * (gradient + l2 * weights).astype(np.float32)
+        bias -= learning_rate * error.sum(axis=0).astype(np.float32)
+    
+    return LanguageIdentifier(weights, bias, languages)
+
+
+_identifier = None
+_identifier_loaded = False
+_identifier_lock = threading.Lock()
+
+
+def get_language_identifier(path: str = MODEL_PATH) -> Optional[LanguageIdentifier]:
+    """
+    Modèle du processus, chargé depuis `path` au premier appel ; None si le
+    modèle n'a pas été entraîné (`python language_id.py --train`, lancé par
+    init_setup.sh et le Dockerfile) : jamais d'entraînement pendant une requête
+    """
+    global _identifier, _identifier_loaded
+    if not _identifier_loaded:
+        with _identifier_lock:
+            if not _identifier_loaded:
+                try:
+                    _identifier = LanguageIdentifier.load(path)
+                except (OSError, KeyError, ValueError) as e:
+                    print(f"⚠ Modèle de langue indisponible ({e.__class__.__name__}), "
+                          f"identification par mots-clés (python language_id.py --train)")
+                _identifier_loaded = True
+    return _identifier
+
+
+# ========================================
+# Évaluation
+# ========================================
+
+def _normalize(text: str) -> str:
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def held_out(samples: Sequence[Tuple[str, str]],
+             training: Sequence[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Messages d'évaluation absents du corpus d'entraînement (mots identiques)"""
+    seen = {_normalize(text) for _, text in training}
+    return [(lang, text) for lang, text in samples if _normalize(text) not in seen]
+
+
+def evaluate(identifier: LanguageIdentifier,
+             samples: Sequence[Tuple[str, str]] = EVALUATION_MESSAGES,
+             repeat: int = 200, training: Optional[Sequence[Tuple[str, str]]] = None) -> Dict[str, Dict]:
+    """
+    Précision (globale, par langue, messages d'un ou deux mots) et latence
+    du modèle et de l'ancienne heuristique par mots-clés, sur les seuls
+    messages absents de `training` (corpus intégré par défaut)
+    """
+    from chatbot import MESSAGE_MATCHER
+    
+    if training is None:
+        training = training_samples(get_knowledge_base())
+    samples = held_out(samples, training)
+    
+    texts = [text for _, text in samples]
+    expected = [lang for lang, _ in samples]
+    
+    def heuristic(text):
+        return MESSAGE_MATCHER.pick_language(MESSAGE_MATCHER.match(text)[1])
+    
+    # nom -> (un message, lot de messages)
+    methods = {
+        "mots-clés": (heuristic, lambda batch: [heuristic(text) for text in batch]),
+        "modèle": (identifier.identify_one, identifier.identify),
+    }
+    report = {}
+    for name, (identify_one, identify) in methods.items():
+        predicted = identify(texts)
+        correct = [p == e for p, e in zip(predicted, expected)]
+        short = [c for c, text in zip(correct, texts) if len(WORD_PATTERN.findall(text)) <= 2]
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                identify_one(text)
+        single_us = (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            identify(texts)
+        batch_us = (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+        
+        report[name] = {
+            'messages': len(samples),
+            'accuracy': float(np.mean(correct)),
+            'accuracy_by_language': {
+                lang: float(np.mean([c for c, e in zip(correct, expected) if e == lang]))
+                for lang in LANGUAGES
+            },
+            'accuracy_short': float(np.mean(short)) if short else None,
+            'us_per_message': single_us,
+            'us_per_message_batch': batch_us,
+            'errors': [f"{e} -> {p}: {text}" for p, e, text in zip(predicted, expected, texts) if p != e],
+        }
+    return report
+
+
+def main():
+    """
+    Entraîner, évaluer ou interroger le modèle de langue
+    """
+    parser = argparse.ArgumentParser(description="Identification de la langue des messages AgriDetect")
+    parser.add_argument('--train', action='store_true', help="(Ré)entraîner et enregistrer le modèle")
+    parser.add_argument('--corpus', action='append', default=[],
+                        help="Corpus annoté JSONL supplémentaire {\"lang\", \"text\"} (répétable)")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--evaluate', action='store_true',
+                        help="Précision et latence comparées à l'heuristique par mots-clés")
+    parser.add_argument('--identify', action='append', default=[], help="Message à identifier (répétable)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Identification de la Langue")
+    print("=" * 60)
+    print()
+    
+    extra = [sample for path in args.corpus for sample in read_corpus(path)]
+    if args.train:
+        samples = training_samples(get_knowledge_base(), extra)
+        start = time.perf_counter()
+        identifier = train_language_identifier(samples)
+        counts = {lang: sum(1 for l, _ in samples if l == lang) for lang in LANGUAGES}
+        print(f"🧠 Entraîné sur {len(samples)} exemples {counts} en {time.perf_counter() - start:.1f}s")
+        path = identifier.save(args.model)
+        print(f"✅ Modèle enregistré: {path} ({os.path.getsize(path) / 1024:.0f} Ko)")
+    elif not os.path.exists(args.model):
+        print(f"❌ Modèle introuvable: {args.model}. Lancez d'abord: python language_id.py --train")
+        sys.exit(1)
+    
+    start = time.perf_counter()
+    identifier = LanguageIdentifier.load(args.model)
+    print(f"⚡ Chargement du modèle: {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    if args.identify:
+        print()
+        probabilities = identifier.predict_proba(args.identify)
+        for text, lang, row in zip(args.identify, identifier.identify(args.identify), probabilities):
+            scores = ", ".join(f"{l} {p:.2f}" for l, p in zip(identifier.languages, row))
+            print(f"{lang}  ({scores})  {text}")
+    
+    if args.evaluate:
+        report = evaluate(identifier, training=training_samples(get_knowledge_base(), extra))
+        print(f"\n📊 {report['modèle']['messages']} messages annotés hors entraînement "
+              f"(sur {len(EVALUATION_MESSAGES)})\n")
+        for name, stats in report.items():
+            by_lang = " ".join(f"{lang} {acc:.0%}" for lang, acc in stats['accuracy_by_language'].items())
+            print(f"   {name:<10} précision {stats['accuracy']:.1%} ({by_lang}), "
+                  f"messages courts {stats['accuracy_short']:.1%}")
+            print(f"   {'':<10} {stats['us_per_message']:.1f} µs/message, "
+                  f"{stats['us_per_message_batch']:.1f} µs/message par lot")
+        for error in report['modèle']['errors']:
+            print(f"   ❌ {error}")
+
+
+if __name__ == "__main__":
+    main()
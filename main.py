@@ -1,4 +1,5 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, WebSocket
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
@@ -7,7 +8,15 @@ from datetime import datetime
 import numpy as np
 from PIL import Image
 import io
+import os
 import base64
+import uuid
+from fastapi.concurrency import run_in_threadpool
+
+from database import record_feedback, record_detection
+from chat_sessions import get_session_manager
+from chat_streaming import sse_stream, websocket_chat
+from detection_context import get_detection_lookup
 
 app = FastAPI(
     title="AgriDetect API",
@@ -34,6 +43,7 @@ class DiseaseDetectionResponse(BaseModel):
     prevention_tips: List[str]
     affected_crop: str
     detection_date: datetime
+    detection_id: Optional[str] = None  # à passer dans le contexte du chat
 
 class TreatmentRecommendation(BaseModel):
     treatment_id: str
@@ -47,8 +57,10 @@ class TreatmentRecommendation(BaseModel):
 
 class ChatMessage(BaseModel):
     message: str
-    language: str = "fr"  # fr, wo (wolof), pu (pulaar)
+    language: Optional[str] = None  # fr, wo (wolof), pu (pulaar) ; détectée dans le message si absente
     context: Optional[dict] = None
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
 
 class CropAnalysis(BaseModel):
     crop_type: str
@@ -73,6 +85,8 @@ async def root():
         "endpoints": {
             "disease_detection": "/api/v1/detect-disease",
             "chat": "/api/v1/chat",
+            "chat_stream": "/api/v1/chat/stream",
+            "chat_websocket": "/api/v1/chat/ws",
             "treatments": "/api/v1/treatments",
             "crop_analysis": "/api/v1/analyze-crop"
         }
@@ -96,9 +110,10 @@ async def detect_disease(
         image = Image.open(io.BytesIO(contents))
         
         # TODO: Appeler le modèle CNN pour la détection
-        # Pour le moment, réponse simulée
+        # Pour le moment, réponse simulée (classe du modèle et code de la table diseases)
+        model_class = "Tomato_Late_blight"
         response = DiseaseDetectionResponse(
-            disease_id="leaf_blight_001",
+            disease_id="MILDEW_001",
             disease_name="Mildiou de la feuille",
             confidence=0.89,
             severity="Modérée",
@@ -116,9 +131,18 @@ async def detect_disease(
                 "Retirer les feuilles infectées"
             ],
             affected_crop=crop_type or "Tomate",
-            detection_date=datetime.now()
+            detection_date=datetime.now(),
+            detection_id=str(uuid.uuid4())
         )
         
+        # Image et détection enregistrées : le feedback sur cette détection sert au réentraînement
+        extension = os.path.splitext(file.filename or "")[1].lower() or ".jpg"
+        await run_in_threadpool(record_detection, response.detection_id, response.dict(),
+                                contents, model_class, extension)
+        
+        # Résultat conservé pour les questions de suivi dans le chat (sans nouvelle inférence)
+        await run_in_threadpool(get_detection_lookup().remember, response.detection_id, response.dict())
+        
         return response
         
     except Exception as e:
@@ -128,37 +152,65 @@ async def detect_disease(
 async def chat_with_bot(message: ChatMessage):
     """
     Interface de chat multilingue pour assistance
+    
+    context: {"detection_id": ...} pour poser des questions sur une photo
+    déjà analysée (traitement, prévention) sans la renvoyer
+    language: langue de la réponse imposée ; sinon détectée dans le message
     """
     try:
-        # Détection de la langue et traitement
         language_map = {
             "fr": "Français",
             "wo": "Wolof",
             "pu": "Pulaar"
         }
         
-        # TODO: Intégrer le modèle de langage multilingue
-        # Réponse simulée pour le moment
-        responses = {
-            "fr": "Je comprends votre question. Voici mes recommandations...",
-            "wo": "Maa ngi lay xamal. Lii mooy sama digal...",
-            "pu": "Mi faami nde naamndaa. Ɗum ko mi waawi wallude..."
-        }
+        # Session partagée entre les workers (Redis), historique borné
+        session_id = message.session_id or str(uuid.uuid4())
+        result = await run_in_threadpool(
+            get_session_manager().chat, session_id, message.message, message.context,
+            message.user_id, message.language
+        )
         
         return {
-            "response": responses.get(message.language, responses["fr"]),
-            "language": language_map.get(message.language, "Français"),
-            "suggestions": [
-                "Comment prévenir cette maladie?",
-                "Quels sont les symptômes?",
-                "Traitement biologique disponible?"
-            ],
+            "response": result["response"],
+            "language": language_map.get(result["language"], "Français"),
+            "language_code": result["language"],
+            "intent": result["intent"],
+            "suggestions": result["suggestions"],
+            "session_id": session_id,
             "timestamp": datetime.now()
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Chat en flux (Server-Sent Events) : événements meta, delta (texte),
+    suggestions et done, commentaires ': ping' pendant la génération
+    """
+    session_id = message.session_id or str(uuid.uuid4())
+    return StreamingResponse(
+        sse_stream(get_session_manager(), session_id, message.message, message.context,
+                   message.user_id, message.language),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # pas de mise en tampon par nginx
+            "X-Session-Id": session_id,
+        }
+    )
+
+@app.websocket("/api/v1/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Chat sur WebSocket (?session_id=...) : mêmes événements que /chat/stream,
+    battements de cœur et fermeture des connexions inactives
+    """
+    await websocket.accept()
+    await websocket_chat(websocket, get_session_manager())
+
 @app.get("/api/v1/treatments/{disease_id}")
 async def get_treatments(disease_id: str):
     """
@@ -282,12 +334,22 @@ async def submit_feedback(
     """
     Soumettre un feedback sur une détection
     """
+    # Journal d'audit local + mise à jour de la détection (lue par l'entraînement incrémental)
+    record = await run_in_threadpool(record_feedback, detection_id, correct, actual_disease)
+    
     return {
         "status": "success",
         "message": "Merci pour votre retour",
-        "feedback_id": f"fb_{datetime.now().timestamp()}"
+        "feedback_id": record['feedback_id']
     }
 
+@app.on_event("shutdown")
+async def flush_chat_messages():
+    """
+    Écrire les messages de chat encore en file avant l'arrêt
+    """
+    await run_in_threadpool(get_session_manager().close)
+
 @app.get("/health")
 async def health_check():
     """
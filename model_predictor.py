@@ -10,6 +10,8 @@ from PIL import Image
 import tensorflow as tf
 from typing import Dict, List, Tuple
 
+from calibration import apply_calibration
+
 
 class DiseaseDetector:
     """
@@ -27,6 +29,7 @@ class DiseaseDetector:
         self.model = None
         self.metadata = None
         self.class_names = None
+        self.calibration = None
         
         self._load_model()
         self._load_metadata()
@@ -58,6 +61,11 @@ class DiseaseDetector:
             # Extraire les noms de classes
             self.class_names = {int(k): v for k, v in self.metadata['classes'].items()}
             print(f"✓ Métadonnées chargées: {len(self.class_names)} classes")
+            
+            # Calibration des confiances (calibration.py), si ajustée
+            self.calibration = self.metadata.get('calibration')
+            if self.calibration:
+                print(f"✓ Calibration: {self.calibration['method']}")
         else:
             print("⚠ Métadonnées non trouvées, utilisation des classes par défaut")
             self.class_names = {}
@@ -88,6 +96,52 @@ class DiseaseDetector:
         
         return img_array
     
+    def predict_probabilities(self, image_paths: List[str]) -> np.ndarray:
+        """
+        Probabilités calibrées pour un batch d'images (une seule inférence)
+        
+        Args:
+            image_paths: Chemins vers les images
+            
+        Returns:
+            Tableau (nombre d'images, nombre de classes)
+        """
+        batch = np.concatenate([self.preprocess_image(path) for path in image_paths], axis=0)
+        probabilities = self.model.predict(batch, verbose=0)
+        
+        # Recalibrer dans le même passage (quelques opérations NumPy par batch)
+        return apply_calibration(probabilities, self.calibration)
+    
+    def predict_batch(self, image_paths: List[str], top_k: int = 3) -> List[List[Dict]]:
+        """
+        Prédire la maladie sur plusieurs images en un seul batch
+        
+        Args:
+            image_paths: Chemins vers les images
+            top_k: Nombre de prédictions à retourner par image
+            
+        Returns:
+            Liste (une par image) des prédictions avec confiance
+        """
+        probabilities = self.predict_probabilities(image_paths)
+        top_indices = np.argsort(probabilities, axis=1)[:, -top_k:][:, ::-1]
+        
+        batch_results = []
+        for predictions, indices in zip(probabilities, top_indices):
+            results = []
+            for idx in indices:
+                disease_name = self.class_names.get(idx, f"classe_{idx}")
+                confidence = float(predictions[idx])
+                
+                results.append({
+                    'disease_id': f"disease_{idx}",
+                    'disease_name': disease_name,
+                    'confidence': confidence
+                })
+            batch_results.append(results)
+        
+        return batch_results
+    
     def predict(self, image_path: str, top_k: int = 3) -> List[Dict]:
         """
         Prédire la maladie sur une image
@@ -99,27 +153,7 @@ class DiseaseDetector:
         Returns:
             Liste des prédictions avec confiance
         """
-        # Prétraiter l'image
-        img_array = self.preprocess_image(image_path)
-        
-        # Prédire
-        predictions = self.model.predict(img_array, verbose=0)[0]
-        
-        # Obtenir les top-k prédictions
-        top_indices = np.argsort(predictions)[-top_k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            disease_name = self.class_names.get(idx, f"classe_{idx}")
-            confidence = float(predictions[idx])
-            
-            results.append({
-                'disease_id': f"disease_{idx}",
-                'disease_name': disease_name,
-                'confidence': confidence
-            })
-        
-        return results
+        return self.predict_batch([image_path], top_k=top_k)[0]
     
     def detect_disease(self, image_path: str, confidence_threshold: float = 0.7) -> Dict:
         """
@@ -132,34 +166,52 @@ class DiseaseDetector:
         Returns:
             Résultat de détection complet
         """
-        # Obtenir les prédictions
-        predictions = self.predict(image_path, top_k=3)
-        
-        # Meilleure prédiction
-        best_prediction = predictions[0]
+        return self.detect_diseases([image_path], confidence_threshold)[0]
+    
+    def detect_diseases(self, image_paths: List[str], confidence_threshold: float = 0.7) -> List[Dict]:
+        """
+        Détecter les maladies de plusieurs images en un seul batch
         
-        # Déterminer la sévérité basée sur la confiance
-        confidence = best_prediction['confidence']
-        if confidence >= 0.9:
-            severity = "Élevée"
-        elif confidence >= 0.7:
-            severity = "Modérée"
-        else:
-            severity = "Faible"
+        Les confiances sont calibrées si metadata.json contient une
+        calibration : les cas sous `confidence_threshold` sont marqués
+        incertains (à orienter vers un expert ou un second avis).
         
-        # Construire le résultat
-        result = {
-            'disease_id': best_prediction['disease_id'],
-            'disease_name': best_prediction['disease_name'],
-            'confidence': confidence,
-            'severity': severity,
-            'alternative_diagnoses': predictions[1:],
-            'treatments': self._get_treatments(best_prediction['disease_name']),
-            'prevention_tips': self._get_prevention_tips(best_prediction['disease_name']),
-            'affected_crop': self._extract_crop_name(best_prediction['disease_name'])
-        }
+        Args:
+            image_paths: Chemins vers les images
+            confidence_threshold: Seuil de confiance minimum
+            
+        Returns:
+            Résultats de détection complets, dans l'ordre des images
+        """
+        results = []
+        for predictions in self.predict_batch(image_paths, top_k=3):
+            # Meilleure prédiction
+            best_prediction = predictions[0]
+            
+            # Déterminer la sévérité basée sur la confiance
+            confidence = best_prediction['confidence']
+            if confidence >= 0.9:
+                severity = "Élevée"
+            elif confidence >= 0.7:
+                severity = "Modérée"
+            else:
+                severity = "Faible"
+            
+            # Construire le résultat
+            results.append({
+                'disease_id': best_prediction['disease_id'],
+                'disease_name': best_prediction['disease_name'],
+                'confidence': confidence,
+                'calibrated': bool(self.calibration),
+                'uncertain': confidence < confidence_threshold,
+                'severity': severity,
+                'alternative_diagnoses': predictions[1:],
+                'treatments': self._get_treatments(best_prediction['disease_name']),
+                'prevention_tips': self._get_prevention_tips(best_prediction['disease_name']),
+                'affected_crop': self._extract_crop_name(best_prediction['disease_name'])
+            })
         
-        return result
+        return results
     
     def _get_treatments(self, disease_name: str) -> List[Dict]:
         """
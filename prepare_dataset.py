@@ -4,52 +4,268 @@ Script pour télécharger et préparer des datasets de maladies des plantes
 """
 
 import os
+import json
+import hashlib
 import zipfile
 import requests
 from pathlib import Path
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+from dataset_manifest import build_manifest
+
+
+class RangeNotSupportedError(Exception):
+    """Le serveur a répondu 200 (fichier complet) à une requête Range"""
+
 
 class DatasetDownloader:
     """
     Téléchargeur de datasets pour AgriDetect
     """
     
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", chunk_size=1 << 20, timeout=30, retries=5, session=None):
+        """
+        Args:
+            data_dir: Dossier des données
+            chunk_size: Taille du tampon de lecture/écriture (octets)
+            timeout: Délai réseau (connexion et lecture) en secondes
+            retries: Nombre de tentatives par segment avant abandon
+            session: Session requests (injectable, ex. pour un serveur local de test)
+        """
         self.data_dir = data_dir
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.session = session or requests.Session()
         os.makedirs(data_dir, exist_ok=True)
     
-    def download_file(self, url: str, destination: str):
+    # ========================================
+    # Téléchargement
+    # ========================================
+    
+    def _probe(self, url: str):
+        """
+        Taille du fichier et support des requêtes Range
+        
+        Returns:
+            (taille ou None, ranges supportées)
+        """
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        response.raise_for_status()
+        size = response.headers.get('content-length')
+        accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+        return (int(size) if size else None), accepts_ranges
+    
+    def _fetch_range(self, url: str, part_path: str, segment: dict, lock, state: dict,
+                     state_path: str, pbar):
+        """
+        Télécharger un segment [start, end] en reprenant à sa position courante
+        """
+        import time
+        
+        attempt = 0
+        while segment['position'] <= segment['end']:
+            headers = {'Range': f"bytes={segment['position']}-{segment['end']}"}
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 200:
+                        raise RangeNotSupportedError(url)
+                    if response.status_code != 206:
+                        raise IOError(f"Réponse {response.status_code} à une requête Range")
+                    with open(part_path, 'r+b') as part:
+                        part.seek(segment['position'])
+                        for data in response.iter_content(chunk_size=self.chunk_size):
+                            part.write(data)
+                            segment['position'] += len(data)
+                            pbar.update(len(data))
+                            with lock:
+                                self._save_state(state_path, state)
+                attempt = 0
+            except (requests.RequestException, IOError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                delay = min(60, 2 ** attempt)
+                print(f"⚠ Segment {segment['start']}-{segment['end']}: {e} (nouvel essai dans {delay}s)")
+                time.sleep(delay)
+    
+    @staticmethod
+    def _save_state(state_path: str, state: dict):
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    
+    def _download_stream(self, url: str, part_path: str, pbar):
+        """
+        Téléchargement en un seul flux, repris à la taille du fichier partiel
+        (serveurs sans Range ou taille inconnue)
+        """
+        import time
+        
+        attempt = 0
+        while True:
+            position = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {'Range': f"bytes={position}-"} if position else {}
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 416:
+                        return  # Déjà complet
+                    response.raise_for_status()
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    if mode == 'wb':
+                        pbar.reset()
+                    else:
+                        pbar.update(position - pbar.n)
+                    with open(part_path, mode) as part:
+                        for data in response.iter_content(chunk_size=self.chunk_size):
+                            pbar.update(part.write(data))
+                return
+            except requests.RequestException as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                delay = min(60, 2 ** attempt)
+                print(f"⚠ {e} (reprise dans {delay}s)")
+                time.sleep(delay)
+    
+    @staticmethod
+    def file_sha256(path: str, chunk_size=1 << 20) -> str:
+        """Hash SHA-256 d'un fichier"""
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+    
+    def download_file(self, url: str, destination: str, sha256: str = None, segments: int = 4):
         """
         Télécharger un fichier avec barre de progression
+        
+        Le téléchargement est écrit dans `<destination>.part` et peut être
+        repris après une coupure : si le serveur accepte les requêtes Range,
+        le fichier est découpé en `segments` parties téléchargées en parallèle
+        (progression de chaque partie dans `<destination>.part.json`), sinon
+        un flux unique reprend à la taille déjà reçue.
+        
+        Args:
+            sha256: Empreinte attendue ; le fichier est supprimé si elle ne correspond pas
+            segments: Nombre de connexions parallèles
         """
+        import threading
+        
         print(f"📥 Téléchargement depuis {url}...")
         
-        response = requests.get(url, stream=True)
-        total_size = int(response.headers.get('content-length', 0))
+        part_path = destination + ".part"
+        state_path = part_path + ".json"
+        total_size, accepts_ranges = self._probe(url)
         
-        with open(destination, 'wb') as file, tqdm(
+        with tqdm(
             desc=os.path.basename(destination),
             total=total_size,
             unit='iB',
             unit_scale=True,
             unit_divisor=1024,
         ) as pbar:
-            for data in response.iter_content(chunk_size=1024):
-                size = file.write(data)
-                pbar.update(size)
+            if accepts_ranges and total_size:
+                # Reprendre l'état des segments s'il correspond au même fichier
+                state = None
+                if os.path.exists(state_path) and os.path.exists(part_path):
+                    with open(state_path, 'r') as f:
+                        state = json.load(f)
+                    if state.get('url') != url or state.get('size') != total_size:
+                        state = None
+                
+                if state is None:
+                    segment_size = -(-total_size // max(1, segments))
+                    state = {
+                        'url': url,
+                        'size': total_size,
+                        'segments': [
+                            {'start': start, 'end': min(start + segment_size, total_size) - 1, 'position': start}
+                            for start in range(0, total_size, segment_size)
+                        ]
+                    }
+                    with open(part_path, 'wb') as part:
+                        part.truncate(total_size)
+                    self._save_state(state_path, state)
+                else:
+                    print("↻ Reprise du téléchargement")
+                
+                pbar.update(sum(seg['position'] - seg['start'] for seg in state['segments']))
+                lock = threading.Lock()
+                try:
+                    with ThreadPoolExecutor(max_workers=len(state['segments'])) as executor:
+                        futures = [
+                            executor.submit(self._fetch_range, url, part_path, segment, lock,
+                                            state, state_path, pbar)
+                            for segment in state['segments']
+                        ]
+                        for future in futures:
+                            future.result()
+                except RangeNotSupportedError:
+                    # Range annoncé mais ignoré : un seul flux depuis le début
+                    print("⚠ Requêtes Range ignorées par le serveur, téléchargement en un seul flux")
+                    os.remove(part_path)
+                    os.remove(state_path)
+                    pbar.reset()
+                    self._download_stream(url, part_path, pbar)
+            else:
+                self._download_stream(url, part_path, pbar)
+        
+        if sha256:
+            actual = self.file_sha256(part_path, self.chunk_size)
+            if actual.lower() != sha256.lower():
+                os.remove(part_path)
+                if os.path.exists(state_path):
+                    os.remove(state_path)
+                raise ValueError(f"Empreinte SHA-256 invalide pour {destination}: {actual}")
+            print("✓ Empreinte SHA-256 vérifiée")
+        
+        os.replace(part_path, destination)
+        if os.path.exists(state_path):
+            os.remove(state_path)
         
         print(f"✓ Téléchargé: {destination}")
     
-    def extract_zip(self, zip_path: str, extract_to: str):
+    def extract_zip(self, zip_path: str, extract_to: str, workers=None):
         """
-        Extraire un fichier ZIP
+        Extraire un fichier ZIP en parallèle
+        
+        Chaque thread ouvre sa propre instance de ZipFile (un ZipFile
+        partagé n'est pas sûr entre threads) ; la décompression zlib libère
+        le GIL.
         """
         print(f"📦 Extraction de {zip_path}...")
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-        print(f"✓ Extrait vers: {extract_to}")
+            members = zip_ref.infolist()
+        
+        # Refuser l'archive si un membre sort du dossier d'extraction (« zip slip »)
+        root = os.path.realpath(extract_to)
+        for member in members:
+            target = os.path.realpath(os.path.join(root, member.filename))
+            if os.path.commonpath([root, target]) != root:
+                raise ValueError(f"Membre hors du dossier d'extraction dans {zip_path}: {member.filename}")
+        
+        # Créer l'arborescence avant l'extraction parallèle (évite les courses sur makedirs)
+        for member in members:
+            target = os.path.join(extract_to, member.filename)
+            os.makedirs(target if member.is_dir() else os.path.dirname(target), exist_ok=True)
+        
+        workers = workers or min(16, os.cpu_count() or 1)
+        batches = [members[i::workers] for i in range(workers)]
+        
+        def extract_batch(batch):
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                for member in batch:
+                    zip_ref.extract(member, extract_to)
+            return len(batch)
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            extracted = sum(executor.map(extract_batch, batches))
+        print(f"✓ Extrait vers: {extract_to} ({extracted} fichiers)")
     
     def download_plantvillage(self):
         """
@@ -128,7 +344,74 @@ class DatasetDownloader:
         print("📸 Ajoutez maintenant vos images dans ces dossiers:")
         print(f"   {os.path.abspath(self.data_dir)}")
     
-    def organize_dataset(self, source_dir: str, train_split=0.7, val_split=0.15):
+    @staticmethod
+    def assign_split(class_name: str, filename: str, train_split=0.7, val_split=0.15, seed=42) -> str:
+        """
+        Assigner une image à un split à partir d'un hash de son nom
+        
+        L'assignation ne dépend que de (seed, classe, fichier) : elle est
+        identique d'un run à l'autre, et ajouter des images ne déplace pas
+        celles déjà assignées. Le hash étant calculé par classe, les
+        proportions sont respectées dans chaque classe (stratification).
+        """
+        digest = hashlib.sha1(f"{seed}:{class_name}/{filename}".encode('utf-8')).digest()
+        bucket = int.from_bytes(digest[:8], 'big') / 2 ** 64
+        
+        if bucket < train_split:
+            return 'train'
+        if bucket < train_split + val_split:
+            return 'validation'
+        return 'test'
+    
+    @staticmethod
+    def _reflink(src: str, dst: str):
+        """Copie en clonage de blocs (reflink, Btrfs/XFS) via l'ioctl FICLONE"""
+        import fcntl
+        FICLONE = 0x40049409
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except OSError:
+                dst_file.close()
+                os.remove(dst)
+                raise
+    
+    def _place_file(self, src: str, dst: str, mode: str) -> str:
+        """
+        Placer un fichier dans le dataset organisé
+        
+        Un fichier déjà placé n'est conservé que s'il est un lien vers la
+        source ou une copie de même taille et même date de modification.
+        
+        Returns:
+            Méthode effectivement utilisée ('hardlink', 'reflink', 'copy', 'skip')
+        """
+        if os.path.exists(dst):
+            src_stat, dst_stat = os.stat(src), os.stat(dst)
+            if os.path.samestat(src_stat, dst_stat) or (
+                    src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns):
+                return 'skip'
+            os.remove(dst)
+        
+        if mode == 'hardlink':
+            try:
+                os.link(src, dst)
+                return 'hardlink'
+            except OSError:
+                pass  # Autre système de fichiers ou liens non supportés
+        elif mode == 'reflink':
+            try:
+                self._reflink(src, dst)
+                shutil.copystat(src, dst)
+                return 'reflink'
+            except (OSError, ImportError):
+                pass
+        
+        shutil.copy2(src, dst)
+        return 'copy'
+    
+    def organize_dataset(self, source_dir: str, train_split=0.7, val_split=0.15,
+                         mode='auto', seed=42, workers=None):
         """
         Organiser un dataset en train/validation/test
         
@@ -136,50 +419,77 @@ class DatasetDownloader:
             source_dir: Dossier source contenant les classes
             train_split: Proportion pour l'entraînement
             val_split: Proportion pour la validation
+            mode: 'auto' (liens physiques si même système de fichiers, sinon copie),
+                  'hardlink', 'reflink' ou 'copy'
+            seed: Graine du split par hash (reproductible)
+            workers: Nombre de threads pour placer les fichiers
+        
+        Les images déjà présentes dans un autre split que celui de
+        assign_split (organisation précédente aléatoire) en sont retirées.
         """
         print(f"📁 Organisation du dataset depuis {source_dir}...")
         
-        import random
+        if mode == 'auto':
+            same_device = os.stat(source_dir).st_dev == os.stat(self.data_dir).st_dev
+            mode = 'hardlink' if same_device else 'copy'
+        print(f"   Mode: {mode}")
         
-        # Pour chaque classe
-        for class_name in os.listdir(source_dir):
+        # Planifier toutes les opérations
+        operations = []
+        sources = {}
+        stale_files = []
+        for class_name in sorted(os.listdir(source_dir)):
             class_path = os.path.join(source_dir, class_name)
             
             if not os.path.isdir(class_path):
                 continue
             
             # Lister toutes les images
-            images = [f for f in os.listdir(class_path) 
-                     if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            random.shuffle(images)
-            
-            # Calculer les splits
-            n_train = int(len(images) * train_split)
-            n_val = int(len(images) * val_split)
+            images = sorted(f for f in os.listdir(class_path)
+                            if f.lower().endswith(('.jpg', '.jpeg', '.png')))
             
-            train_images = images[:n_train]
-            val_images = images[n_train:n_train+n_val]
-            test_images = images[n_train+n_val:]
-            
-            # Copier dans les bons dossiers
-            splits_data = {
-                'train': train_images,
-                'validation': val_images,
-                'test': test_images
-            }
-            
-            for split, split_images in splits_data.items():
-                dest_dir = os.path.join(self.data_dir, split, class_name)
-                os.makedirs(dest_dir, exist_ok=True)
+            counts = {'train': 0, 'validation': 0, 'test': 0}
+            for img in images:
+                split = self.assign_split(class_name, img, train_split, val_split, seed)
+                counts[split] += 1
                 
-                for img in split_images:
-                    src = os.path.join(class_path, img)
-                    dst = os.path.join(dest_dir, img)
-                    shutil.copy2(src, dst)
+                src = os.path.join(class_path, img)
+                dst = os.path.join(self.data_dir, split, class_name, img)
+                operations.append((src, dst))
+                sources[f"{split}/{class_name}/{img}"] = os.path.abspath(src)
+                
+                # Copie laissée dans un autre split par une organisation précédente (fuite train/test)
+                for other in counts:
+                    stale = os.path.join(self.data_dir, other, class_name, img)
+                    if other != split and os.path.exists(stale) and \
+                            os.path.abspath(stale) != os.path.abspath(src):
+                        stale_files.append(stale)
+            
+            for split in counts:
+                os.makedirs(os.path.join(self.data_dir, split, class_name), exist_ok=True)
             
-            print(f"✓ {class_name}: {len(train_images)} train, "
-                  f"{len(val_images)} val, {len(test_images)} test")
+            print(f"✓ {class_name}: {counts['train']} train, "
+                  f"{counts['validation']} val, {counts['test']} test")
+        
+        # Retirer les images placées dans un autre split que le leur
+        for stale in stale_files:
+            os.remove(stale)
+        if stale_files:
+            print(f"🧹 {len(stale_files)} images retirées d'un ancien split (présentes dans deux splits)")
+        
+        # Placer les fichiers en parallèle (I/O bound)
+        workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        methods = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._place_file, src, dst, mode) for src, dst in operations]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Organisation", unit="img"):
+                method = future.result()
+                methods[method] = methods.get(method, 0) + 1
+        
+        print(f"   Fichiers: {', '.join(f'{count} {method}' for method, count in sorted(methods.items()))}")
         
+        # Index complet du dataset organisé (split et source de chaque image, dimensions, format, hash)
+        build_manifest(self.data_dir, sources=sources)
         print("✓ Dataset organisé!")
 
 
@@ -0,0 +1,143 @@
+"""
+Index inversé de la base de connaissances du chatbot
+Mots normalisés (minuscules, sans accents ni lettres spéciales), racinisés
+selon la langue, et classement BM25 des maladies / cultures en une passe
+sur les mots du message
+"""
+
+import re
+import math
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Lettres des alphabets wolof et pulaar sans décomposition Unicode
+SPECIAL_LETTERS = str.maketrans({"ɗ": "d", "ɓ": "b", "ƴ": "y", "ŋ": "ng", "œ": "oe", "æ": "ae"})
+
+STOPWORDS = {
+    "fr": {"le", "la", "les", "l", "un", "une", "des", "de", "du", "d", "et", "ou", "en", "sur", "sous",
+           "au", "aux", "a", "pour", "par", "avec", "dans", "ma", "mon", "mes", "sa", "son", "ses",
+           "ce", "ces", "cette", "je", "j", "tu", "il", "elle", "on", "nous", "vous", "ils", "y",
+           "que", "qui", "quoi", "est", "sont", "ai", "as", "ont", "pas", "ne", "plus", "tres",
+           "comment", "quand", "quel", "quelle", "quels", "quelles", "pourquoi", "faut", "faire",
+           "peut", "peux", "bien", "aussi", "qu", "c", "n", "s", "m", "t"},
+    "wo": {"ci", "yi", "bi", "gi", "li", "si", "mi", "ak", "ag", "la", "na", "nga", "ma", "sa",
+           "yu", "bu", "ku", "di", "dafa", "dañu", "ngi", "am"},
+    "pu": {"e", "ko", "nde", "ɗe", "de", "ɗum", "mi", "a", "o", "ina", "am", "maa", "ngam", "nder"},
+}
+
+# Suffixes retirés par la racinisation légère du français (du plus long au plus court)
+FRENCH_SUFFIXES = ("issements", "issement", "issent", "ements", "ement", "ations", "ation",
+                   "euses", "euse", "ees", "ee", "es", "er", "s", "x", "e")
+
+
+def fold(text: str) -> str:
+    """Minuscules, sans accents ni lettres spéciales ("Flétrissure ɗaɗe" -> "fletrissure dade")"""
+    decomposed = unicodedata.normalize('NFKD', text.lower().translate(SPECIAL_LETTERS))
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token: str, lang: str) -> str:
+    """
+    Racine d'un mot normalisé
+    
+    Français : suppression des suffixes de pluriel et de dérivation courants
+    ("feuilles" / "feuille" -> "feuill"). Wolof et pulaar : mot inchangé
+    (pas de règles de flexion fiables), les variantes passent par les alias.
+    """
+    if lang == "fr":
+        for suffix in FRENCH_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[:-len(suffix)]
+    return token
+
+
+STOPWORDS_FOLDED = {lang: {fold(word) for word in words} for lang, words in STOPWORDS.items()}
+ALL_STOPWORDS = set().union(*STOPWORDS_FOLDED.values())
+
+
+def tokenize(text: str, lang: str) -> List[str]:
+    """Racines des mots d'un texte de la langue `lang`, sans mots vides"""
+    stopwords = STOPWORDS_FOLDED.get(lang, set())
+    return [stem(token, lang) for token in TOKEN_PATTERN.findall(fold(text))
+            if token not in stopwords and len(token) > 1]
+
+
+def query_terms(text: str) -> List[str]:
+    """
+    Termes d'un message dont la langue est incertaine : chaque mot donne sa
+    racine dans chaque langue (sans doublon), les mots vides des trois
+    langues sont ignorés
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(fold(text)):
+        if token in ALL_STOPWORDS or len(token) < 2:
+            continue
+        for variant in {stem(token, lang) for lang in STOPWORDS}:
+            terms.append(variant)
+    return terms
+
+
+class InvertedIndex:
+    """
+    Index inversé terme -> documents avec pondération BM25
+    
+    Les contributions BM25 de chaque (terme, document) sont calculées une
+    fois à la construction : une requête se réduit à des sommes sur les
+    listes de postings des termes du message.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._frequencies = {}   # terme -> {document: fréquence pondérée}
+        self._lengths = {}       # document -> longueur pondérée
+        self.postings = {}       # terme -> ((document, score BM25), ...)
+    
+    def add(self, doc_id, fields: Iterable[Tuple[str, str, float]]):
+        """
+        Ajouter un document
+        
+        Args:
+            fields: (texte, langue, poids) ; un poids de 3 fait compter
+                chaque mot du champ comme trois occurrences (noms, alias)
+        """
+        for text, lang, weight in fields:
+            for term in tokenize(text, lang):
+                frequencies = self._frequencies.setdefault(term, {})
+                frequencies[doc_id] = frequencies.get(doc_id, 0.0) + weight
+                self._lengths[doc_id] = self._lengths.get(doc_id, 0.0) + weight
+    
+    def build(self):
+        """Précalculer les scores BM25 (à appeler après le dernier add)"""
+        num_docs = len(self._lengths)
+        average_length = sum(self._lengths.values()) / max(num_docs, 1)
+        self.postings = {}
+        for term, frequencies in self._frequencies.items():
+            idf = math.log(1 + (num_docs - len(frequencies) + 0.5) / (len(frequencies) + 0.5))
+            self.postings[term] = tuple(
+                (doc_id, idf * tf * (self.k1 + 1)
+                 / (tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)))
+                for doc_id, tf in frequencies.items()
+            )
+        return self
+    
+    def search(self, text: str, limit: int = 5) -> List[Tuple[object, float]]:
+        """Documents classés par score BM25 décroissant"""
+        scores = {}
+        for term in set(query_terms(text)):
+            for doc_id, score in self.postings.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+    
+    def best(self, text: str, min_score: float = 1.0) -> Optional[object]:
+        """Meilleur document si son score atteint `min_score`, sinon None"""
+        results = self.search(text, limit=1)
+        if results and results[0][1] >= min_score:
+            return results[0][0]
+        return None
+    
+    def __len__(self):
+        return len(self._lengths)
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Recherche sémantique dans la base de connaissances du chatbot
+Passages (maladies, traitements, prévention, conseils saisonniers) encodés
+hors ligne, vecteurs float16 en memmap, cache des requêtes et regroupement
+des requêtes simultanées en un seul appel à l'encodeur (CPU uniquement)
+
+Encodeurs :
+- 'hashing' (par défaut) : n-grammes de caractères et racines des mots
+  hachés dans un vecteur de taille fixe, sans dépendance ni téléchargement ;
+  robuste aux variantes d'orthographe du wolof et du pulaar
+- chemin d'un modèle sentence-transformers multilingue déjà téléchargé
+  (ex. paraphrase-multilingual-MiniLM-L12-v2), si la bibliothèque est installée
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from knowledge_base import KnowledgeBase, get_knowledge_base
+from search_index import ALL_STOPWORDS, TOKEN_PATTERN, fold, query_terms
+
+
+INDEX_DIR = os.path.join("data", "semantic_index")
+VECTORS_FILE = "vectors.npy"
+PASSAGES_FILE = "passages.json"
+ENCODER = os.environ.get('AGRIDETECT_ENCODER', 'hashing')
+
+QUERY_CACHE_SIZE = 4096
+MAX_BATCH = 32
+MAX_WAIT = 0.002  # secondes d'attente pour regrouper les requêtes simultanées
+MIN_SCORE = 0.18
+
+
+# ========================================
+# Encodeurs
+# ========================================
+
+class HashingEncoder:
+    """
+    Encodeur local sans modèle : n-grammes de caractères (3 à 5) des mots
+    hors mots vides et racines des mots, hachés (crc32 signé) dans `dim`
+    dimensions, normalisés L2
+    """
+    
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashing-v1-{dim}-{ngram_range[0]}{ngram_range[1]}"
+    
+    def _features(self, text: str) -> List[str]:
+        words = [w for w in TOKEN_PATTERN.findall(fold(text)) if w not in ALL_STOPWORDS]
+        padded = f" {' '.join(words)} "
+        features = [padded[i:i + n]
+                    for n in range(self.ngram_range[0], self.ngram_range[1] + 1)
+                    for i in range(len(padded) - n + 1)]
+        features += ["w:" + term for term in query_terms(text)]
+        return features
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype='float32')
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype('float32')
+
+
+class SentenceTransformerEncoder:
+    """Modèle sentence-transformers local (aucun téléchargement au chargement)"""
+    
+    def __init__(self, model_path: str):
+        from sentence_transformers import SentenceTransformer
+        
+        self.model = SentenceTransformer(model_path, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{os.path.basename(os.path.normpath(model_path))}"
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=MAX_BATCH, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype('float32')
+
+
+def create_encoder(spec: str = ENCODER):
+    """Encodeur 'hashing' ou modèle sentence-transformers (repli sur 'hashing')"""
+    if spec != 'hashing':
+        try:
+            return SentenceTransformerEncoder(spec)
+        except ImportError:
+            print("❌ sentence-transformers non installé. Installez-le avec: pip install sentence-transformers")
+        except Exception as e:
+            print(f"⚠ Encodeur {spec} indisponible ({e}), encodeur par hachage utilisé")
+    return HashingEncoder()
+
+
+# ========================================
+# Passages
+# ========================================
+
+def knowledge_passages(kb: KnowledgeBase) -> List[Dict]:
+    """
+    Passages indexés, un par (sujet, langue)
+    
+    Returns:
+        Liste de {'kind', 'key', 'lang', 'text'}
+    """
+    passages = []
+    
+    def add(kind, key, lang, text):
+        passages.append({'kind': kind, 'key': key, 'lang': lang, 'text': text})
+    
+    for key, disease in kb.diseases.items():
+        for lang, info in disease.texts.items():
+            text = f"{info.name}: {', '.join(info.symptoms)}" if info.symptoms else info.name
+            if info.causes:
+                text += f". {info.causes}"
+            add('disease', key, lang, text)
+        for lang, tips in disease.prevention.items():
+            add('disease_prevention', key, lang, f"{disease.text(lang).name}: {' '.join(tips)}")
+    
+    for treatment in kb.treatments:
+        for lang, text in treatment.texts.items():
+            add('treatment', treatment.key, lang, text)
+    
+    for lang, tips in kb.prevention.items():
+        for i, tip in enumerate(tips):
+            add('prevention', str(i), lang, tip)
+    
+    for season, texts in kb.seasonal_prevention.items():
+        for lang, text in texts.items():
+            add('seasonal_prevention', season, lang, text)
+    
+    for key, texts in kb.seasons.items():
+        for lang, text in texts.items():
+            add('season', key, lang, text)
+    
+    return passages
+
+
+def knowledge_fingerprint(passages: List[Dict], encoder_name: str) -> str:
+    payload = json.dumps([encoder_name, passages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+# ========================================
+# Index
+# ========================================
+
+def build_semantic_index(kb: Optional[KnowledgeBase] = None, encoder=None,
+                         index_dir: str = INDEX_DIR) -> str:
+    """
+    Encoder les passages et écrire l'index (vecteurs float16 + passages)
+    
+    Returns:
+        Dossier de l'index
+    """
+    kb = kb or get_knowledge_base()
+    encoder = encoder or create_encoder()
+    passages = knowledge_passages(kb)
+    
+    vectors = encoder.encode([p['text'] for p in passages])
+    
+    os.makedirs(index_dir, exist_ok=True)
+    output = np.lib.format.open_memmap(os.path.join(index_dir, VECTORS_FILE + ".tmp"), mode='w+',
+                                       dtype='float16', shape=vectors.shape)
+    output[:] = vectors
+    output.flush()
+    del output
+    os.replace(os.path.join(index_dir, VECTORS_FILE + ".tmp"), os.path.join(index_dir, VECTORS_FILE))
+    
+    with open(os.path.join(index_dir, PASSAGES_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'encoder': encoder.name,
+            'dim': int(vectors.shape[1]),
+            'fingerprint': knowledge_fingerprint(passages, encoder.name),
+            'passages': passages,
+        }, f, ensure_ascii=False)
+    
+    return index_dir
+
+
+class SemanticIndex:
+    """Vecteurs des passages (memmap en lecture seule) et métadonnées"""
+    
+    def __init__(self, vectors: np.ndarray, passages: List[Dict], encoder_name: str):
+        self.vectors = vectors
+        self.passages = passages
+        self.encoder_name = encoder_name
+        # (type, clé, langue) -> position : passage équivalent dans la langue de l'utilisateur
+        self.positions = {(p['kind'], p['key'], p['lang']): i for i, p in enumerate(passages)}
+    
+    @classmethod
+    def load(cls, index_dir: str = INDEX_DIR) -> 'SemanticIndex':
+        with open(os.path.join(index_dir, PASSAGES_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode='r')
+        index = cls(vectors, meta['passages'], meta['encoder'])
+        index.fingerprint = meta['fingerprint']
+        return index
+    
+    def search(self, query_vectors: np.ndarray, k: int = 3,
+               chunk_size: int = 16384) -> List[List[Tuple[int, float]]]:
+        """
+        k passages les plus proches (cosinus) pour chaque vecteur requête
+        
+        Les vecteurs float16 sont convertis par blocs : seul le bloc courant
+        est chargé en float32.
+        """
+        scores = np.empty((len(query_vectors), len(self.vectors)), dtype='float32')
+        for start in range(0, len(self.vectors), chunk_size):
+            chunk = np.asarray(self.vectors[start:start + chunk_size], dtype='float32')
+            scores[:, start:start + chunk_size] = query_vectors @ chunk.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(int(i), float(scores[row, i])) for i in ordered])
+        return results
+
+
+# ========================================
+# Recherche (cache et regroupement)
+# ========================================
+
+class SemanticRetriever:
+    """
+    Recherche des passages pour les messages du chat
+    
+    Les vecteurs des requêtes déjà vues sont gardés en cache (LRU) ; les
+    requêtes simultanées de plusieurs threads sont regroupées pendant au plus
+    MAX_WAIT secondes et encodées en un seul batch.
+    """
+    
+    def __init__(self, index: SemanticIndex, encoder, cache_size: int = QUERY_CACHE_SIZE,
+                 max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        self.index = index
+        self.encoder = encoder
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._batch_ready = threading.Condition(self._pending_lock)
+        self._worker = None
+    
+    # --- Cache ---
+    
+    def _cached(self, key: str) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+            return vector
+    
+    def _store(self, key: str, vector: np.ndarray):
+        with self._cache_lock:
+            self._cache[key] = vector
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    # --- Regroupement ---
+    
+    def _start(self):
+        if self._worker is None:
+            with self._pending_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="semantic-encoder", daemon=True)
+                    self._worker.start()
+    
+    def _run(self):
+        while True:
+            with self._batch_ready:
+                while not self._pending:
+                    self._batch_ready.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch and time.monotonic() < deadline:
+                    self._batch_ready.wait(deadline - time.monotonic())
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            
+            # Futures résolues une fois tout le batch encodé : une erreur de
+            # l'encodeur est transmise aux appelants sans arrêter le thread
+            try:
+                vectors = self.encoder.encode([text for _, text, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (key, _, future), vector in zip(batch, vectors):
+                self._store(key, vector)
+                if not future.done():
+                    future.set_result(vector)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Vecteurs des requêtes (cache, puis batch partagé avec les autres
+        threads) ; le cache est indexé par le texte normalisé mais c'est le
+        message d'origine qui est encodé
+        """
+        keys = [" ".join(fold(text).split()) for text in texts]
+        vectors = [self._cached(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            self._start()
+            futures = []
+            with self._batch_ready:
+                for i in missing:
+                    future = Future()
+                    self._pending.append((keys[i], texts[i], future))
+                    futures.append((i, future))
+                self._batch_ready.notify()
+            for i, future in futures:
+                vectors[i] = future.result()
+        
+        return np.stack(vectors)
+    
+    # --- Recherche ---
+    
+    def retrieve(self, text: str, lang: str = "fr", k: int = 2,
+                 min_score: float = MIN_SCORE) -> List[Dict]:
+        """
+        Meilleurs passages pour un message, dans la langue de l'utilisateur
+        quand le passage y existe (sinon en français)
+        
+        Returns:
+            Liste de {'kind', 'key', 'lang', 'text', 'score'}
+        """
+        results, seen = [], set()
+        for position, score in self.index.search(self.encode([text]), k=k * 4)[0]:
+            if score < min_score:
+                break
+            passage = self.index.passages[position]
+            topic = (passage['kind'], passage['key'])
+            if topic in seen:
+                continue
+            seen.add(topic)
+            
+            translated = self.index.positions.get(topic + (lang,))
+            if translated is None:
+                translated = self.index.positions.get(topic + ("fr",), position)
+            chosen = self.index.passages[translated]
+            results.append({**chosen, 'score': score})
+            if len(results) == k:
+                break
+        return results
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever(index_dir: str = INDEX_DIR) -> SemanticRetriever:
+    """
+    Recherche sémantique du processus : index chargé depuis `index_dir`,
+    (re)construit s'il est absent ou ne correspond plus à la base de
+    connaissances
+    """
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                kb = get_knowledge_base()
+                encoder = create_encoder()
+                expected = knowledge_fingerprint(knowledge_passages(kb), encoder.name)
+                try:
+                    index = SemanticIndex.load(index_dir)
+                    stale = index.fingerprint != expected
+                except (OSError, ValueError, KeyError):
+                    stale = True
+                if stale:
+                    try:
+                        build_semantic_index(kb, encoder, index_dir)
+                        index = SemanticIndex.load(index_dir)
+                    except OSError as e:
+                        # Dossier non accessible en écriture : index gardé en mémoire
+                        print(f"⚠ Index sémantique non enregistré ({e})")
+                        passages = knowledge_passages(kb)
+                        vectors = encoder.encode([p['text'] for p in passages]).astype('float16')
+                        index = SemanticIndex(vectors, passages, encoder.name)
+                _retriever = SemanticRetriever(index, encoder)
+    return _retriever
+
+
+# ========================================
+# Ligne de Commande
+# ========================================
+
+def benchmark(retriever: SemanticRetriever, queries: List[str], repeat: int = 20) -> Dict[str, float]:
+    """Latences (ms) d'une requête, sans cache puis avec cache"""
+    cold, warm = [], []
+    for _ in range(repeat):
+        with retriever._cache_lock:
+            retriever._cache.clear()
+        for query in queries:
+            start = time.perf_counter()
+            retriever.retrieve(query)
+            cold.append((time.perf_counter() - start) * 1000)
+        for query in queries:
+            start = time.perf_counter()
+            retriever.retrieve(query)
+            warm.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': float(np.percentile(cold, 50)),
+        'p95_ms': float(np.percentile(cold, 95)),
+        'cached_p50_ms': float(np.percentile(warm, 50)),
+        'cached_p95_ms': float(np.percentile(warm, 95)),
+    }
+
+
+def main():
+    """
+    Construire l'index sémantique et l'interroger
+    """
+    parser = argparse.ArgumentParser(description="Index sémantique du chatbot AgriDetect")
+    parser.add_argument('--build', action='store_true', help="(Re)construire l'index")
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    parser.add_argument('--query', action='append', default=[], help="Message à rechercher (répétable)")
+    parser.add_argument('--lang', default='fr', choices=('fr', 'wo', 'pu'))
+    parser.add_argument('--benchmark', action='store_true', help="Mesurer la latence (p50 / p95)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🌾 AgriDetect - Index Sémantique du Chatbot")
+    print("=" * 60)
+    print()
+    
+    if args.build:
+        kb = get_knowledge_base()
+        encoder = create_encoder()
+        build_semantic_index(kb, encoder, args.index_dir)
+        print(f"✓ Index construit avec l'encodeur {encoder.name}")
+    
+    retriever = get_retriever(args.index_dir)
+    size = os.path.getsize(os.path.join(args.index_dir, VECTORS_FILE)) / 1024
+    print(f"📁 {len(retriever.index.passages)} passages, {size:.1f} Ko ({retriever.index.encoder_name})")
+    
+    for query in args.query:
+        print(f"\n👤 {query}")
+        for passage in retriever.retrieve(query, args.lang, k=3):
+            print(f"   {passage['score']:.3f}  [{passage['kind']}/{passage['key']}/{passage['lang']}] {passage['text']}")
+    
+    if args.benchmark:
+        queries = args.query or [
+            "mes feuilles ont des taches jaunes et une moisissure blanche",
+            "xob yi dañuy mboq te daanu",
+            "leeɗe ɗe koosa, hol ko mi waɗa?",
+            "comment protéger mes cultures pendant l'hivernage",
+            "quand faut-il récolter",
+            "produit naturel contre les insectes",
+        ]
+        results = benchmark(retriever, queries)
+        print(f"\n⏱️  Sans cache: p50 {results['p50_ms']:.2f} ms, p95 {results['p95_ms']:.2f} ms")
+        print(f"⏱️  Avec cache: p50 {results['cached_p50_ms']:.2f} ms, p95 {results['cached_p95_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Test du feedback terrain AgriDetect
+Une détection enregistrée puis corrigée ou confirmée par l'utilisateur doit
+revenir dans les échantillons de l'entraînement incrémental
+
+Nécessite la base PostgreSQL initialisée avec init.sql (DATABASE_URL) :
+    python -m pytest test_field_feedback.py
+"""
+
+import io
+import uuid
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("sqlalchemy")
+
+import database
+from train_model import Config, collect_field_samples
+
+
+CLASS_INDICES = {"Tomato_Late_blight": 0, "Tomato_healthy": 1}
+
+
+@pytest.fixture
+def field_config(tmp_path, monkeypatch):
+    """Base disponible, images et journal dans un dossier temporaire"""
+    try:
+        with database.get_engine().connect():
+            pass
+    except Exception as e:
+        pytest.skip(f"Base PostgreSQL indisponible ({e.__class__.__name__})")
+    
+    monkeypatch.setattr(database, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(database, "FEEDBACK_LOG", str(tmp_path / "feedback.jsonl"))
+    config = Config()
+    config.LABELING_QUEUE_DIR = str(tmp_path / "labeling_queue")
+    return config
+
+
+@pytest.fixture
+def detection_id():
+    """Détection supprimée de la base après le test"""
+    from sqlalchemy import text
+    
+    detection_id = str(uuid.uuid4())
+    yield detection_id
+    with database.get_engine().begin() as connection:
+        connection.execute(text("DELETE FROM detections WHERE id = CAST(:id AS UUID)"),
+                           {'id': detection_id})
+
+
+def _record(detection_id):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (40, 120, 40)).save(buffer, format="JPEG")
+    result = {'disease_id': "MILDEW_001", 'confidence': 0.89, 'severity': "Modérée",
+              'affected_crop': "Tomate"}
+    assert database.record_detection(detection_id, result, buffer.getvalue(), "Tomato_Late_blight")
+
+
+def _field_sample(config, detection_id):
+    samples = [s for s in collect_field_samples(config, CLASS_INDICES)
+               if s['detection_id'] == detection_id]
+    assert len(samples) == 1
+    return samples[0]
+
+
+def test_confirmed_detection_is_collected(field_config, detection_id):
+    _record(detection_id)
+    record = database.record_feedback(detection_id, True)
+    
+    assert record['stored_in_database']
+    assert _field_sample(field_config, detection_id)['label'] == CLASS_INDICES["Tomato_Late_blight"]
+
+
+def test_corrected_detection_uses_actual_class(field_config, detection_id):
+    _record(detection_id)
+    record = database.record_feedback(detection_id, False, "Tomato_healthy")
+    
+    assert record['stored_in_database']
+    assert _field_sample(field_config, detection_id)['label'] == CLASS_INDICES["Tomato_healthy"]
@@ -3,6 +3,7 @@ Script de test rapide du modèle AgriDetect
 """
 
 from model_predictor import DiseaseDetector
+from dataset_manifest import load_manifest, split_entries, absolute_path
 import os
 
 # Charger le modèle
@@ -27,15 +28,14 @@ print("=" * 60)
 print()
 
 # Test avec une image (si disponible)
-test_image_path = "data/test/Tomato_healthy/"
-if os.path.exists(test_image_path):
-    # Prendre la première image du dossier
-    test_images = [f for f in os.listdir(test_image_path) 
-                   if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+if os.path.exists("data/test"):
+    # Prendre la première image de la classe dans le manifest
+    test_images = [entry for entry in split_entries(load_manifest("data"), 'test')
+                   if entry['class'] == "Tomato_healthy"]
     
     if test_images:
-        test_img = os.path.join(test_image_path, test_images[0])
-        print(f"🧪 Test avec l'image: {test_images[0]}")
+        test_img = absolute_path("data", test_images[0])
+        print(f"🧪 Test avec l'image: {os.path.basename(test_img)}")
         print()
         
         result = detector.detect_disease(test_img)
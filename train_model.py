@@ -5,6 +5,8 @@ Détection de maladies des cultures par Deep Learning
 """
 
 import os
+import argparse
+import hashlib
 import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime
@@ -13,9 +15,16 @@ from tensorflow import keras
 from tensorflow.keras import layers
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2, EfficientNetB0
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.callbacks import (
+    ModelCheckpoint, EarlyStopping, ReduceLROnPlateau, BackupAndRestore
+)
 import json
 
+from dataset_manifest import (
+    build_manifest, split_entries, absolute_path, class_counts, class_weights, oversample
+)
+from archive_dataset import build_archive_index, make_archive_dataset
+
 # ========================================
 # Configuration
 # ========================================
@@ -28,6 +37,8 @@ class Config:
     TRAIN_DIR = os.path.join(DATA_DIR, "train")
     VAL_DIR = os.path.join(DATA_DIR, "validation")
     TEST_DIR = os.path.join(DATA_DIR, "test")
+    ARCHIVE_DIR = None  # Dossier de shards .zip/.tar : lecture directe sans extraction
+    SHUFFLE_BUFFER = 1024  # Tampon de mélange des images lues depuis les archives
     
     # Chemins de sortie
     OUTPUT_DIR = "models"
@@ -44,6 +55,8 @@ class Config:
     # Architecture
     USE_PRETRAINED = True  # Utiliser transfer learning
     PRETRAINED_MODEL = "MobileNetV2"  # Options: MobileNetV2, EfficientNetB0
+    MOBILENET_ALPHA = 1.0  # Largeur de MobileNetV2 (0.35, 0.5, 0.75, 1.0)
+    HEAD_UNITS = 512  # Neurones de la couche dense de classification
     FREEZE_LAYERS = True  # Geler les couches pré-entraînées au début
     
     # Augmentation des données
@@ -55,18 +68,308 @@ class Config:
     ZOOM_RANGE = 0.2
     HORIZONTAL_FLIP = True
     FILL_MODE = 'nearest'
+    
+    # Déséquilibre des classes (effectifs lus dans le manifest)
+    CLASS_BALANCING = 'class_weight'  # None, 'class_weight' (perte pondérée) ou 'oversample'
+    CLASS_WEIGHT_POWER = 1.0  # 1 = pondération 'balanced', < 1 l'adoucit
+    OVERSAMPLE_TARGET = 0.5  # 'oversample' : classes complétées jusqu'à cette fraction de la plus grande
+    
+    # Reprise d'entraînement
+    SEED = 42  # Graine des générateurs aléatoires (re-semée à chaque epoch)
+    FINE_TUNE = True  # Enchaîner la phase 2 (fine-tuning) après la phase 1
+    RUN_STATE_FILE = "run_state.json"
+    BACKUP_DIR = "backup"  # Checkpoints complets (poids, optimiseur, epoch)
+    
+    # Distillation (modèle élève compact)
+    DISTILL_TEMPERATURE = 4.0  # Adoucissement des probabilités du professeur
+    DISTILL_ALPHA = 0.7  # Poids de la perte douce (1 - alpha pour les vraies étiquettes)
+    STUDENT_IMG_SIZE = 128
+    STUDENT_ALPHA = 0.35  # Largeur MobileNetV2 de l'élève
+    
+    # Optimisation post-entraînement (pruning + clustering)
+    PRUNING_SPARSITY = 0.5  # Proportion finale de poids mis à zéro
+    PRUNING_STRUCTURE = None  # None (magnitude) ou (2, 4) pour une sparsité structurée 2:4
+    CLUSTER_COUNT = 16  # Nombre de centroïdes par couche
+    OPTIMIZE_EPOCHS = 2  # Epochs de récupération après chaque étape
+    
+    # Fine-tuning (phase 2)
+    FINE_TUNE_EPOCHS = 20
+    FINE_TUNE_LEARNING_RATE = 1e-4  # Pic du schedule cosinus
+    FINE_TUNE_WARMUP_EPOCHS = 1  # Montée linéaire jusqu'au pic
+    FINE_TUNE_FROZEN_LAYERS = 100  # Premières couches du backbone qui restent gelées
+    FINE_TUNE_PATIENCE = 4  # Arrêt anticipé si val_loss stagne
+    
+    # Entraînement incrémental (feedback terrain)
+    CURRENT_MODEL_DIR = os.path.join("models", "current_model")  # Modèle en production
+    LABELING_QUEUE_DIR = os.path.join(DATA_DIR, "labeling_queue")
+    INCREMENTAL_EPOCHS = 3
+    INCREMENTAL_LEARNING_RATE = 1e-5
+    REPLAY_RATIO = 2.0  # Images de data/train rejouées par nouvel échantillon
+    FIELD_HOLDOUT_FRACTION = 0.2  # Échantillons terrain réservés à l'évaluation
+    INCREMENTAL_TOLERANCE = 0.0  # Baisse de précision réservée acceptée
+
+
+# ========================================
+# Reprise de l'Entraînement
+# ========================================
+
+def get_run_dir(config):
+    """Dossier stable du run (checkpoints, historique, modèle final)"""
+    return os.path.join(config.OUTPUT_DIR, config.MODEL_NAME)
+
+
+def load_run_state(config):
+    """
+    Charger l'état persistant du run (phases terminées, historique, compteurs)
+    """
+    state_path = os.path.join(get_run_dir(config), config.RUN_STATE_FILE)
+    if not os.path.exists(state_path):
+        return {'model_name': config.MODEL_NAME, 'finished': False, 'phases': {}}
+    
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+
+def save_run_state(config, state):
+    """
+    Sauvegarder l'état du run de façon atomique (écriture puis renommage)
+    """
+    run_dir = get_run_dir(config)
+    os.makedirs(run_dir, exist_ok=True)
+    
+    state_path = os.path.join(run_dir, config.RUN_STATE_FILE)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def find_resumable_run(config):
+    """
+    Trouver le run inachevé le plus récent dans OUTPUT_DIR
+    
+    Returns:
+        Nom du run, ou None si aucun run n'est à reprendre
+    """
+    if not os.path.isdir(config.OUTPUT_DIR):
+        return None
+    
+    candidates = []
+    for name in os.listdir(config.OUTPUT_DIR):
+        state_path = os.path.join(config.OUTPUT_DIR, name, config.RUN_STATE_FILE)
+        if not os.path.exists(state_path):
+            continue
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if not state.get('finished'):
+            candidates.append((os.path.getmtime(state_path), name))
+    
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+def current_learning_rate(optimizer):
+    """Taux d'apprentissage courant, que l'optimiseur utilise une valeur ou un schedule"""
+    learning_rate = optimizer.learning_rate
+    if isinstance(learning_rate, keras.optimizers.schedules.LearningRateSchedule):
+        learning_rate = learning_rate(optimizer.iterations)
+    return float(keras.backend.get_value(learning_rate))
+
+
+def make_history(history_dict):
+    """Construire un objet History Keras à partir d'un dictionnaire"""
+    history = keras.callbacks.History()
+    history.history = {k: list(v) for k, v in history_dict.items()}
+    return history
+
+
+class RunStateCallback(keras.callbacks.Callback):
+    """
+    Compléter BackupAndRestore pour une phase d'entraînement
+    
+    BackupAndRestore restaure les poids, l'état de l'optimiseur et l'epoch.
+    Ce callback persiste le reste : historique cumulé, taux d'apprentissage,
+    compteurs internes des callbacks (EarlyStopping, ReduceLROnPlateau,
+    ModelCheckpoint) et meilleurs poids d'EarlyStopping(restore_best_weights)
+    dans <phase>_best_weights.npz. Les générateurs aléatoires sont re-semés à chaque epoch
+    avec SEED + epoch, si bien qu'un run repris suit la même séquence
+    qu'un run ininterrompu.
+    
+    Doit être placé après les callbacks qu'il suit dans la liste.
+    """
+    
+    TRACKED_ATTRS = {
+        'EarlyStopping': ('best', 'wait', 'stopped_epoch', 'best_epoch'),
+        'ReduceLROnPlateau': ('best', 'wait', 'cooldown_counter'),
+        'ModelCheckpoint': ('best',),
+    }
+    
+    def __init__(self, config, phase, tracked_callbacks):
+        super().__init__()
+        self.config = config
+        self.phase = phase
+        self.tracked_callbacks = tracked_callbacks
+        self.history = {}
+        self._first_epoch = True
+    
+    def _phase_state(self, state):
+        return state['phases'].setdefault(self.phase, {'completed': False})
+    
+    def _best_weights_path(self):
+        return os.path.join(get_run_dir(self.config), f"{self.phase}_best_weights.npz")
+    
+    def _early_stopping(self):
+        """EarlyStopping suivi qui restaure ses meilleurs poids, ou None"""
+        for callback in self.tracked_callbacks:
+            if isinstance(callback, EarlyStopping) and callback.restore_best_weights:
+                return callback
+        return None
+    
+    def on_train_begin(self, logs=None):
+        state = load_run_state(self.config)
+        phase_state = self._phase_state(state)
+        self.history = phase_state.get('history', {})
+        
+        saved_callbacks = phase_state.get('callbacks', {})
+        for callback in self.tracked_callbacks:
+            name = type(callback).__name__
+            for attr in self.TRACKED_ATTRS.get(name, ()):
+                if attr in saved_callbacks.get(name, {}):
+                    setattr(callback, attr, saved_callbacks[name][attr])
+        
+        # Meilleurs poids d'avant l'interruption (sinon EarlyStopping prendrait ceux de la reprise)
+        early_stopping = self._early_stopping()
+        if early_stopping is not None and self.history and os.path.exists(self._best_weights_path()):
+            with np.load(self._best_weights_path()) as saved:
+                early_stopping.best_weights = [saved[f"arr_{i}"] for i in range(len(saved.files))]
+        
+        if self.history:
+            print(f"↻ Reprise de la phase '{self.phase}' "
+                  f"({len(self.history.get('loss', []))} epochs déjà effectuées)")
+        self._first_epoch = True
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        if self._first_epoch:
+            # Aligner l'historique sur l'epoch restaurée par BackupAndRestore
+            self.history = {k: v[:epoch] for k, v in self.history.items()}
+            self._first_epoch = False
+        keras.utils.set_random_seed(self.config.SEED + epoch)
+    
+    def on_epoch_end(self, epoch, logs=None):
+        logs = dict(logs or {})
+        logs['lr'] = current_learning_rate(self.model.optimizer)
+        for key, value in logs.items():
+            self.history.setdefault(key, []).append(float(value))
+        
+        state = load_run_state(self.config)
+        phase_state = self._phase_state(state)
+        phase_state['history'] = self.history
+        phase_state['epochs_done'] = epoch + 1
+        phase_state['callbacks'] = {}
+        for callback in self.tracked_callbacks:
+            name = type(callback).__name__
+            phase_state['callbacks'][name] = {}
+            for attr in self.TRACKED_ATTRS.get(name, ()):
+                value = getattr(callback, attr)
+                phase_state['callbacks'][name][attr] = value.item() if hasattr(value, 'item') else value
+        
+        early_stopping = self._early_stopping()
+        if early_stopping is not None and early_stopping.best_weights is not None and (
+                early_stopping.best_epoch == epoch or not os.path.exists(self._best_weights_path())):
+            os.makedirs(get_run_dir(self.config), exist_ok=True)
+            tmp_path = self._best_weights_path() + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, *early_stopping.best_weights)
+            os.replace(tmp_path, self._best_weights_path())
+        save_run_state(self.config, state)
+
+
+def complete_phase(model, config, phase, history_dict):
+    """
+    Marquer une phase comme terminée et sauvegarder ses poids finaux,
+    pour qu'un redémarrage passe directement à la phase suivante
+    """
+    weights_path = os.path.join(get_run_dir(config), f"{phase}_final.h5")
+    model.save_weights(weights_path)
+    
+    state = load_run_state(config)
+    state['phases'][phase] = {
+        'completed': True,
+        'weights': os.path.basename(weights_path),
+        'history': history_dict,
+        'epochs_done': len(history_dict.get('loss', [])),
+    }
+    save_run_state(config, state)
+
+
+def restore_completed_phase(model, config, phase):
+    """
+    Recharger les poids d'une phase déjà terminée
+    
+    Returns:
+        L'historique de la phase, ou None si elle n'est pas terminée
+    """
+    phase_state = load_run_state(config)['phases'].get(phase, {})
+    if not phase_state.get('completed'):
+        return None
+    
+    weights_path = os.path.join(get_run_dir(config), phase_state['weights'])
+    model.load_weights(weights_path)
+    print(f"↻ Phase '{phase}' déjà terminée, poids rechargés depuis {weights_path}")
+    return phase_state['history']
 
 
 # ========================================
 # Préparation des Données
 # ========================================
 
+def flow_from_manifest(datagen, config, entries, split, oversample_target=None, **kwargs):
+    """
+    Générateur Keras sur un split du manifest (ordre de fichiers stable,
+    sans parcourir les dossiers)
+    
+    Les classes sont celles du split train, triées comme flow_from_directory,
+    pour garder les mêmes indices dans metadata.json.
+    
+    Args:
+        oversample_target: Si défini, les classes rares sont répétées jusqu'à
+                           cette fraction de la plus grande classe
+    """
+    import pandas as pd
+    
+    rows = split_entries(entries, split)
+    if oversample_target:
+        rows = oversample(rows, key=lambda entry: entry['class'],
+                          target_fraction=oversample_target, seed=config.SEED)
+    dataframe = pd.DataFrame({
+        'filename': [absolute_path(config.DATA_DIR, entry) for entry in rows],
+        'class': [entry['class'] for entry in rows],
+    })
+    classes = sorted({entry['class'] for entry in split_entries(entries, 'train')})
+    
+    return datagen.flow_from_dataframe(
+        dataframe,
+        x_col='filename',
+        y_col='class',
+        classes=classes,
+        target_size=(config.IMG_HEIGHT, config.IMG_WIDTH),
+        batch_size=config.BATCH_SIZE,
+        class_mode='categorical',
+        validate_filenames=False,
+        **kwargs
+    )
+
+
 def create_data_generators(config):
     """
     Créer les générateurs de données avec augmentation
     """
     print("📊 Création des générateurs de données...")
     
+    if config.ARCHIVE_DIR:
+        return create_archive_datasets(config)
+    
     if config.AUGMENTATION:
         # Générateur pour l'entraînement avec augmentation
         train_datagen = ImageDataGenerator(
@@ -85,20 +388,12 @@ def create_data_generators(config):
     # Générateur pour validation (sans augmentation)
     val_datagen = ImageDataGenerator(rescale=1./255)
     
-    # Chargement des données
-    train_generator = train_datagen.flow_from_directory(
-        config.TRAIN_DIR,
-        target_size=(config.IMG_HEIGHT, config.IMG_WIDTH),
-        batch_size=config.BATCH_SIZE,
-        class_mode='categorical'
-    )
-    
-    validation_generator = val_datagen.flow_from_directory(
-        config.VAL_DIR,
-        target_size=(config.IMG_HEIGHT, config.IMG_WIDTH),
-        batch_size=config.BATCH_SIZE,
-        class_mode='categorical'
-    )
+    # Chargement des données depuis le manifest (mis à jour de façon incrémentale)
+    entries = build_manifest(config.DATA_DIR)
+    oversample_target = config.OVERSAMPLE_TARGET if config.CLASS_BALANCING == 'oversample' else None
+    train_generator = flow_from_manifest(train_datagen, config, entries, 'train',
+                                         oversample_target=oversample_target, seed=config.SEED)
+    validation_generator = flow_from_manifest(val_datagen, config, entries, 'validation')
     
     # Sauvegarder les classes
     class_indices = train_generator.class_indices
@@ -111,6 +406,57 @@ def create_data_generators(config):
     return train_generator, validation_generator, class_names
 
 
+def create_archive_datasets(config):
+    """
+    Datasets tf.data lus directement depuis les archives de config.ARCHIVE_DIR
+    (mêmes sorties que create_data_generators)
+    """
+    index = build_archive_index(config.ARCHIVE_DIR)
+    train_dataset, class_names, train_count = make_archive_dataset(
+        config.ARCHIVE_DIR, 'train', config, shuffle=True,
+        shuffle_buffer=config.SHUFFLE_BUFFER, augment=config.AUGMENTATION, index=index,
+        oversample_target=config.OVERSAMPLE_TARGET if config.CLASS_BALANCING == 'oversample' else None
+    )
+    val_dataset, _, val_count = make_archive_dataset(
+        config.ARCHIVE_DIR, 'validation', config, shuffle=False, index=index
+    )
+    
+    print(f"✓ Classes détectées: {list(class_names.values())}")
+    print(f"✓ Nombre d'images d'entraînement: {train_count} (archives)")
+    print(f"✓ Nombre d'images de validation: {val_count} (archives)")
+    
+    return train_dataset, val_dataset, class_names
+
+
+def compute_class_weight(config, class_names):
+    """
+    Poids de classe pour model.fit, calculés depuis les effectifs
+    d'entraînement du manifest (ou de l'index des archives)
+    
+    Returns:
+        {indice: poids}, ou None si CLASS_BALANCING != 'class_weight'
+    """
+    if config.CLASS_BALANCING != 'class_weight':
+        return None
+    
+    if config.ARCHIVE_DIR:
+        counts = {}
+        for entry in build_archive_index(config.ARCHIVE_DIR)['entries']:
+            if entry['split'] == 'train':
+                counts[entry['class']] = counts.get(entry['class'], 0) + 1
+    else:
+        counts = class_counts(build_manifest(config.DATA_DIR, verbose=False)).get('train', {})
+    
+    weights = class_weights(counts, config.CLASS_WEIGHT_POWER)
+    class_weight = {index: weights.get(name, 1.0) for index, name in class_names.items()}
+    
+    lightest = min(class_weight, key=class_weight.get)
+    heaviest = max(class_weight, key=class_weight.get)
+    print(f"⚖️ Poids de classe: {class_weight[lightest]:.2f} ({class_names[lightest]}) "
+          f"→ {class_weight[heaviest]:.2f} ({class_names[heaviest]})")
+    return class_weight
+
+
 # ========================================
 # Construction du Modèle
 # ========================================
@@ -126,6 +472,7 @@ def build_model(config, num_classes):
         if config.PRETRAINED_MODEL == "MobileNetV2":
             base_model = MobileNetV2(
                 input_shape=(config.IMG_HEIGHT, config.IMG_WIDTH, config.IMG_CHANNELS),
+                alpha=config.MOBILENET_ALPHA,
                 include_top=False,
                 weights='imagenet'
             )
@@ -146,7 +493,7 @@ def build_model(config, num_classes):
         x = base_model(inputs, training=False)
         x = layers.GlobalAveragePooling2D()(x)
         x = layers.Dropout(0.5)(x)
-        x = layers.Dense(512, activation='relu')(x)
+        x = layers.Dense(config.HEAD_UNITS, activation='relu')(x)
         x = layers.Dropout(0.3)(x)
         outputs = layers.Dense(num_classes, activation='softmax')(x)
         
@@ -188,28 +535,115 @@ def build_model(config, num_classes):
 # Compilation et Entraînement
 # ========================================
 
-def compile_and_train(model, train_gen, val_gen, config, class_names):
+PER_CLASS_PREFIX = "val_class_acc_"
+
+
+class PerClassAccuracy(keras.metrics.Metric):
+    """
+    Exactitude moyenne des classes (balanced accuracy)
+    
+    Garde les bonnes réponses et les effectifs par classe : après la
+    validation de chaque epoch, PerClassAccuracyCurves en lit l'exactitude
+    de chaque classe sans seconde passe sur les données.
+    """
+    
+    def __init__(self, num_classes, name='balanced_accuracy', **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.num_classes = num_classes
+        self.correct = self.add_weight(name='correct', shape=(num_classes,), initializer='zeros')
+        self.total = self.add_weight(name='total', shape=(num_classes,), initializer='zeros')
+    
+    def update_state(self, y_true, y_pred, sample_weight=None):
+        true_class = tf.argmax(y_true, axis=-1, output_type=tf.int32)
+        hits = tf.cast(tf.equal(true_class, tf.argmax(y_pred, axis=-1, output_type=tf.int32)), self.dtype)
+        self.correct.assign_add(tf.math.unsorted_segment_sum(hits, true_class, self.num_classes))
+        self.total.assign_add(tf.math.unsorted_segment_sum(tf.ones_like(hits), true_class, self.num_classes))
+    
+    def result(self):
+        present = self.total > 0
+        return tf.reduce_mean(tf.boolean_mask(self.correct / tf.maximum(self.total, 1.0), present))
+    
+    def per_class(self):
+        return (self.correct / tf.maximum(self.total, 1.0)).numpy()
+    
+    def reset_state(self):
+        self.correct.assign(tf.zeros_like(self.correct))
+        self.total.assign(tf.zeros_like(self.total))
+    
+    def get_config(self):
+        return dict(super().get_config(), num_classes=self.num_classes)
+
+
+class PerClassAccuracyCurves(keras.callbacks.Callback):
+    """
+    Ajouter l'exactitude de validation de chaque classe aux logs de l'epoch
+    (historique, run_state.json, graphique per_class_accuracy.png)
+    
+    Doit être placé avant RunStateCallback dans la liste.
+    """
+    
+    def __init__(self, metric, class_names):
+        super().__init__()
+        self.metric = metric
+        self.class_names = class_names
+    
+    def on_epoch_end(self, epoch, logs=None):
+        if logs is None or 'val_balanced_accuracy' not in logs:
+            return
+        for index, accuracy in enumerate(self.metric.per_class()):
+            logs[PER_CLASS_PREFIX + self.class_names.get(index, str(index))] = float(accuracy)
+
+
+def training_metrics(model):
+    """Métriques d'entraînement : exactitude, top-3 et exactitude par classe"""
+    return ['accuracy',
+            keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy'),
+            PerClassAccuracy(model.output_shape[-1])]
+
+
+def compile_for_export(model):
+    """
+    Recompiler sans la métrique par classe avant sauvegarde (même
+    optimiseur) : le modèle exporté se recharge sans ce module
+    """
+    model.compile(
+        optimizer=model.optimizer,
+        loss='categorical_crossentropy',
+        metrics=['accuracy', keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy')]
+    )
+
+
+def compile_and_train(model, train_gen, val_gen, config, class_names, class_weight=None):
     """
-    Compiler et entraîner le modèle
+    Compiler et entraîner le modèle (phase 1)
+    
+    La phase reprend automatiquement là où elle s'était arrêtée si un
+    checkpoint complet existe dans le dossier du run.
     """
     print("🚀 Compilation du modèle...")
     
     # Compiler le modèle
+    metrics = training_metrics(model)
     model.compile(
         optimizer=keras.optimizers.Adam(learning_rate=config.LEARNING_RATE),
         loss='categorical_crossentropy',
-        metrics=['accuracy', keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy')]
+        metrics=metrics
     )
     
     print(model.summary())
     
+    # Phase déjà terminée lors d'un run précédent
+    completed_history = restore_completed_phase(model, config, 'phase1')
+    if completed_history is not None:
+        return make_history(completed_history)
+    
     # Callbacks
-    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    run_dir = get_run_dir(config)
+    os.makedirs(run_dir, exist_ok=True)
     
-    checkpoint_path = os.path.join(config.OUTPUT_DIR, config.MODEL_NAME, "checkpoint.h5")
-    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    checkpoint_path = os.path.join(run_dir, "checkpoint.h5")
     
-    callbacks = [
+    tracked_callbacks = [
         ModelCheckpoint(
             checkpoint_path,
             monitor='val_accuracy',
@@ -232,28 +666,34 @@ def compile_and_train(model, train_gen, val_gen, config, class_names):
         )
     ]
     
+    run_state_callback = RunStateCallback(config, 'phase1', tracked_callbacks)
+    callbacks = [PerClassAccuracyCurves(metrics[-1], class_names)] + tracked_callbacks + [
+        BackupAndRestore(os.path.join(run_dir, config.BACKUP_DIR, 'phase1')),
+        run_state_callback
+    ]
+    
     print(f"🎯 Début de l'entraînement pour {config.EPOCHS} epochs...")
     
     # Entraîner
-    history = model.fit(
+    model.fit(
         train_gen,
         epochs=config.EPOCHS,
         validation_data=val_gen,
+        class_weight=class_weight,
         callbacks=callbacks,
         verbose=1
     )
     
     print("✓ Entraînement terminé!")
     
+    # Historique cumulé sur l'ensemble des reprises
+    history = make_history(run_state_callback.history)
+    complete_phase(model, config, 'phase1', history.history)
+    
     # Sauvegarder l'historique
-    history_path = os.path.join(config.OUTPUT_DIR, config.MODEL_NAME, "history.json")
+    history_path = os.path.join(run_dir, "history.json")
     with open(history_path, 'w') as f:
-        json.dump({
-            'loss': [float(x) for x in history.history['loss']],
-            'accuracy': [float(x) for x in history.history['accuracy']],
-            'val_loss': [float(x) for x in history.history['val_loss']],
-            'val_accuracy': [float(x) for x in history.history['val_accuracy']]
-        }, f, indent=2)
+        json.dump(history.history, f, indent=2)
     
     return history
 
@@ -262,40 +702,359 @@ def compile_and_train(model, train_gen, val_gen, config, class_names):
 # Fine-tuning (optionnel)
 # ========================================
 
-def fine_tune_model(model, train_gen, val_gen, config):
+BACKBONE_NAME_PREFIXES = ('mobilenetv2', 'efficientnet')
+
+
+def find_backbone(model):
+    """
+    Retrouver le modèle pré-entraîné imbriqué par son nom, quelle que soit
+    sa position (une couche d'augmentation peut le précéder)
+    """
+    nested = [layer for layer in model.layers if isinstance(layer, keras.Model)]
+    for layer in nested:
+        if layer.name.lower().startswith(BACKBONE_NAME_PREFIXES):
+            return layer
+    if nested:
+        return nested[0]
+    raise ValueError("Aucun backbone pré-entraîné trouvé dans le modèle")
+
+
+def fine_tune_model(model, train_gen, val_gen, config, class_names=None, class_weight=None):
     """
-    Fine-tuner le modèle en dégelant certaines couches
+    Fine-tuner le modèle en dégelant les dernières couches du backbone (phase 2)
+    
+    Schedule cosinus avec warmup, arrêt anticipé, checkpoint des meilleurs
+    poids et reprise après interruption comme la phase 1.
+    
+    Returns:
+        (modèle, historique de la phase) ; historique None si la phase est ignorée
     """
     if not config.USE_PRETRAINED or not config.FREEZE_LAYERS:
-        return model
+        return model, None
     
     print("🔧 Fine-tuning du modèle...")
     
     # Dégeler les dernières couches
-    base_model = model.layers[1]
+    base_model = find_backbone(model)
     base_model.trainable = True
     
     # Geler seulement les premières couches
-    for layer in base_model.layers[:100]:
+    for layer in base_model.layers[:config.FINE_TUNE_FROZEN_LAYERS]:
         layer.trainable = False
+    print(f"✓ Backbone '{base_model.name}': {len(base_model.layers) - config.FINE_TUNE_FROZEN_LAYERS} "
+          f"couches dégelées sur {len(base_model.layers)}")
+    
+    # Schedule cosinus avec warmup, à partir d'un taux plus faible qu'en phase 1
+    steps_per_epoch = len(train_gen)
+    warmup_steps = config.FINE_TUNE_WARMUP_EPOCHS * steps_per_epoch
+    learning_rate = keras.optimizers.schedules.CosineDecay(
+        initial_learning_rate=config.FINE_TUNE_LEARNING_RATE / 10,
+        decay_steps=max(1, config.FINE_TUNE_EPOCHS * steps_per_epoch - warmup_steps),
+        alpha=0.01,
+        warmup_target=config.FINE_TUNE_LEARNING_RATE,
+        warmup_steps=warmup_steps
+    )
     
     # Recompiler avec un taux d'apprentissage plus faible
+    metrics = training_metrics(model)
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=config.LEARNING_RATE/10),
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=metrics
     )
     
-    # Entraîner quelques epochs supplémentaires
-    print("🎯 Fine-tuning en cours...")
-    history_fine = model.fit(
+    # Phase déjà terminée lors d'un run précédent
+    completed_history = restore_completed_phase(model, config, 'phase2')
+    if completed_history is not None:
+        return model, make_history(completed_history)
+    
+    run_dir = get_run_dir(config)
+    tracked_callbacks = [
+        ModelCheckpoint(
+            os.path.join(run_dir, "finetune_checkpoint.h5"),
+            monitor='val_accuracy',
+            save_best_only=True,
+            mode='max',
+            verbose=1
+        ),
+        EarlyStopping(
+            monitor='val_loss',
+            patience=config.FINE_TUNE_PATIENCE,
+            restore_best_weights=True,
+            verbose=1
+        )
+    ]
+    run_state_callback = RunStateCallback(config, 'phase2', tracked_callbacks)
+    
+    print(f"🎯 Fine-tuning en cours (max {config.FINE_TUNE_EPOCHS} epochs)...")
+    model.fit(
         train_gen,
-        epochs=20,
+        epochs=config.FINE_TUNE_EPOCHS,
         validation_data=val_gen,
+        class_weight=class_weight,
+        callbacks=[PerClassAccuracyCurves(metrics[-1], class_names or {})] + tracked_callbacks + [
+            BackupAndRestore(os.path.join(run_dir, config.BACKUP_DIR, 'phase2')),
+            run_state_callback
+        ],
         verbose=1
     )
     
+    history = make_history(run_state_callback.history)
+    complete_phase(model, config, 'phase2', history.history)
+    
     print("✓ Fine-tuning terminé!")
+    return model, history
+
+
+def merge_histories(history, fine_history, config):
+    """
+    Concaténer les historiques des deux phases et réécrire history.json
+    
+    L'epoch de début du fine-tuning est conservée dans history.json
+    (`fine_tune_start_epoch`) et sur l'objet History pour les graphiques.
+    """
+    fine_tune_start = len(history.history.get('loss', []))
+    merged = {}
+    for key in set(history.history) | set(fine_history.history):
+        # Une métrique absente d'une phase est complétée par NaN pour garder l'alignement
+        first = history.history.get(key, [float('nan')] * fine_tune_start)
+        second = fine_history.history.get(key, [float('nan')] * len(fine_history.history.get('loss', [])))
+        merged[key] = list(first) + list(second)
+    
+    merged_history = make_history(merged)
+    merged_history.fine_tune_start = fine_tune_start
+    
+    history_path = os.path.join(get_run_dir(config), "history.json")
+    with open(history_path, 'w') as f:
+        json.dump(dict(merged, fine_tune_start_epoch=fine_tune_start), f, indent=2)
+    
+    return merged_history
+
+
+# ========================================
+# Distillation
+# ========================================
+
+STUDENT_ARCHITECTURES = ('mobilenet', 'tiny_cnn')
+
+
+def make_student_config(config, student):
+    """
+    Dériver la configuration de l'élève à partir de la configuration principale
+    
+    Args:
+        student: 'mobilenet' (MobileNetV2 étroit) ou 'tiny_cnn' (CNN sans pré-entraînement)
+    """
+    student_config = Config()
+    student_config.__dict__.update(config.__dict__)
+    student_config.IMG_HEIGHT = config.STUDENT_IMG_SIZE
+    student_config.IMG_WIDTH = config.STUDENT_IMG_SIZE
+    student_config.AUGMENTATION = False  # Entrées identiques à celles vues par le professeur
+    
+    if student == 'tiny_cnn':
+        student_config.USE_PRETRAINED = False
+    else:
+        student_config.USE_PRETRAINED = True
+        student_config.PRETRAINED_MODEL = "MobileNetV2"
+        student_config.MOBILENET_ALPHA = config.STUDENT_ALPHA
+        student_config.FREEZE_LAYERS = False
+    
+    return student_config
+
+
+def load_trained_model(model_dir):
+    """
+    Charger un modèle entraîné de models/ et ses métadonnées
+    """
+    model_file = os.path.join(model_dir, "model.h5")
+    if not os.path.exists(model_file):
+        model_file = os.path.join(model_dir, "saved_model")
+    if not os.path.exists(model_file):
+        raise FileNotFoundError(f"Modèle non trouvé dans {model_dir}")
+    
+    with open(os.path.join(model_dir, "metadata.json"), 'r') as f:
+        metadata = json.load(f)
+    
+    model = keras.models.load_model(model_file)
+    print(f"✓ Modèle chargé depuis {model_dir} ({metadata.get('architecture')})")
+    return model, metadata
+
+
+def cache_teacher_logits(teacher, teacher_metadata, entries, split, cache_dir, config):
+    """
+    Calculer une seule fois les logits du professeur sur un split et les
+    mettre en cache sur disque
+    
+    Le professeur produit des probabilités softmax : log(p) en est un jeu
+    de logits valide (à une constante près), ce qui suffit pour la perte
+    adoucie par température.
+    
+    Returns:
+        (chemins des images, indices de classes, logits du professeur)
+    """
+    teacher_config = Config()
+    teacher_config.__dict__.update(config.__dict__)
+    teacher_config.IMG_HEIGHT = teacher_metadata['img_height']
+    teacher_config.IMG_WIDTH = teacher_metadata['img_width']
+    generator = flow_from_manifest(ImageDataGenerator(rescale=1./255), teacher_config,
+                                   entries, split, shuffle=False)
+    
+    expected = {int(k): v for k, v in teacher_metadata['classes'].items()}
+    found = {v: k for k, v in generator.class_indices.items()}
+    if found != expected:
+        raise ValueError("Les classes du dataset ne correspondent pas à celles du professeur")
+    
+    # Empreinte du split : chemins et contenus (hash du manifest)
+    filepaths = list(generator.filepaths)
+    fingerprint = hashlib.sha256("\n".join(
+        f"{entry['path']}:{entry['sha256']}" for entry in split_entries(entries, split)
+    ).encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"teacher_logits_{split}_{fingerprint}.npz")
+    
+    if os.path.exists(cache_path):
+        print(f"✓ Logits du professeur en cache: {cache_path}")
+        logits = np.load(cache_path)['logits']
+    else:
+        print(f"🧑‍🏫 Inférence du professeur sur {len(filepaths)} images ({split})...")
+        probabilities = teacher.predict(generator, verbose=1)
+        logits = np.log(np.clip(probabilities, 1e-7, 1.0)).astype('float32')
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, logits=logits,
+                 filenames=np.array([entry['path'] for entry in split_entries(entries, split)]))
+        print(f"✓ Logits du professeur sauvegardés: {cache_path}")
+    
+    return filepaths, np.array(generator.classes), logits
+
+
+def make_distillation_dataset(filepaths, labels, logits, num_classes, config, shuffle):
+    """
+    Pipeline tf.data : image de l'élève -> [one-hot | logits du professeur]
+    """
+    targets = np.concatenate(
+        [np.eye(num_classes, dtype='float32')[labels], logits], axis=1
+    )
+    
+    def load_image(path, target):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=config.IMG_CHANNELS,
+                                   expand_animations=False)
+        image = tf.image.resize(image, (config.IMG_HEIGHT, config.IMG_WIDTH)) / 255.0
+        return image, target
+    
+    dataset = tf.data.Dataset.from_tensor_slices((filepaths, targets))
+    if shuffle:
+        dataset = dataset.shuffle(len(filepaths), seed=config.SEED, reshuffle_each_iteration=True)
+    return (dataset
+            .map(load_image, num_parallel_calls=tf.data.AUTOTUNE)
+            .batch(config.BATCH_SIZE)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def make_distillation_loss(num_classes, temperature, alpha):
+    """
+    Perte de distillation : alpha * T² * KL(professeur_T || élève_T)
+    + (1 - alpha) * entropie croisée sur les vraies étiquettes
+    
+    y_true contient [one-hot | logits du professeur] ; l'élève sort des
+    probabilités softmax (log(p) sert de logits).
+    """
+    def distillation_loss(y_true, y_pred):
+        labels = y_true[:, :num_classes]
+        teacher_logits = y_true[:, num_classes:]
+        student_logits = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+        
+        soft_teacher = tf.nn.softmax(teacher_logits / temperature)
+        soft_student = tf.nn.log_softmax(student_logits / temperature)
+        soft_loss = tf.reduce_sum(
+            soft_teacher * (tf.math.log(tf.clip_by_value(soft_teacher, 1e-7, 1.0)) - soft_student),
+            axis=-1
+        ) * temperature ** 2
+        hard_loss = keras.losses.categorical_crossentropy(labels, y_pred)
+        return alpha * soft_loss + (1 - alpha) * hard_loss
+    
+    return distillation_loss
+
+
+def make_distillation_accuracy(num_classes):
+    """Précision sur les vraies étiquettes (partie one-hot de y_true)"""
+    def accuracy(y_true, y_pred):
+        return keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+    return accuracy
+
+
+def distill_model(config, teacher_dir, student='mobilenet'):
+    """
+    Entraîner un élève compact à partir d'un modèle existant (professeur)
+    et l'exporter avec le même contrat metadata.json que DiseaseDetector
+    """
+    teacher, teacher_metadata = load_trained_model(teacher_dir)
+    student_config = make_student_config(config, student)
+    class_names = {int(k): v for k, v in teacher_metadata['classes'].items()}
+    num_classes = len(class_names)
+    
+    # 1. Logits du professeur, calculés une seule fois
+    cache_dir = os.path.join(teacher_dir, "distillation_cache")
+    entries = build_manifest(config.DATA_DIR)
+    train_data = cache_teacher_logits(teacher, teacher_metadata, entries, 'train', cache_dir, config)
+    val_data = cache_teacher_logits(teacher, teacher_metadata, entries, 'validation', cache_dir, config)
+    del teacher
+    keras.backend.clear_session()
+    
+    train_ds = make_distillation_dataset(*train_data, num_classes, student_config, shuffle=True)
+    val_ds = make_distillation_dataset(*val_data, num_classes, student_config, shuffle=False)
+    
+    # 2. Élève
+    model = build_model(student_config, num_classes)
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=student_config.LEARNING_RATE),
+        loss=make_distillation_loss(num_classes, config.DISTILL_TEMPERATURE, config.DISTILL_ALPHA),
+        metrics=[make_distillation_accuracy(num_classes)]
+    )
+    
+    completed_history = restore_completed_phase(model, student_config, 'distill')
+    if completed_history is not None:
+        history = make_history(completed_history)
+    else:
+        run_dir = get_run_dir(student_config)
+        os.makedirs(run_dir, exist_ok=True)
+        tracked_callbacks = [
+            EarlyStopping(monitor='val_accuracy', mode='max', patience=8,
+                          restore_best_weights=True, verbose=1),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=4,
+                              min_lr=1e-7, verbose=1)
+        ]
+        run_state_callback = RunStateCallback(student_config, 'distill', tracked_callbacks)
+        
+        print(f"🎯 Distillation vers {student} ({student_config.IMG_HEIGHT}x{student_config.IMG_WIDTH})...")
+        model.fit(
+            train_ds,
+            epochs=student_config.EPOCHS,
+            validation_data=val_ds,
+            callbacks=tracked_callbacks + [
+                BackupAndRestore(os.path.join(run_dir, config.BACKUP_DIR, 'distill')),
+                run_state_callback
+            ],
+            verbose=1
+        )
+        history = make_history(run_state_callback.history)
+        complete_phase(model, student_config, 'distill', history.history)
+    
+    # 3. Export avec les métriques standard (entrées /255, sortie softmax)
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=student_config.LEARNING_RATE),
+        loss='categorical_crossentropy',
+        metrics=['accuracy', keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy')]
+    )
+    _, val_gen, _ = create_data_generators(student_config)
+    evaluate_and_save(model, val_gen, student_config, class_names, history, extra_metadata={
+        'teacher': teacher_metadata.get('model_name', os.path.basename(os.path.normpath(teacher_dir))),
+        'teacher_accuracy': teacher_metadata.get('accuracy'),
+        'distillation': {
+            'temperature': config.DISTILL_TEMPERATURE,
+            'alpha': config.DISTILL_ALPHA,
+            'student': student,
+        }
+    })
+    
     return model
 
 
@@ -303,9 +1062,12 @@ def fine_tune_model(model, train_gen, val_gen, config):
 # Évaluation et Sauvegarde
 # ========================================
 
-def evaluate_and_save(model, val_gen, config, class_names, history):
+def evaluate_and_save(model, val_gen, config, class_names, history, extra_metadata=None):
     """
     Évaluer le modèle et sauvegarder
+    
+    Args:
+        extra_metadata: Champs supplémentaires ajoutés à metadata.json
     """
     print("📊 Évaluation du modèle...")
     
@@ -317,6 +1079,7 @@ def evaluate_and_save(model, val_gen, config, class_names, history):
         print(f"✓ Top-3 Accuracy: {results[2]:.4f}")
     
     # Sauvegarder le modèle complet
+    compile_for_export(model)
     model_path = os.path.join(config.OUTPUT_DIR, config.MODEL_NAME, "model.h5")
     model.save(model_path)
     print(f"✓ Modèle sauvegardé: {model_path}")
@@ -339,6 +1102,10 @@ def evaluate_and_save(model, val_gen, config, class_names, history):
         'architecture': config.PRETRAINED_MODEL if config.USE_PRETRAINED else 'Custom CNN',
         'epochs': config.EPOCHS
     }
+    if config.USE_PRETRAINED and config.PRETRAINED_MODEL == "MobileNetV2":
+        metadata['mobilenet_alpha'] = config.MOBILENET_ALPHA
+    if extra_metadata:
+        metadata.update(extra_metadata)
     
     metadata_path = os.path.join(config.OUTPUT_DIR, config.MODEL_NAME, "metadata.json")
     with open(metadata_path, 'w') as f:
@@ -351,6 +1118,452 @@ def evaluate_and_save(model, val_gen, config, class_names, history):
     return results
 
 
+# ========================================
+# Optimisation Post-Entraînement
+# ========================================
+
+def count_flops(model, config):
+    """
+    Compter les opérations flottantes d'une inférence (batch de 1)
+    """
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+    
+    spec = tf.TensorSpec([1, config.IMG_HEIGHT, config.IMG_WIDTH, config.IMG_CHANNELS], tf.float32)
+    concrete = tf.function(lambda x: model(x, training=False)).get_concrete_function(spec)
+    frozen = convert_variables_to_constants_v2(concrete)
+    
+    options = tf.compat.v1.profiler.ProfileOptionBuilder.float_operation()
+    options['output'] = 'none'
+    profile = tf.compat.v1.profiler.profile(
+        graph=frozen.graph,
+        run_meta=tf.compat.v1.RunMetadata(),
+        cmd='op',
+        options=options
+    )
+    return int(profile.total_float_ops)
+
+
+def weight_sparsity(model):
+    """Proportion de poids nuls dans les noyaux (kernels) du modèle"""
+    total = 0
+    zeros = 0
+    for weight in model.weights:
+        if 'kernel' not in weight.name:
+            continue
+        values = weight.numpy()
+        total += values.size
+        zeros += int(np.sum(values == 0))
+    return zeros / total if total else 0.0
+
+
+def report_stage(model, val_gen, config, stage, stage_dir):
+    """
+    Sauvegarder un modèle d'étape et mesurer taille, FLOPs, latence et précision
+    
+    La taille compressée (gzip) reflète le gain réel du pruning et du
+    clustering : les zéros et les valeurs répétées se compressent, alors que
+    le fichier .h5 brut garde sa taille.
+    """
+    import gzip
+    
+    os.makedirs(stage_dir, exist_ok=True)
+    model_path = os.path.join(stage_dir, "model.h5")
+    model.save(model_path, include_optimizer=False)
+    
+    with open(model_path, 'rb') as f:
+        compressed_size = len(gzip.compress(f.read()))
+    
+    results = model.evaluate(val_gen, verbose=0)
+    report = {
+        'stage': stage,
+        'size_bytes': os.path.getsize(model_path),
+        'gzip_size_bytes': compressed_size,
+        'flops': count_flops(model, config),
+        'sparsity': weight_sparsity(model),
+        'accuracy': float(results[1]),
+        'loss': float(results[0]),
+    }
+    report.update(measure_inference_latency(model, config))
+    
+    print(f"   {stage:<10} taille={report['size_bytes'] / 1e6:.2f} Mo "
+          f"(gzip {report['gzip_size_bytes'] / 1e6:.2f} Mo) "
+          f"FLOPs={report['flops'] / 1e6:.0f}M sparsité={report['sparsity']:.0%} "
+          f"latence={report['latency_ms_p50']:.1f} ms acc={report['accuracy']:.4f}")
+    return report
+
+
+def _recompile(model, learning_rate):
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+
+def optimize_model(model, train_gen, val_gen, config, class_names):
+    """
+    Pruning puis clustering des poids, avec une courte phase de récupération
+    après chaque étape, suppression des wrappers et export
+    
+    Nécessite tensorflow-model-optimization. Le modèle optimisé est exporté
+    dans <run>/optimized/ avec un metadata.json compatible DiseaseDetector,
+    et le rapport par étape dans optimization_report.json.
+    """
+    try:
+        import tensorflow_model_optimization as tfmot
+    except ImportError:
+        print("⚠ tensorflow-model-optimization non installé. "
+              "Installez avec: pip install tensorflow-model-optimization")
+        return None
+    
+    print("🗜️ Optimisation post-entraînement (pruning + clustering)...")
+    
+    optimize_dir = os.path.join(get_run_dir(config), "optimized")
+    fine_tune_lr = config.LEARNING_RATE / 10
+    steps_per_epoch = len(train_gen)
+    reports = []
+    
+    _recompile(model, fine_tune_lr)
+    reports.append(report_stage(model, val_gen, config, 'baseline', os.path.join(optimize_dir, 'baseline')))
+    
+    # 1. Pruning par magnitude (ou structuré M:N), sparsité croissante
+    pruning_params = {
+        'pruning_schedule': tfmot.sparsity.keras.PolynomialDecay(
+            initial_sparsity=0.0,
+            final_sparsity=config.PRUNING_SPARSITY,
+            begin_step=0,
+            end_step=max(1, steps_per_epoch * config.OPTIMIZE_EPOCHS - 1)
+        )
+    }
+    if config.PRUNING_STRUCTURE:
+        pruning_params = {'sparsity_m_by_n': tuple(config.PRUNING_STRUCTURE)}
+    
+    pruned = tfmot.sparsity.keras.prune_low_magnitude(model, **pruning_params)
+    _recompile(pruned, fine_tune_lr)
+    pruned.fit(
+        train_gen,
+        epochs=config.OPTIMIZE_EPOCHS,
+        validation_data=val_gen,
+        callbacks=[tfmot.sparsity.keras.UpdatePruningStep()],
+        verbose=1
+    )
+    pruned = tfmot.sparsity.keras.strip_pruning(pruned)
+    _recompile(pruned, fine_tune_lr)
+    reports.append(report_stage(pruned, val_gen, config, 'pruned', os.path.join(optimize_dir, 'pruned')))
+    
+    # 2. Clustering des poids en préservant la sparsité obtenue
+    cluster_params = {
+        'number_of_clusters': config.CLUSTER_COUNT,
+        'cluster_centroids_init': tfmot.clustering.keras.CentroidInitialization.KMEANS_PLUS_PLUS,
+    }
+    try:
+        from tensorflow_model_optimization.python.core.clustering.keras.experimental import cluster as experimental_cluster
+        clustered = experimental_cluster.cluster_weights(pruned, preserve_sparsity=True, **cluster_params)
+    except ImportError:
+        clustered = tfmot.clustering.keras.cluster_weights(pruned, **cluster_params)
+    
+    _recompile(clustered, fine_tune_lr)
+    clustered.fit(
+        train_gen,
+        epochs=config.OPTIMIZE_EPOCHS,
+        validation_data=val_gen,
+        verbose=1
+    )
+    clustered = tfmot.clustering.keras.strip_clustering(clustered)
+    _recompile(clustered, fine_tune_lr)
+    reports.append(report_stage(clustered, val_gen, config, 'clustered', os.path.join(optimize_dir, 'clustered')))
+    
+    # 3. Export du modèle final (sans wrappers) au format attendu par DiseaseDetector
+    clustered.save(os.path.join(optimize_dir, "model.h5"), include_optimizer=False)
+    metadata = {
+        'model_name': f"{config.MODEL_NAME}_optimized",
+        'classes': class_names,
+        'num_classes': len(class_names),
+        'img_height': config.IMG_HEIGHT,
+        'img_width': config.IMG_WIDTH,
+        'accuracy': reports[-1]['accuracy'],
+        'loss': reports[-1]['loss'],
+        'training_date': datetime.now().isoformat(),
+        'architecture': config.PRETRAINED_MODEL if config.USE_PRETRAINED else 'Custom CNN',
+        'optimization': {
+            'pruning_sparsity': config.PRUNING_SPARSITY,
+            'pruning_structure': config.PRUNING_STRUCTURE,
+            'cluster_count': config.CLUSTER_COUNT,
+        }
+    }
+    with open(os.path.join(optimize_dir, "metadata.json"), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    
+    report_path = os.path.join(optimize_dir, "optimization_report.json")
+    with open(report_path, 'w') as f:
+        json.dump(reports, f, indent=2)
+    
+    print(f"✓ Modèle optimisé sauvegardé: {optimize_dir}")
+    print(f"✓ Rapport par étape: {report_path}")
+    return clustered
+
+
+# ========================================
+# Entraînement Incrémental (feedback terrain)
+# ========================================
+
+def is_field_holdout(detection_id, fraction):
+    """Échantillon terrain réservé à l'évaluation (hash stable de l'identifiant)"""
+    digest = hashlib.sha1(str(detection_id).encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) / 0xFFFFFFFF < fraction
+
+
+def collect_field_samples(config, class_indices):
+    """
+    Échantillons terrain étiquetés : files d'étiquetage complétées
+    (colonne 'label') et feedbacks des utilisateurs en base, étiquetés par
+    nom de classe du modèle (voir database.fetch_feedback_samples)
+    
+    Returns:
+        Liste de {'detection_id', 'path', 'label'} (indice de classe)
+    """
+    import csv
+    import glob
+    from concurrent.futures import ThreadPoolExecutor
+    from active_learning import resolve_image
+    from database import fetch_feedback_samples
+    
+    labeled = {}
+    for queue_path in sorted(glob.glob(os.path.join(config.LABELING_QUEUE_DIR, "queue_*.csv"))):
+        with open(queue_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('label', '').strip():
+                    labeled[row['detection_id']] = {
+                        'detection_id': row['detection_id'],
+                        'image_url': row['image_path'],
+                        'label': row['label'].strip(),
+                    }
+    
+    try:
+        for sample in fetch_feedback_samples():
+            labeled.setdefault(sample['detection_id'], sample)
+    except Exception as e:
+        print(f"⚠ Feedbacks en base indisponibles ({e.__class__.__name__}), files d'étiquetage seules")
+    
+    unknown = [s for s in labeled.values() if s['label'] not in class_indices]
+    if unknown:
+        print(f"⚠ {len(unknown)} échantillons ignorés (classe inconnue du modèle)")
+    candidates = [s for s in labeled.values() if s['label'] in class_indices]
+    
+    cache_dir = os.path.join(config.LABELING_QUEUE_DIR, "images")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        paths = list(executor.map(lambda s: resolve_image(s, cache_dir), candidates))
+    
+    return [
+        {'detection_id': s['detection_id'], 'path': path, 'label': class_indices[s['label']]}
+        for s, path in zip(candidates, paths) if path
+    ]
+
+
+def sample_replay(entries, class_indices, size, seed):
+    """
+    Tampon de rejeu : images de data/train tirées équitablement par classe,
+    pour ne pas oublier les classes absentes des nouveaux échantillons
+    """
+    rng = np.random.default_rng(seed)
+    by_class = {}
+    for entry in split_entries(entries, 'train'):
+        if entry['class'] in class_indices:
+            by_class.setdefault(entry['class'], []).append(entry)
+    if not by_class:
+        return []
+    
+    per_class = int(np.ceil(size / len(by_class)))
+    replay = []
+    for class_name, class_entries in sorted(by_class.items()):
+        chosen = rng.choice(len(class_entries), size=min(per_class, len(class_entries)), replace=False)
+        replay.extend(class_entries[i] for i in chosen)
+    return replay
+
+
+def make_labeled_dataset(filepaths, labels, num_classes, config, shuffle):
+    """
+    Pipeline tf.data : image -> one-hot (retournement aléatoire si shuffle)
+    """
+    def load_image(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=config.IMG_CHANNELS,
+                                   expand_animations=False)
+        image = tf.image.resize(image, (config.IMG_HEIGHT, config.IMG_WIDTH)) / 255.0
+        image.set_shape((config.IMG_HEIGHT, config.IMG_WIDTH, config.IMG_CHANNELS))
+        if shuffle and config.HORIZONTAL_FLIP:
+            image = tf.image.random_flip_left_right(image)
+        return image, tf.one_hot(label, num_classes)
+    
+    dataset = tf.data.Dataset.from_tensor_slices((list(filepaths), np.asarray(labels, dtype='int32')))
+    if shuffle:
+        dataset = dataset.shuffle(len(filepaths), seed=config.SEED, reshuffle_each_iteration=True)
+    return (dataset
+            .map(load_image, num_parallel_calls=tf.data.AUTOTUNE)
+            .batch(config.BATCH_SIZE)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def incremental_train(config, base_dir):
+    """
+    Réentraînement incrémental depuis le modèle en production
+    
+    Le modèle de base est repris tel quel et entraîné quelques epochs sur les
+    nouveaux échantillons terrain étiquetés et un tampon de rejeu de
+    data/train (taille proportionnelle aux nouveaux échantillons). Le
+    candidat n'est sauvegardé, dans un nouveau dossier versionné, que si sa
+    précision sur les données réservées (validation + échantillons terrain
+    réservés) ne régresse pas.
+    
+    Returns:
+        Dossier du nouveau modèle, ou None (rien de nouveau ou régression)
+    """
+    from evaluate_model import load_or_predict, predict_entries, make_inference_dataset, split_fingerprint
+    
+    print(f"🔁 Entraînement incrémental depuis {base_dir}")
+    model, base_metadata = load_trained_model(base_dir)
+    class_names = {int(k): v for k, v in base_metadata['classes'].items()}
+    class_indices = {v: k for k, v in class_names.items()}
+    config.IMG_HEIGHT = base_metadata['img_height']
+    config.IMG_WIDTH = base_metadata['img_width']
+    
+    # 1. Nouveaux échantillons terrain (jamais vus par le modèle de base)
+    used_path = os.path.join(base_dir, "field_samples.json")
+    used_ids = set()
+    if os.path.exists(used_path):
+        with open(used_path, 'r') as f:
+            used_ids = set(json.load(f))
+    
+    field = collect_field_samples(config, class_indices)
+    holdout = [s for s in field if is_field_holdout(s['detection_id'], config.FIELD_HOLDOUT_FRACTION)]
+    holdout_ids = {s['detection_id'] for s in holdout}
+    new_samples = [s for s in field
+                   if s['detection_id'] not in holdout_ids and s['detection_id'] not in used_ids]
+    print(f"✓ Échantillons terrain: {len(new_samples)} nouveaux, {len(holdout)} réservés à l'évaluation")
+    if not new_samples:
+        print("⚠ Aucun nouvel échantillon étiqueté, pas de nouveau modèle")
+        return None
+    
+    # 2. Nouveaux échantillons + tampon de rejeu
+    version = int(base_metadata.get('version', 1)) + 1
+    entries = build_manifest(config.DATA_DIR)
+    replay = sample_replay(entries, class_indices, int(len(new_samples) * config.REPLAY_RATIO),
+                           seed=config.SEED + version)
+    filepaths = [s['path'] for s in new_samples] + [absolute_path(config.DATA_DIR, e) for e in replay]
+    labels = [s['label'] for s in new_samples] + [class_indices[e['class']] for e in replay]
+    print(f"✓ Entraînement sur {len(new_samples)} nouveaux + {len(replay)} rejoués")
+    
+    # Échantillons terrain réservés : prédictions du modèle de base avant l'entraînement
+    if holdout:
+        holdout_labels = np.array([s['label'] for s in holdout])
+        holdout_dataset = make_inference_dataset([s['path'] for s in holdout], config.IMG_HEIGHT,
+                                                 config.IMG_WIDTH, config.BATCH_SIZE)
+        base_field = model.predict(holdout_dataset, verbose=0).argmax(axis=1) == holdout_labels
+    
+    train_dataset = make_labeled_dataset(filepaths, labels, len(class_names), config, shuffle=True)
+    _recompile(model, config.INCREMENTAL_LEARNING_RATE)
+    history = model.fit(train_dataset, epochs=config.INCREMENTAL_EPOCHS, verbose=1)
+    
+    # 3. Non-régression sur les données réservées (prédictions du modèle de base en cache)
+    base_val, val_labels, _, _ = load_or_predict(base_dir, base_metadata, config.DATA_DIR,
+                                                 'validation', config.BATCH_SIZE)
+    val_entries = split_entries(entries, 'validation')
+    print("📊 Évaluation du candidat sur les données réservées...")
+    candidate_val = predict_entries(model, base_metadata, val_entries, config.DATA_DIR, config.BATCH_SIZE)
+    
+    base_correct = list(base_val.argmax(axis=1) == val_labels)
+    candidate_correct = list(candidate_val.argmax(axis=1) == val_labels)
+    field_report = {}
+    if holdout:
+        candidate_field = model.predict(holdout_dataset, verbose=0).argmax(axis=1) == holdout_labels
+        base_correct += list(base_field)
+        candidate_correct += list(candidate_field)
+        field_report = {
+            'field_holdout_images': len(holdout),
+            'field_base_accuracy': float(np.mean(base_field)),
+            'field_accuracy': float(np.mean(candidate_field)),
+        }
+    
+    base_accuracy = float(np.mean(base_correct))
+    candidate_accuracy = float(np.mean(candidate_correct))
+    print(f"✓ Précision réservée: base {base_accuracy:.4f} → candidat {candidate_accuracy:.4f}")
+    if candidate_accuracy < base_accuracy - config.INCREMENTAL_TOLERANCE:
+        print("❌ Régression détectée, le candidat n'est pas sauvegardé")
+        return None
+    
+    # 4. Nouveau dossier versionné
+    config.MODEL_NAME = f"agridetect_model_v{version:03d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    run_dir = get_run_dir(config)
+    os.makedirs(run_dir, exist_ok=True)
+    model.save(os.path.join(run_dir, "model.h5"))
+    model.save(os.path.join(run_dir, "saved_model"), save_format='tf')
+    
+    metadata = {k: v for k, v in base_metadata.items()
+                if k != 'calibration' and not k.endswith('_evaluation')}
+    metadata.update({
+        'model_name': config.MODEL_NAME,
+        'version': version,
+        'parent_model': os.path.normpath(base_dir),
+        'accuracy': float(np.mean(candidate_correct[:len(val_labels)])),
+        'training_date': datetime.now().isoformat(),
+        'incremental': {
+            'new_samples': len(new_samples),
+            'replay_samples': len(replay),
+            'epochs': config.INCREMENTAL_EPOCHS,
+            'learning_rate': config.INCREMENTAL_LEARNING_RATE,
+            'heldout_base_accuracy': base_accuracy,
+            'heldout_accuracy': candidate_accuracy,
+            **field_report,
+        },
+    })
+    with open(os.path.join(run_dir, "metadata.json"), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    with open(os.path.join(run_dir, "field_samples.json"), 'w') as f:
+        json.dump(sorted(used_ids | {s['detection_id'] for s in new_samples}), f)
+    with open(os.path.join(run_dir, "history.json"), 'w') as f:
+        json.dump({k: [float(v) for v in values] for k, values in history.history.items()}, f, indent=2)
+    
+    # Prédictions de validation en cache pour le prochain run incrémental
+    predictions_dir = os.path.join(run_dir, "predictions")
+    os.makedirs(predictions_dir, exist_ok=True)
+    np.savez(os.path.join(predictions_dir, f"validation_{split_fingerprint(val_entries)}.npz"),
+             probabilities=candidate_val, labels=val_labels,
+             paths=np.array([e['path'] for e in val_entries]))
+    
+    print(f"✓ Modèle v{version} sauvegardé: {run_dir}")
+    return run_dir
+
+
+# ========================================
+# Mesure de Latence
+# ========================================
+
+def measure_inference_latency(model, config, runs=50, warmup=5):
+    """
+    Mesurer la latence d'inférence CPU sur une image (batch de 1)
+    
+    Returns:
+        Dictionnaire avec la latence médiane et p95 en millisecondes
+    """
+    import time
+    
+    sample = np.random.rand(1, config.IMG_HEIGHT, config.IMG_WIDTH, config.IMG_CHANNELS).astype('float32')
+    
+    with tf.device('/CPU:0'):
+        for _ in range(warmup):
+            model(sample, training=False)
+        
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(sample, training=False)
+            timings.append((time.perf_counter() - start) * 1000)
+    
+    return {
+        'latency_ms_p50': float(np.percentile(timings, 50)),
+        'latency_ms_p95': float(np.percentile(timings, 95)),
+    }
+
+
 # ========================================
 # Visualisation
 # ========================================
@@ -363,9 +1576,13 @@ def plot_training_history(history, config):
     
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
     
+    fine_tune_start = getattr(history, 'fine_tune_start', None)
+    
     # Accuracy
     ax1.plot(history.history['accuracy'], label='Train Accuracy')
     ax1.plot(history.history['val_accuracy'], label='Val Accuracy')
+    if fine_tune_start:
+        ax1.axvline(fine_tune_start - 0.5, color='gray', linestyle='--', label='Fine-tuning')
     ax1.set_title('Model Accuracy')
     ax1.set_xlabel('Epoch')
     ax1.set_ylabel('Accuracy')
@@ -375,6 +1592,8 @@ def plot_training_history(history, config):
     # Loss
     ax2.plot(history.history['loss'], label='Train Loss')
     ax2.plot(history.history['val_loss'], label='Val Loss')
+    if fine_tune_start:
+        ax2.axvline(fine_tune_start - 0.5, color='gray', linestyle='--', label='Fine-tuning')
     ax2.set_title('Model Loss')
     ax2.set_xlabel('Epoch')
     ax2.set_ylabel('Loss')
@@ -387,16 +1606,62 @@ def plot_training_history(history, config):
     plt.savefig(plot_path, dpi=300, bbox_inches='tight')
     print(f"✓ Graphiques sauvegardés: {plot_path}")
     plt.close()
+    
+    # Exactitude de validation par classe
+    per_class = {key[len(PER_CLASS_PREFIX):]: values for key, values in history.history.items()
+                 if key.startswith(PER_CLASS_PREFIX)}
+    if per_class:
+        fig, ax = plt.subplots(figsize=(15, 7))
+        for class_name, values in sorted(per_class.items()):
+            ax.plot(values, label=class_name)
+        if fine_tune_start:
+            ax.axvline(fine_tune_start - 0.5, color='gray', linestyle='--')
+        ax.set_title('Validation Accuracy par Classe')
+        ax.set_xlabel('Epoch')
+        ax.set_ylabel('Accuracy')
+        ax.legend(fontsize=7, ncol=2, loc='center left', bbox_to_anchor=(1.0, 0.5))
+        ax.grid(True)
+        
+        per_class_path = os.path.join(config.OUTPUT_DIR, config.MODEL_NAME, "per_class_accuracy.png")
+        fig.savefig(per_class_path, dpi=150, bbox_inches='tight')
+        print(f"✓ Courbes par classe sauvegardées: {per_class_path}")
+        plt.close(fig)
 
 
 # ========================================
 # Main - Pipeline Complet
 # ========================================
 
+def parse_args():
+    """Arguments de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="Entraînement du modèle AgriDetect")
+    parser.add_argument('--run-name', help="Nom stable du run (reprend le run s'il existe déjà)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprendre le run inachevé le plus récent de OUTPUT_DIR")
+    parser.add_argument('--no-fine-tune', action='store_true',
+                        help="Arrêter après la phase 1 (pas de fine-tuning)")
+    parser.add_argument('--distill', metavar='TEACHER_DIR',
+                        help="Distiller un modèle entraîné de models/ vers un élève compact")
+    parser.add_argument('--student', choices=STUDENT_ARCHITECTURES, default='mobilenet',
+                        help="Architecture de l'élève pour --distill")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Pruning + clustering du modèle après l'évaluation")
+    parser.add_argument('--optimize-model', metavar='MODEL_DIR',
+                        help="Pruning + clustering d'un modèle déjà entraîné de models/")
+    parser.add_argument('--incremental', metavar='BASE_MODEL_DIR', nargs='?', const=Config.CURRENT_MODEL_DIR,
+                        help="Réentraînement incrémental sur les échantillons terrain étiquetés "
+                             "(par défaut depuis models/current_model)")
+    parser.add_argument('--archives', metavar='ARCHIVE_DIR',
+                        help="Entraîner directement depuis des shards .zip/.tar (sans extraction)")
+    return parser.parse_args()
+
+
 def main():
     """
     Pipeline complet d'entraînement
     """
+    args = parse_args()
+    
     print("=" * 60)
     print("🌾 AgriDetect - Entraînement du Modèle")
     print("=" * 60)
@@ -404,16 +1669,79 @@ def main():
     
     # Configuration
     config = Config()
+    if args.no_fine_tune:
+        config.FINE_TUNE = False
+    if args.archives:
+        config.ARCHIVE_DIR = args.archives
+    
+    if args.distill:
+        config.MODEL_NAME = f"agridetect_student_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    # Dossier du run : nom fourni, run inachevé à reprendre, ou nouveau run
+    if args.run_name:
+        config.MODEL_NAME = args.run_name
+    elif args.resume:
+        resumable = find_resumable_run(config)
+        if resumable:
+            config.MODEL_NAME = resumable
+        else:
+            print("⚠ Aucun run inachevé trouvé, démarrage d'un nouveau run")
+    print(f"📁 Run: {get_run_dir(config)}")
+    
+    keras.utils.set_random_seed(config.SEED)
     
     # Vérifier que les données existent
-    if not os.path.exists(config.TRAIN_DIR):
+    if config.ARCHIVE_DIR and not os.path.isdir(config.ARCHIVE_DIR):
+        print(f"❌ Erreur: Le dossier d'archives {config.ARCHIVE_DIR} n'existe pas!")
+        return
+    if not config.ARCHIVE_DIR and not os.path.exists(config.TRAIN_DIR):
         print(f"❌ Erreur: Le dossier {config.TRAIN_DIR} n'existe pas!")
         print("Veuillez créer la structure de données requise.")
         return
     
+    # Mode optimisation seule : modèle existant -> pruning + clustering
+    if args.optimize_model:
+        model, metadata = load_trained_model(args.optimize_model)
+        config.OUTPUT_DIR = os.path.dirname(os.path.normpath(args.optimize_model))
+        config.MODEL_NAME = os.path.basename(os.path.normpath(args.optimize_model))
+        config.IMG_HEIGHT = metadata['img_height']
+        config.IMG_WIDTH = metadata['img_width']
+        config.AUGMENTATION = False
+        train_gen, val_gen, _ = create_data_generators(config)
+        class_names = {int(k): v for k, v in metadata['classes'].items()}
+        optimize_model(model, train_gen, val_gen, config, class_names)
+        return
+    
+    # Mode incrémental : modèle en production + échantillons terrain -> nouvelle version
+    if args.incremental:
+        run_dir = incremental_train(config, args.incremental)
+        print()
+        print("=" * 60)
+        if run_dir:
+            print("✅ Entraînement incrémental terminé avec succès!")
+            print(f"📁 Nouvelle version: {run_dir}")
+        else:
+            print("⚠ Aucune nouvelle version produite")
+        print("=" * 60)
+        return
+    
+    # Mode distillation : professeur existant -> élève compact
+    if args.distill:
+        distill_model(config, args.distill, student=args.student)
+        state = load_run_state(config)
+        state['finished'] = True
+        save_run_state(config, state)
+        print()
+        print("=" * 60)
+        print("✅ Distillation terminée avec succès!")
+        print(f"📁 Élève sauvegardé dans: {get_run_dir(config)}")
+        print("=" * 60)
+        return
+    
     # 1. Préparer les données
     train_gen, val_gen, class_names = create_data_generators(config)
     num_classes = len(class_names)
+    class_weight = compute_class_weight(config, class_names)
     
     print()
     
@@ -423,18 +1751,30 @@ def main():
     print()
     
     # 3. Entraîner
-    history = compile_and_train(model, train_gen, val_gen, config, class_names)
+    history = compile_and_train(model, train_gen, val_gen, config, class_names, class_weight)
     
     print()
     
-    # 4. Fine-tuning (optionnel)
-    # model = fine_tune_model(model, train_gen, val_gen, config)
+    # 4. Fine-tuning
+    if config.FINE_TUNE:
+        model, fine_history = fine_tune_model(model, train_gen, val_gen, config, class_names, class_weight)
+        if fine_history is not None:
+            history = merge_histories(history, fine_history, config)
     
     print()
     
     # 5. Évaluer et sauvegarder
     evaluate_and_save(model, val_gen, config, class_names, history)
     
+    # 6. Pruning + clustering (optionnel)
+    if args.optimize:
+        print()
+        optimize_model(model, train_gen, val_gen, config, class_names)
+    
+    state = load_run_state(config)
+    state['finished'] = True
+    save_run_state(config, state)
+    
     print()
     print("=" * 60)
     print("✅ Entraînement terminé avec succès!")